@@ -17,6 +17,13 @@ from .routes import (
     customer_query_view,
     customer_query_search
 )
+from .import_jobs import (
+    create_import_job,
+    import_job_status,
+    import_job_events,
+    import_jobs_list,
+    preview_import
+)
 from .customer_manager import (
     add_customer,
     delete_user,
@@ -30,6 +37,11 @@ admin_bp = Blueprint('admin', __name__)
 admin_bp.add_url_rule('/', view_func=dashboard)
 admin_bp.add_url_rule('/dashboard', view_func=dashboard)
 admin_bp.add_url_rule('/import_excel', view_func=import_excel, methods=['GET', 'POST'])
+admin_bp.add_url_rule('/import_preview', view_func=preview_import, methods=['POST'])
+admin_bp.add_url_rule('/import_jobs', view_func=create_import_job, methods=['POST'])
+admin_bp.add_url_rule('/import_jobs', view_func=import_jobs_list, methods=['GET'])
+admin_bp.add_url_rule('/import_jobs/<int:job_id>', view_func=import_job_status)
+admin_bp.add_url_rule('/import_jobs/<int:job_id>/events', view_func=import_job_events)
 admin_bp.add_url_rule('/add_target', view_func=add_target, methods=['GET', 'POST'])
 admin_bp.add_url_rule('/edit_target/<int:target_id>', view_func=edit_target, methods=['GET', 'POST'])
 admin_bp.add_url_rule('/delete_target/<int:target_id>', view_func=delete_target, methods=['POST'])
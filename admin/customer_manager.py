@@ -6,6 +6,7 @@
 from flask import session, jsonify, request
 from werkzeug.security import generate_password_hash
 from database import get_db, close_db
+from cache import invalidate_customer
 from utils import require_admin, log_action
 
 
@@ -46,6 +47,7 @@ def add_customer():
         customer_id = cursor.lastrowid
         
         conn.commit()
+        invalidate_customer(customer_id)
         
         # 验证添加是否成功
         cursor.execute('SELECT * FROM users WHERE id = ?', (customer_id,))
@@ -110,6 +112,7 @@ def delete_user(user_id):
         cursor.execute('DELETE FROM users WHERE id = ?', (user_id,))
         
         conn.commit()
+        invalidate_customer(user_id)
         
         log_action('DELETE_USER', session['user_id'], 
                   f'删除用户: {username}, ID: {user_id}, 删除记录: {records_deleted}, 删除目标: {targets_deleted}')
@@ -0,0 +1,195 @@
+"""
+导入缓存模块 - 管理员功能
+按文件内容哈希缓存已解析的流水Excel，同一文件再次上传或预览后确认导入时不再重复解析
+
+- 内存解析的工作簿（ParsedWorkbook）缓存解析结果（gzip压缩的JSON）
+- 流式读取的文件（WorkbookStream、CsvStream）缓存原始文件，确认导入时无需重新上传
+- 缓存目录中最多保留 IMPORT_CACHE_SIZE 个条目，超出时按最近使用时间淘汰（LRU）
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+
+from config import Config
+from .importer import ParsedWorkbook, WorkbookStream, CsvStream, open_workbook
+
+# 计算哈希时每次读取的字节数
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# 合法的内容哈希（SHA-256十六进制）
+HASH_PATTERN = re.compile(r'[0-9a-f]{64}')
+
+
+def file_hash(file):
+    """
+    计算文件内容的SHA-256哈希
+    :param file: 文件路径或文件对象（读取后恢复原位置）
+    :return: 十六进制哈希字符串
+    """
+    digest = hashlib.sha256()
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    position = file.tell()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+        digest.update(chunk)
+    file.seek(position)
+    return digest.hexdigest()
+
+
+class ImportCache:
+    """
+    按内容哈希保存解析结果的磁盘缓存
+    条目的修改时间即最近使用时间，命中时更新，淘汰时删除最久未使用的条目
+    """
+
+    PARSED_SUFFIX = '.json.gz'
+    FILE_SUFFIXES = (WorkbookStream.SUFFIX, CsvStream.SUFFIX)
+
+    def __init__(self, directory, max_entries=20):
+        """
+        :param directory: 缓存目录
+        :param max_entries: 最多保留的条目数
+        """
+        self.directory = directory
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def _path(self, key, suffix):
+        return os.path.join(self.directory, key + suffix)
+
+    def _entries(self):
+        """缓存中的所有条目文件"""
+        if not os.path.isdir(self.directory):
+            return []
+        return [os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                if name.endswith((self.PARSED_SUFFIX,) + self.FILE_SUFFIXES)]
+
+    def get(self, key):
+        """
+        读取缓存的工作簿
+        :param key: 内容哈希
+        :return: ParsedWorkbook、WorkbookStream 或 CsvStream，未命中时返回None
+        """
+        for suffix in (self.PARSED_SUFFIX,) + self.FILE_SUFFIXES:
+            path = self._path(key, suffix)
+            try:
+                os.utime(path)
+                if suffix == self.PARSED_SUFFIX:
+                    with gzip.open(path, 'rt', encoding='utf-8') as f:
+                        workbook = ParsedWorkbook.from_dict(json.load(f))
+                else:
+                    workbook = open_workbook(path, streaming=True)
+            except (OSError, ValueError, KeyError):
+                continue
+            workbook.content_hash = key
+            with self._lock:
+                self._stats['hits'] += 1
+            return workbook
+
+        with self._lock:
+            self._stats['misses'] += 1
+        return None
+
+    def put(self, key, workbook, file=None):
+        """
+        写入缓存
+        :param key: 内容哈希
+        :param workbook: 解析得到的工作簿
+        :param file: 原始文件（路径或文件对象），流式读取的文件缓存原始文件
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        if isinstance(workbook, ParsedWorkbook):
+            path = self._path(key, self.PARSED_SUFFIX)
+            tmp_path = f'{path}.{threading.get_ident()}.tmp'
+            with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+                json.dump(workbook.to_dict(), f, ensure_ascii=False, default=float)
+        elif file is not None:
+            path = self._path(key, workbook.SUFFIX)
+            tmp_path = f'{path}.{threading.get_ident()}.tmp'
+            if isinstance(file, (str, os.PathLike)):
+                shutil.copyfile(file, tmp_path)
+            else:
+                position = file.tell()
+                file.seek(0)
+                with open(tmp_path, 'wb') as f:
+                    shutil.copyfileobj(file, f)
+                file.seek(position)
+        else:
+            return
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def evict(self):
+        """删除超出容量的最久未使用条目"""
+        with self._lock:
+            entries = []
+            for path in self._entries():
+                try:
+                    entries.append((os.path.getmtime(path), path))
+                except OSError:
+                    pass
+            entries.sort()
+            for _, path in entries[:max(0, len(entries) - self.max_entries)]:
+                try:
+                    os.remove(path)
+                    self._stats['evictions'] += 1
+                except OSError:
+                    pass
+
+    def get_stats(self):
+        """获取缓存命中统计"""
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['entries'] = len(self._entries())
+        stats['max_entries'] = self.max_entries
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+cache = ImportCache(Config.IMPORT_CACHE_DIR, Config.IMPORT_CACHE_SIZE)
+
+
+def load_workbook(file, filename=None, content_hash=None):
+    """
+    按内容哈希读取工作簿：命中缓存时不再解析，未命中时解析并写入缓存
+    :param file: 文件路径或文件对象
+    :param filename: 原始文件名（用于判断扩展名）
+    :param content_hash: 已计算的内容哈希
+    :return: ParsedWorkbook、WorkbookStream 或 CsvStream（content_hash 属性为内容哈希）
+    """
+    content_hash = content_hash or file_hash(file)
+    workbook = cache.get(content_hash)
+    if workbook is not None:
+        print(f"[DEBUG] 导入缓存命中: {content_hash[:12]}")
+        return workbook
+
+    workbook = open_workbook(file, filename)
+    cache.put(content_hash, workbook, file)
+    workbook.content_hash = content_hash
+    return workbook
+
+
+def load_cached_workbook(content_hash):
+    """
+    读取预览时缓存的工作簿
+    :param content_hash: 预览接口返回的内容哈希
+    :raises ValueError: 哈希无效或缓存已过期时
+    """
+    if not HASH_PATTERN.fullmatch(content_hash or ''):
+        raise ValueError('无效的文件标识')
+    workbook = cache.get(content_hash)
+    if workbook is None:
+        raise ValueError('预览已过期，请重新上传文件')
+    return workbook
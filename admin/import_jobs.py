@@ -0,0 +1,359 @@
+"""
+后台导入任务模块 - 管理员功能
+Excel导入作为任务提交到进程内线程池执行，上传请求立即返回任务ID
+
+- 多个工作簿可以同时解析；写入通过 write_lock 串行执行，同一时间只有一个写事务
+- 任务的状态、已处理行数、错误和耗时记录在 import_jobs 表中
+- 可以先调用预览接口解析并缓存文件，确认导入时只提交内容哈希
+- 写入事务提交前其他连接看不到进度，运行中的状态和进度保存在内存中，查询时与任务表合并
+
+任务状态：queued（排队）→ parsing（解析）→ waiting（等待写入）→ writing（写入）→ done / failed
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from flask import session, jsonify, request, Response, stream_with_context
+from werkzeug.utils import secure_filename
+
+from cache import invalidate_customer
+from config import Config
+from database import get_db, close_db
+from utils import validate_file_upload, log_action
+from .importer import ParsedWorkbook, find_applied_import, run_import
+from .import_cache import HASH_PATTERN, file_hash, load_workbook, load_cached_workbook
+
+# 导入写入锁：后台任务和同步导入共用，保证同一时间只有一个导入写事务
+write_lock = threading.Lock()
+
+# 已结束的任务状态
+FINISHED_STATES = ('done', 'failed')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# 运行中任务的实时状态：任务ID -> {'state': ..., 'rows_processed': ...}
+_live_jobs = {}
+_live_lock = threading.Lock()
+
+
+def _get_executor():
+    """获取导入线程池（首次提交任务时创建）"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=Config.IMPORT_WORKERS,
+                                           thread_name_prefix='import-job')
+        return _executor
+
+
+def _set_live(job_id, **fields):
+    """更新运行中任务的实时状态"""
+    with _live_lock:
+        _live_jobs.setdefault(job_id, {'state': 'queued', 'rows_processed': 0}).update(fields)
+
+
+def _now():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def submit_job(file, options, user_id, filename=None, content_hash=None):
+    """
+    保存上传文件并提交导入任务
+    :param file: 上传的文件对象；为None时使用预览时缓存的文件（content_hash）
+    :param options: 导入选项字典（见 run_import）
+    :param user_id: 提交任务的管理员ID
+    :param filename: 原始文件名，默认取上传文件的文件名
+    :param content_hash: 预览接口返回的内容哈希
+    :return: 任务ID
+    """
+    filename = file.filename if file else filename or content_hash
+
+    conn = get_db()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO import_jobs (created_by, filename, options, period_number)
+            VALUES (?, ?, ?, ?)
+        ''', (user_id, filename, json.dumps(options, ensure_ascii=False),
+              options.get('period_number')))
+        job_id = cursor.lastrowid
+        conn.commit()
+    finally:
+        close_db(conn)
+
+    path = None
+    if file:
+        upload_dir = os.path.join(Config.UPLOAD_FOLDER, 'import_jobs')
+        os.makedirs(upload_dir, exist_ok=True)
+        path = os.path.join(upload_dir, f'{job_id}_{secure_filename(filename) or "upload.xlsx"}')
+        file.save(path)
+
+    _set_live(job_id, state='queued')
+    _get_executor().submit(_run_job, job_id, path, filename, options, user_id, content_hash)
+    print(f"[INFO] 导入任务 {job_id} 已提交: {filename}")
+    return job_id
+
+
+def _run_job(job_id, path, filename, options, user_id, content_hash=None):
+    """
+    执行导入任务（在线程池中运行）
+    解析阶段不持有写入锁；任务表的更新与导入数据在同一把锁下写入，成功时与数据一起提交
+    :param path: 上传文件的保存路径，为None时使用缓存中的 content_hash
+    """
+    started_at = _now()
+    parse_seconds = write_seconds = None
+
+    def progress(count):
+        _set_live(job_id, rows_processed=count)
+
+    try:
+        _set_live(job_id, state='parsing')
+        started = time.perf_counter()
+        # 同一文件命中解析缓存；流式读取（WorkbookStream）在写入阶段边读边写，这里只打开文件
+        if path:
+            workbook = load_workbook(path, filename)
+        else:
+            workbook = load_cached_workbook(content_hash)
+        parse_seconds = time.perf_counter() - started
+
+        _set_live(job_id, state='waiting')
+        with write_lock:
+            _set_live(job_id, state='writing')
+            started = time.perf_counter()
+            conn = get_db()
+            try:
+                result = run_import(conn, workbook, options, progress)
+                write_seconds = time.perf_counter() - started
+                conn.execute('''
+                    UPDATE import_jobs
+                    SET state = 'done', customer_id = ?, period_number = ?,
+                        rows_processed = ?, record_count = ?, result = ?,
+                        parse_seconds = ?, write_seconds = ?, started_at = ?, finished_at = ?
+                    WHERE id = ?
+                ''', (result['customer_id'], result['period_number'],
+                      result['record_count'], result['record_count'],
+                      json.dumps(result, ensure_ascii=False, default=str),
+                      parse_seconds, write_seconds, started_at, _now(), job_id))
+                conn.commit()
+                invalidate_customer(result['customer_id'])
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                close_db(conn)
+
+        log_action('EXCEL_IMPORT', user_id,
+                   f'导入任务 {job_id}: 客户ID {result["customer_id"]}, 期数 {result["period_number"]}, '
+                   f'日期 {result["actual_start_date"]} 至 {result["actual_end_date"]}, 总额 {result["total_amount"]}')
+        print(f"[INFO] 导入任务 {job_id} 完成: {result['record_count']} 条明细, "
+              f"解析 {parse_seconds:.2f} 秒, 写入 {write_seconds:.2f} 秒")
+
+    except Exception as e:
+        print(f"[ERROR] 导入任务 {job_id} 失败: {e}")
+        log_action('EXCEL_IMPORT_ERROR', user_id, f'导入任务 {job_id} 失败: {str(e)}')
+        with write_lock:
+            conn = get_db()
+            try:
+                conn.execute('''
+                    UPDATE import_jobs
+                    SET state = 'failed', error = ?, parse_seconds = ?,
+                        started_at = ?, finished_at = ?
+                    WHERE id = ?
+                ''', (str(e), parse_seconds, started_at, _now(), job_id))
+                conn.commit()
+            finally:
+                close_db(conn)
+
+    finally:
+        with _live_lock:
+            _live_jobs.pop(job_id, None)
+        if path:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _job_to_dict(row):
+    """将任务行转换为字典，并合并运行中的实时状态"""
+    job = dict(row)
+    job['options'] = json.loads(job['options']) if job['options'] else {}
+    job['result'] = json.loads(job['result']) if job['result'] else None
+    with _live_lock:
+        live = _live_jobs.get(job['id'])
+        if live:
+            job.update(live)
+    job['finished'] = job['state'] in FINISHED_STATES
+    return job
+
+
+def get_job(job_id):
+    """
+    获取任务状态
+    :return: 任务字典，不存在时返回None
+    """
+    conn = get_db()
+    try:
+        row = conn.execute('SELECT * FROM import_jobs WHERE id = ?', (job_id,)).fetchone()
+        return _job_to_dict(row) if row else None
+    finally:
+        close_db(conn)
+
+
+def list_jobs(limit=20):
+    """获取最近的任务列表"""
+    conn = get_db()
+    try:
+        rows = conn.execute('SELECT * FROM import_jobs ORDER BY id DESC LIMIT ?', (limit,)).fetchall()
+        return [_job_to_dict(row) for row in rows]
+    finally:
+        close_db(conn)
+
+
+def create_import_job():
+    """
+    提交后台导入任务
+    API接口，立即返回任务ID（202）
+    """
+    if session.get('role') != 'admin':
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 401
+
+    # 预览后确认导入时只提交内容哈希，不再上传文件
+    content_hash = request.form.get('file_hash')
+    file = request.files.get('file')
+    if not content_hash or file:
+        is_valid, error = validate_file_upload(file)
+        if not is_valid:
+            return jsonify({'success': False, 'error': error}), 400
+        content_hash = None
+    elif not HASH_PATTERN.fullmatch(content_hash):
+        return jsonify({'success': False, 'error': '无效的文件标识'}), 400
+
+    options = {
+        'user_mode': request.form.get('user_mode', 'new'),
+        'custom_username': request.form.get('custom_username', ''),
+        'existing_customer_id': request.form.get('existing_customer_id'),
+        'period_number': request.form.get('period_number', 1, type=int)
+    }
+    if options['user_mode'] != 'new' and not options['existing_customer_id']:
+        return jsonify({'success': False, 'error': '请选择已有用户'}), 400
+
+    job_id = submit_job(file, options, session['user_id'],
+                        filename=request.form.get('filename'), content_hash=content_hash)
+    return jsonify({'success': True, 'job_id': job_id}), 202
+
+
+def preview_import():
+    """
+    预览导入
+    解析上传文件并缓存解析结果，返回内容哈希和导入摘要；确认导入时提交该哈希，不再重复解析
+    API接口，返回JSON
+    """
+    if session.get('role') != 'admin':
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 401
+
+    file = request.files.get('file')
+    is_valid, error = validate_file_upload(file)
+    if not is_valid:
+        return jsonify({'success': False, 'error': error}), 400
+
+    try:
+        content_hash = file_hash(file.stream)
+        workbook = load_workbook(file.stream, file.filename, content_hash)
+    except Exception as e:
+        return jsonify({'success': False, 'error': f'无法解析文件: {str(e)}'}), 400
+
+    preview = {
+        'file_hash': content_hash,
+        'filename': file.filename,
+        'format': workbook.format,
+        'customer_name': workbook.customer_name,
+        'summary': None,
+        'duplicate': False
+    }
+    # 流式读取的大文件在导入时才逐行读取，预览只能给出格式和客户名
+    if isinstance(workbook, ParsedWorkbook):
+        preview['summary'] = {
+            'start_date': workbook.summary['start_date'],
+            'end_date': workbook.summary['end_date'],
+            'total_amount': workbook.summary['total_amount'],
+            'record_count': len(workbook.records)
+        }
+
+    # 检查同一文件是否已导入到所选客户的该期数
+    conn = get_db()
+    try:
+        cursor = conn.cursor()
+        if request.form.get('user_mode', 'new') == 'new':
+            username = request.form.get('custom_username', '').strip() or workbook.customer_name
+            cursor.execute('SELECT id FROM users WHERE username = ?', (username,))
+        else:
+            cursor.execute('SELECT id FROM users WHERE id = ?', (request.form.get('existing_customer_id', type=int),))
+        customer = cursor.fetchone()
+        if customer:
+            period_number = request.form.get('period_number', 1, type=int)
+            preview['duplicate'] = find_applied_import(cursor, customer['id'], period_number, content_hash) is not None
+    finally:
+        close_db(conn)
+
+    return jsonify({'success': True, 'preview': preview})
+
+
+def import_job_status(job_id):
+    """
+    查询导入任务状态
+    API接口，返回JSON
+    """
+    if session.get('role') != 'admin':
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 401
+
+    job = get_job(job_id)
+    if not job:
+        return jsonify({'success': False, 'error': '任务不存在'}), 404
+    return jsonify({'success': True, 'job': job})
+
+
+def import_job_events(job_id):
+    """
+    推送导入任务进度（Server-Sent Events）
+    状态或进度变化时推送一次，任务结束后关闭连接
+    """
+    if session.get('role') != 'admin':
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 401
+
+    if not get_job(job_id):
+        return jsonify({'success': False, 'error': '任务不存在'}), 404
+
+    def generate():
+        last = None
+        while True:
+            job = get_job(job_id)
+            if job is None:
+                return
+            current = (job['state'], job['rows_processed'])
+            if current != last:
+                last = current
+                yield f"data: {json.dumps(job, ensure_ascii=False, default=str)}\n\n"
+            if job['finished']:
+                return
+            time.sleep(0.5)
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+def import_jobs_list():
+    """
+    最近的导入任务列表
+    API接口，返回JSON
+    """
+    if session.get('role') != 'admin':
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 401
+
+    limit = min(request.args.get('limit', 20, type=int), 100)
+    return jsonify({'success': True, 'jobs': list_jobs(limit)})
@@ -0,0 +1,785 @@
+"""
+流水导入模块 - 管理员功能
+解析流水Excel并批量写入数据库
+
+Excel有两种格式：
+- 格式A：无标题行，第一行就是表头（如"50万流水1.xlsx"）
+- 格式B：第一行是标题（如"2026-01-27至2026-02-27 李先生流水表"），第二行是表头
+数据行第1列为日期，第2-21列为交易1-20，最后一行为总计行，其最后一列为目标金额
+
+CSV和Parquet使用相同的布局（Parquet以字段名为表头，按格式A处理）。
+
+各读取方式提供相同的接口（format、customer_name、save）：
+- ParsedWorkbook：pandas一次读入内存，向量化处理（.xls、较小的.xlsx、.parquet）
+- WorkbookStream：openpyxl只读模式逐行读取，分批写入，内存占用与文件大小无关（较大的.xlsx）
+- CsvStream：csv模块逐行读取，分批写入（.csv）
+
+明细先写入临时表，再按 (客户, 日期, 序号) 与该期数的已有数据比对，只插入、更新、删除有变化的行，
+重复导入同一期数时保留已标记的操作员、渠道和完成状态
+"""
+
+import csv
+import io
+import os
+from collections import deque
+from datetime import datetime
+
+import pandas as pd
+from werkzeug.security import generate_password_hash
+
+from config import Config
+from database import DatabaseManager
+
+# 每行的交易列数（交易1-20）
+TRANSACTION_COLUMNS = 20
+
+# 第一列中不属于数据行的值
+SKIP_DATE_VALUES = {'', '总计', 'nan', 'NaT', 'None'}
+
+
+def normalize_date(value):
+    """
+    将单元格中的日期统一转换为 YYYY-MM-DD 字符串
+    非日期类型的值原样转为字符串
+    """
+    if isinstance(value, (pd.Timestamp, datetime)):
+        return value.strftime('%Y-%m-%d')
+    return str(value).strip()
+
+
+def detect_format(first_cell):
+    """
+    根据第一个单元格判断Excel格式
+    :return: 'B'（带标题行）或 'A'（无标题行）
+    """
+    first_cell = str(first_cell)
+    if '至' in first_cell and len(first_cell.split()) >= 2:
+        return 'B'
+    return 'A'
+
+
+def parse_title(title):
+    """
+    解析格式B的标题行
+    :return: (日期范围, 客户名)
+    """
+    parts = str(title).split()
+    date_range = parts[0] if len(parts) > 0 else ''
+    customer_name = ' '.join(parts[1:]) if len(parts) > 1 else 'Unknown'
+    return date_range, customer_name.replace('流水表', '').strip()
+
+
+def parse_amount(value):
+    """解析金额单元格，无法解析时返回0"""
+    try:
+        amount = float(value) if pd.notna(value) else 0
+    except (ValueError, TypeError):
+        return 0
+    return amount if pd.notna(amount) else 0
+
+
+def summarize(workbook_format, title, first_date, last_date, last_cell, actual_start_date, actual_end_date):
+    """
+    提取日期范围、客户名和目标金额（规则与原导入逻辑一致）
+    :param first_date: 第一个数据行的日期，无数据行时为None
+    :param last_date: 倒数第二个数据行（总计行之前）的日期
+    :param last_cell: 最后一行最后一列的值（目标金额）
+    :param actual_start_date: 明细中的最早日期，无明细时为None
+    :param actual_end_date: 明细中的最晚日期
+    :return: 字典
+    """
+    date_range = ''
+    customer_name = 'Unknown'
+    total_amount = 0
+
+    # 解析日期范围和客户名（仅格式B可以提取）
+    if workbook_format == 'B':
+        date_range, customer_name = parse_title(title)
+
+    if first_date is not None:
+        total_amount = parse_amount(last_cell)
+        # 格式A：从数据推断日期范围
+        if date_range == '':
+            date_range = f'{first_date}至{last_date}'
+
+    if '至' in date_range:
+        start_date, end_date = date_range.split('至', 1)
+    else:
+        start_date = end_date = date_range
+
+    if not start_date or not end_date:
+        start_date = end_date = datetime.now().strftime('%Y-%m-%d')
+
+    # 实际日期范围以明细为准
+    if actual_start_date is None:
+        actual_start_date, actual_end_date = start_date, end_date
+
+    return {
+        'format': workbook_format,
+        'customer_name': customer_name,
+        'start_date': start_date,
+        'end_date': end_date,
+        'year_month': start_date[:7],
+        'actual_start_date': actual_start_date,
+        'actual_end_date': actual_end_date,
+        'total_amount': total_amount
+    }
+
+
+def check_period_conflict(cursor, customer_id, period_number, start_date, end_date):
+    """
+    检查导入日期范围是否与该客户其他期数重叠
+    :raises ValueError: 存在重叠时
+    """
+    cursor.execute('''
+        SELECT period_number, start_date, end_date
+        FROM monthly_targets
+        WHERE customer_id = ? AND period_number != ?
+    ''', (customer_id, period_number))
+
+    for target in cursor.fetchall():
+        # 检查重叠: max(start1, start2) <= min(end1, end2)
+        if max(start_date, target['start_date']) <= min(end_date, target['end_date']):
+            raise ValueError(f"日期范围冲突：导入的数据 ({start_date} 至 {end_date}) 与第 {target['period_number']} 期 ({target['start_date']} 至 {target['end_date']}) 重叠")
+
+
+def get_period_range(cursor, customer_id, period_number):
+    """
+    获取该客户该期数当前的日期范围
+    :return: (起始日期, 结束日期)，尚未导入时返回None
+    """
+    cursor.execute('SELECT start_date, end_date FROM monthly_targets WHERE customer_id = ? AND period_number = ?', (customer_id, period_number))
+    current_target = cursor.fetchone()
+    if current_target:
+        return current_target['start_date'], current_target['end_date']
+    return None
+
+
+def save_target(cursor, customer_id, period_number, summary):
+    """
+    更新月度目标，该期数尚无目标时插入
+    同时记录导入文件的内容哈希（summary['content_hash']），用于识别重复导入
+    """
+    cursor.execute('''
+        UPDATE monthly_targets
+        SET year_month = ?, start_date = ?, end_date = ?, target_amount = ?, source_hash = ?
+        WHERE customer_id = ? AND period_number = ?
+    ''', (summary['year_month'], summary['actual_start_date'], summary['actual_end_date'],
+          summary['total_amount'], summary.get('content_hash'), customer_id, period_number))
+    if cursor.rowcount:
+        return
+
+    cursor.execute('''
+        INSERT INTO monthly_targets
+        (customer_id, year_month, start_date, end_date, target_amount, period_number, source_hash)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (customer_id, summary['year_month'], summary['actual_start_date'],
+          summary['actual_end_date'], summary['total_amount'], period_number,
+          summary.get('content_hash')))
+
+
+def find_applied_import(cursor, customer_id, period_number, content_hash):
+    """
+    检查同一文件是否已导入到该客户该期数
+    :param content_hash: 文件内容哈希
+    :return: 已导入时返回导入摘要字典，否则返回None
+    """
+    if not content_hash:
+        return None
+
+    cursor.execute('''
+        SELECT year_month, start_date, end_date, target_amount
+        FROM monthly_targets
+        WHERE customer_id = ? AND period_number = ? AND source_hash = ?
+    ''', (customer_id, period_number, content_hash))
+    target = cursor.fetchone()
+    if not target:
+        return None
+
+    cursor.execute('''
+        SELECT COUNT(*) FROM daily_records
+        WHERE customer_id = ? AND is_daily_summary = 0 AND slot IS NOT NULL
+          AND date >= ? AND date <= ?
+    ''', (customer_id, target['start_date'], target['end_date']))
+
+    return {
+        'start_date': target['start_date'],
+        'end_date': target['end_date'],
+        'year_month': target['year_month'],
+        'actual_start_date': target['start_date'],
+        'actual_end_date': target['end_date'],
+        'total_amount': target['target_amount'],
+        'record_count': cursor.fetchone()[0],
+        'changes': {'inserted': 0, 'updated': 0, 'deleted': 0},
+        'content_hash': content_hash
+    }
+
+
+def stage_records(db, records, batch_size=None, progress=None):
+    """
+    将新明细批量写入临时表 import_staging，供 apply_period_diff 比对
+    :param records: (日期, 序号, 金额) 可迭代对象，(日期, 序号) 不能重复
+    :param progress: 每批写入后调用 progress(累计条数)
+    :return: 明细条数
+    """
+    db.execute('''
+        CREATE TEMP TABLE IF NOT EXISTS import_staging (
+            date TEXT NOT NULL,
+            slot INTEGER NOT NULL,
+            amount REAL NOT NULL,
+            PRIMARY KEY (date, slot)
+        ) WITHOUT ROWID
+    ''')
+    db.execute('DELETE FROM import_staging')
+    return db.insert_many(
+        'import_staging',
+        ((date, int(slot), float(amount)) for date, slot, amount in records),
+        columns=['date', 'slot', 'amount'],
+        chunk_size=batch_size,
+        progress=progress
+    )
+
+
+def _adopt_legacy_records(db, customer_id, start_date, end_date):
+    """
+    为旧版导入（没有序号）的明细补上序号，使其能参与比对
+    旧版按 行、列 顺序写入且跳过空单元格，因此同一日期内按ID顺序对应新数据中该日期的序号顺序
+    只处理尚无任何带序号明细的日期
+    """
+    legacy = db.fetchall('''
+        SELECT id, date FROM daily_records
+        WHERE customer_id = ? AND is_daily_summary = 0 AND slot IS NULL
+          AND date >= ? AND date <= ?
+          AND date NOT IN (
+              SELECT date FROM daily_records
+              WHERE customer_id = ? AND slot IS NOT NULL AND date >= ? AND date <= ?
+          )
+        ORDER BY date, id
+    ''', (customer_id, start_date, end_date, customer_id, start_date, end_date))
+    if not legacy:
+        return 0
+
+    slots = {}
+    for row in db.fetchall('SELECT date, slot FROM import_staging WHERE date >= ? AND date <= ? ORDER BY date, slot',
+                           (start_date, end_date)):
+        slots.setdefault(row['date'], []).append(row['slot'])
+
+    assigned = []
+    for row in legacy:
+        date_slots = slots.get(row['date'])
+        if date_slots:
+            assigned.append({'id': row['id'], 'slot': date_slots.pop(0)})
+    return db.update_many('daily_records', assigned, columns=['slot'])
+
+
+def apply_period_diff(db, customer_id, old_range, new_range):
+    """
+    将 import_staging 中的新明细与已有数据比对，只写入有变化的部分
+    明细按 (客户, 日期, 序号) 匹配：金额变化的更新，没有的插入，原期数范围内已不存在的删除；
+    匹配上的明细保留操作员、渠道和完成状态。每日汇总（daily_aggregates）由触发器随明细更新
+    :param old_range: 该期数原来的 (起始日期, 结束日期)，首次导入时为None
+    :param new_range: 新数据的 (起始日期, 结束日期)
+    :return: 变化统计字典（inserted、updated、deleted）
+    """
+    new_start, new_end = new_range
+    changes = {'inserted': 0, 'updated': 0, 'deleted': 0}
+
+    if old_range:
+        _adopt_legacy_records(db, customer_id, *old_range)
+
+    changes['updated'] = db.execute('''
+        UPDATE daily_records
+        SET amount = (SELECT s.amount FROM import_staging s
+                      WHERE s.date = daily_records.date AND s.slot = daily_records.slot),
+            updated_at = CURRENT_TIMESTAMP
+        WHERE customer_id = ? AND slot IS NOT NULL AND date >= ? AND date <= ?
+          AND EXISTS (SELECT 1 FROM import_staging s
+                      WHERE s.date = daily_records.date AND s.slot = daily_records.slot
+                        AND s.amount != daily_records.amount)
+    ''', (customer_id, new_start, new_end)).rowcount
+
+    changes['inserted'] = db.execute('''
+        INSERT INTO daily_records (customer_id, date, slot, amount, status)
+        SELECT ?, s.date, s.slot, s.amount, 'pending'
+        FROM import_staging s
+        WHERE NOT EXISTS (SELECT 1 FROM daily_records dr
+                          WHERE dr.customer_id = ? AND dr.date = s.date AND dr.slot = s.slot)
+        ORDER BY s.date, s.slot
+    ''', (customer_id, customer_id)).rowcount
+
+    if old_range:
+        # 与原逻辑一致：原期数范围内不属于新数据的明细（包括手工添加的）都会被删除
+        changes['deleted'] = db.execute('''
+            DELETE FROM daily_records
+            WHERE customer_id = ? AND is_daily_summary = 0 AND date >= ? AND date <= ?
+              AND (slot IS NULL OR NOT EXISTS (
+                  SELECT 1 FROM import_staging s
+                  WHERE s.date = daily_records.date AND s.slot = daily_records.slot))
+        ''', (customer_id, *old_range)).rowcount
+
+    db.execute('DELETE FROM import_staging')
+    return changes
+
+
+class ParsedWorkbook:
+    """
+    内存解析的流水Excel
+    pandas读取一次，向量化展开交易列
+    """
+
+    # 文件内容哈希，由导入缓存设置
+    content_hash = None
+
+    def __init__(self, workbook_format, title, data):
+        """
+        :param workbook_format: 'A' 或 'B'
+        :param title: 格式B的标题，格式A为None
+        :param data: 数据DataFrame（不含标题行和表头行）
+        """
+        self.format = workbook_format
+        self.records = self.build_records(data)
+
+        if len(data) > 0:
+            first_date = normalize_date(data.iloc[0, 0])
+            last_date = normalize_date(data.iloc[-2, 0]) if len(data) >= 2 else first_date
+            last_cell = data.iloc[-1, -1]
+        else:
+            first_date = last_date = last_cell = None
+
+        has_records = len(self.records) > 0
+        self.summary = summarize(
+            workbook_format, title, first_date, last_date, last_cell,
+            self.records['date'].min() if has_records else None,
+            self.records['date'].max() if has_records else None
+        )
+        self.customer_name = self.summary['customer_name']
+
+    def to_dict(self):
+        """转换为可JSON序列化的字典（用于导入缓存）"""
+        return {
+            'format': self.format,
+            'summary': self.summary,
+            'records': {
+                'date': self.records['date'].tolist(),
+                'slot': self.records['slot'].tolist(),
+                'amount': self.records['amount'].tolist()
+            }
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """从 to_dict 的结果恢复，不重新解析Excel"""
+        workbook = cls.__new__(cls)
+        workbook.format = data['format']
+        workbook.summary = data['summary']
+        workbook.customer_name = workbook.summary['customer_name']
+        workbook.records = pd.DataFrame(data['records'], columns=['date', 'slot', 'amount'])
+        return workbook
+
+    @staticmethod
+    def build_records(data):
+        """
+        将宽表（每行一天，交易1-20为列）转换为明细
+        序号为交易列号；同一日期出现多行时，后面的行依次加 TRANSACTION_COLUMNS，保证 (日期, 序号) 唯一
+        :param data: 数据DataFrame，第1列为日期，第2-21列为交易金额
+        :return: 明细DataFrame[date, slot, amount]
+        """
+        if data.empty:
+            return pd.DataFrame(columns=['date', 'slot', 'amount'])
+
+        dates = data.iloc[:, 0].map(normalize_date)
+        valid = ~dates.isin(SKIP_DATE_VALUES)
+
+        slot_count = min(TRANSACTION_COLUMNS, data.shape[1] - 1)
+        amounts = data.loc[valid].iloc[:, 1:1 + slot_count].apply(pd.to_numeric, errors='coerce')
+        amounts.columns = range(1, slot_count + 1)
+        amounts.insert(0, 'date', dates[valid])
+        occurrence = amounts.groupby('date', sort=False).cumcount()
+
+        records = amounts.reset_index(names='row').melt(
+            id_vars=['row', 'date'], var_name='slot', value_name='amount'
+        )
+        records = records[records['amount'] > 0]
+        records = records.sort_values(['row', 'slot'], kind='stable')[['row', 'date', 'slot', 'amount']]
+        records['slot'] = records['slot'].astype(int) + occurrence.loc[records['row']].to_numpy() * TRANSACTION_COLUMNS
+        return records[['date', 'slot', 'amount']].reset_index(drop=True)
+
+    def save(self, conn, customer_id, period_number, progress=None):
+        """
+        写入数据库（与该客户该期数的已有数据比对，只写入变化的部分）
+        不提交事务，由调用方提交或回滚
+        :param progress: 每批写入后调用 progress(累计明细条数)
+        :return: 导入摘要字典（含 record_count 和变化统计 changes）
+        """
+        cursor = conn.cursor()
+        summary = dict(self.summary)
+        summary['content_hash'] = self.content_hash
+
+        check_period_conflict(cursor, customer_id, period_number,
+                              summary['actual_start_date'], summary['actual_end_date'])
+
+        db = DatabaseManager(conn)
+        records = self.records
+        summary['record_count'] = stage_records(
+            db, zip(records['date'], records['slot'], records['amount']), progress=progress
+        )
+        summary['changes'] = apply_period_diff(
+            db, customer_id, get_period_range(cursor, customer_id, period_number),
+            (summary['actual_start_date'], summary['actual_end_date'])
+        )
+        save_target(cursor, customer_id, period_number, summary)
+        return summary
+
+
+class RowStream:
+    """
+    逐行读取的流水表（WorkbookStream、CsvStream 的公共部分）
+    前几行即可判断格式和客户名，明细按批写入临时表，
+    只在内存中保留最近两行和每个日期的行数
+    """
+
+    # 文件内容哈希，由导入缓存设置
+    content_hash = None
+
+    # 导入缓存保存原始文件时使用的扩展名
+    SUFFIX = None
+
+    def __init__(self, rows, batch_size=None):
+        """
+        :param rows: 行迭代器，每行为单元格值的序列
+        :param batch_size: 每批写入的明细条数
+        """
+        self.batch_size = batch_size or Config.IMPORT_BATCH_SIZE
+        self._rows = rows
+
+        first_row = next(self._rows, None) or ('',)
+        first_cell = first_row[0] if first_row[0] is not None else ''
+        self.format = detect_format(first_cell)
+        if self.format == 'B':
+            # 跳过表头行
+            self.title = str(first_cell)
+            next(self._rows, None)
+            self.customer_name = parse_title(self.title)[1]
+        else:
+            self.title = None
+            self.customer_name = 'Unknown'
+
+    def close(self):
+        """释放底层文件"""
+
+    def _iter_data_rows(self):
+        """逐行返回数据行，跳过空行"""
+        for row in self._rows:
+            if row and any(cell is not None and cell != '' for cell in row):
+                yield row
+
+    def save(self, conn, customer_id, period_number, progress=None):
+        """
+        边读边写入临时表，再与该客户该期数的已有数据比对，只写入变化的部分
+        不提交事务，由调用方提交或回滚；日期冲突在读取完成后检查，冲突时抛出异常由调用方回滚
+        :param progress: 每批写入后调用 progress(累计明细条数)
+        :return: 导入摘要字典（含 record_count 和变化统计 changes）
+        """
+        cursor = conn.cursor()
+
+        tail = deque(maxlen=2)
+        occurrences = {}
+        state = {'first_date': None, 'min_date': None, 'max_date': None}
+
+        def records():
+            for row in self._iter_data_rows():
+                tail.append(row)
+                if state['first_date'] is None:
+                    state['first_date'] = normalize_date(row[0])
+
+                date_str = normalize_date(row[0])
+                if date_str in SKIP_DATE_VALUES:
+                    continue
+
+                # 同一日期出现多行时序号依次后移，与 ParsedWorkbook.build_records 一致
+                offset = occurrences.get(date_str, 0) * TRANSACTION_COLUMNS
+                occurrences[date_str] = occurrences.get(date_str, 0) + 1
+
+                for slot in range(1, min(TRANSACTION_COLUMNS + 1, len(row))):
+                    amount = parse_amount(row[slot])
+                    if amount > 0:
+                        if state['min_date'] is None or date_str < state['min_date']:
+                            state['min_date'] = date_str
+                        if state['max_date'] is None or date_str > state['max_date']:
+                            state['max_date'] = date_str
+                        yield date_str, offset + slot, amount
+
+        db = DatabaseManager(conn)
+        try:
+            record_count = stage_records(db, records(), self.batch_size, progress)
+        finally:
+            self.close()
+
+        if state['first_date'] is not None:
+            last_date = normalize_date(tail[0][0])
+            last_cell = tail[-1][-1]
+        else:
+            last_date = last_cell = None
+
+        summary = summarize(
+            self.format, self.title, state['first_date'], last_date, last_cell,
+            state['min_date'], state['max_date']
+        )
+        summary['record_count'] = record_count
+        summary['content_hash'] = self.content_hash
+
+        check_period_conflict(cursor, customer_id, period_number,
+                              summary['actual_start_date'], summary['actual_end_date'])
+        summary['changes'] = apply_period_diff(
+            db, customer_id, get_period_range(cursor, customer_id, period_number),
+            (summary['actual_start_date'], summary['actual_end_date'])
+        )
+        save_target(cursor, customer_id, period_number, summary)
+        return summary
+
+
+class WorkbookStream(RowStream):
+    """
+    流式读取的流水Excel
+    openpyxl只读模式逐行读取
+    """
+
+    SUFFIX = '.xlsx'
+
+    def __init__(self, file, batch_size=None):
+        """
+        :param file: 文件路径或文件对象（仅支持.xlsx）
+        :param batch_size: 每批写入的明细条数
+        """
+        from openpyxl import load_workbook
+
+        self._workbook = load_workbook(file, read_only=True, data_only=True)
+        super().__init__(self._workbook.worksheets[0].iter_rows(values_only=True), batch_size)
+
+    def close(self):
+        self._workbook.close()
+
+
+class CsvStream(RowStream):
+    """
+    流式读取的流水CSV
+    布局与Excel相同（格式A/B、第1列日期、交易1-20、最后一行总计），csv模块逐行读取
+    编码按 IMPORT_CSV_ENCODINGS 的顺序尝试（默认 UTF-8，其次 GB18030）
+    """
+
+    SUFFIX = '.csv'
+
+    def __init__(self, file, batch_size=None):
+        """
+        :param file: 文件路径或二进制文件对象
+        :param batch_size: 每批写入的明细条数
+        """
+        self._file = open_csv_text(file)
+        super().__init__(csv.reader(self._file), batch_size)
+
+    def close(self):
+        close_csv_text(self._file)
+
+
+def open_csv_text(file):
+    """
+    以文本方式打开CSV，自动判断编码
+    :param file: 文件路径或二进制文件对象
+    :return: 文本文件对象，用完后调用 close_csv_text
+    """
+    owns_file = isinstance(file, (str, os.PathLike))
+    binary = open(file, 'rb') if owns_file else file
+
+    sample = binary.read(64 * 1024)
+    binary.seek(0)
+    text = io.TextIOWrapper(binary, encoding=detect_encoding(sample), newline='')
+    text.owns_file = owns_file
+    return text
+
+
+def close_csv_text(text):
+    """关闭 open_csv_text 打开的文本文件，不关闭调用方传入的文件对象"""
+    if text.owns_file:
+        text.close()
+    else:
+        text.detach()
+
+
+def detect_encoding(sample):
+    """
+    判断文本文件的编码
+    :param sample: 文件开头的字节
+    :return: IMPORT_CSV_ENCODINGS 中第一个能解码的编码
+    """
+    for encoding in Config.IMPORT_CSV_ENCODINGS:
+        try:
+            sample.decode(encoding)
+            return encoding
+        except UnicodeDecodeError as e:
+            # 截断在多字节字符中间不算解码失败
+            if e.start >= len(sample) - 4:
+                return encoding
+    return Config.IMPORT_CSV_ENCODINGS[0]
+
+
+def parse_workbook(file, filename=None):
+    """
+    内存解析流水文件（只读取一次）
+    :param file: 文件路径或文件对象
+    :param filename: 原始文件名（用于判断扩展名），默认取 file 的路径
+    :return: ParsedWorkbook
+    """
+    filename = (filename or str(file)).lower()
+    if filename.endswith('.parquet'):
+        return parse_parquet(file)
+
+    if filename.endswith('.csv'):
+        # 标题行与数据行的列数不同，逐行读取后再组成DataFrame
+        text = open_csv_text(file)
+        try:
+            raw = pd.DataFrame(list(csv.reader(text)))
+        finally:
+            close_csv_text(text)
+    else:
+        raw = pd.read_excel(file, sheet_name=0, header=None)
+    first_cell = raw.iloc[0, 0] if len(raw) > 0 else ''
+    workbook_format = detect_format(first_cell)
+
+    # 格式B跳过标题行和表头行，格式A只跳过表头行
+    header_rows = 2 if workbook_format == 'B' else 1
+    data = raw.iloc[header_rows:].reset_index(drop=True)
+    title = str(first_cell) if workbook_format == 'B' else None
+    return ParsedWorkbook(workbook_format, title, data)
+
+
+def parse_parquet(file):
+    """
+    读取Parquet文件（列式，一次读入内存）
+    字段名即表头，字段顺序与Excel相同（第1列日期、交易1-20，最后一行为总计行），按格式A处理
+    需要安装 pyarrow 或 fastparquet
+    :param file: 文件路径或文件对象
+    :return: ParsedWorkbook
+    """
+    if not parquet_supported():
+        raise ValueError('服务器未安装 pyarrow，无法导入Parquet文件')
+
+    data = pd.read_parquet(file)
+    data.columns = range(data.shape[1])
+    return ParsedWorkbook('A', None, data)
+
+
+def parquet_supported():
+    """是否安装了Parquet读取引擎"""
+    for module in ('pyarrow', 'fastparquet'):
+        try:
+            __import__(module)
+            return True
+        except ImportError:
+            pass
+    return False
+
+
+def _file_size(file):
+    """获取文件大小（文件路径或可seek的文件对象）"""
+    if isinstance(file, (str, os.PathLike)):
+        return os.path.getsize(file)
+    position = file.tell()
+    file.seek(0, os.SEEK_END)
+    size = file.tell()
+    file.seek(position)
+    return size
+
+
+def open_workbook(file, filename=None, streaming=None):
+    """
+    打开流水文件，按扩展名和文件大小选择读取方式
+    - .csv 默认流式读取，.parquet 总是按列读取
+    - .xlsx 超过 IMPORT_STREAM_THRESHOLD 时流式读取，.xls 总是用pandas读取
+    :param file: 文件路径或文件对象
+    :param filename: 原始文件名（用于判断扩展名），默认取 file 的路径
+    :param streaming: True/False 强制指定.xlsx和.csv的读取方式，None表示自动选择
+    :return: ParsedWorkbook、WorkbookStream 或 CsvStream
+    """
+    filename = (filename or str(file)).lower()
+    if filename.endswith('.csv'):
+        return CsvStream(file) if streaming is not False else parse_workbook(file, filename)
+    if filename.endswith('.parquet'):
+        return parse_parquet(file)
+    if filename.endswith('.xls'):
+        # openpyxl 不支持旧版 .xls
+        streaming = False
+    elif streaming is None:
+        streaming = _file_size(file) >= Config.IMPORT_STREAM_THRESHOLD
+
+    if streaming:
+        return WorkbookStream(file)
+    return parse_workbook(file, filename)
+
+
+def resolve_customer(cursor, user_mode, excel_customer_name, custom_username='', existing_customer_id=None):
+    """
+    确定导入的目标客户
+    :param user_mode: 'new' 按用户名查找或新建客户，其他值表示使用 existing_customer_id
+    :param excel_customer_name: Excel中解析出的客户名（未填写用户名时使用）
+    :return: (客户ID, 客户名, 是否新建)
+    :raises ValueError: 未选择已有用户或用户不存在时
+    """
+    if user_mode == 'new':
+        customer_name = custom_username.strip() if custom_username else excel_customer_name
+
+        cursor.execute('SELECT id FROM users WHERE username = ?', (customer_name,))
+        customer = cursor.fetchone()
+        if customer:
+            return customer['id'], customer_name, False
+
+        password_hash = generate_password_hash('123456')
+        cursor.execute('''
+            INSERT INTO users (username, password_hash, role)
+            VALUES (?, ?, ?)
+        ''', (customer_name, password_hash, 'customer'))
+        return cursor.lastrowid, customer_name, True
+
+    if not existing_customer_id:
+        raise ValueError('请选择已有用户')
+
+    customer_id = int(existing_customer_id)
+    cursor.execute('SELECT username FROM users WHERE id = ?', (customer_id,))
+    user = cursor.fetchone()
+    if not user:
+        raise ValueError('用户不存在')
+    return customer_id, user['username'], False
+
+
+def run_import(conn, workbook, options, progress=None):
+    """
+    执行一次导入：确定客户并写入数据
+    不提交事务，由调用方提交或回滚
+    :param workbook: open_workbook 的返回值
+    :param options: 导入选项字典（user_mode、custom_username、existing_customer_id、period_number）
+    :param progress: 每批写入后调用 progress(累计明细条数)
+    :return: 结果字典（导入摘要 + customer_id、customer_name、is_new_user、period_number）
+    """
+    cursor = conn.cursor()
+    customer_id, customer_name, is_new_user = resolve_customer(
+        cursor,
+        options.get('user_mode', 'new'),
+        workbook.customer_name,
+        options.get('custom_username', ''),
+        options.get('existing_customer_id')
+    )
+    period_number = options.get('period_number') or 1
+
+    # 同一文件已导入到该期数时不再写入
+    result = find_applied_import(cursor, customer_id, period_number, workbook.content_hash)
+    if result:
+        result.update({'format': workbook.format, 'duplicate': True})
+    else:
+        result = workbook.save(conn, customer_id, period_number, progress)
+        result['duplicate'] = False
+    result.update({
+        'customer_id': customer_id,
+        'customer_name': customer_name,
+        'is_new_user': is_new_user,
+        'period_number': period_number
+    })
+    return result
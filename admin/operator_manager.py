@@ -6,6 +6,7 @@
 from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for
 from functools import wraps
 from database import get_db, close_db
+from cache import stats_cache, invalidate_customer
 
 operator_bp = Blueprint('operator', __name__, url_prefix='/admin/operators')
 
@@ -73,6 +74,7 @@ def add_operator():
         )
         operator_id = cursor.lastrowid
         conn.commit()
+        invalidate_customer(customer_id or None)
         
         return jsonify({
             'success': True,
@@ -94,12 +96,17 @@ def delete_operator(operator_id):
     cursor = conn.cursor()
     
     try:
+        cursor.execute('SELECT customer_id FROM operators WHERE id = ?', (operator_id,))
+        operator = cursor.fetchone()
+        
         # 先删除关联的支付渠道
         cursor.execute('DELETE FROM payment_channels WHERE operator_id = ?', (operator_id,))
         
         # 删除操作员
         cursor.execute('DELETE FROM operators WHERE id = ?', (operator_id,))
         conn.commit()
+        if operator:
+            invalidate_customer(operator['customer_id'])
         
         return jsonify({'success': True, 'message': '操作员删除成功'})
     except Exception as e:
@@ -138,6 +145,10 @@ def add_channel(operator_id):
         )
         conn.commit()
         
+        cursor.execute('SELECT customer_id FROM operators WHERE id = ?', (operator_id,))
+        operator = cursor.fetchone()
+        invalidate_customer(operator['customer_id'] if operator else None)
+        
         return jsonify({
             'success': True,
             'message': '支付渠道添加成功'
@@ -157,8 +168,16 @@ def delete_channel(channel_id):
     cursor = conn.cursor()
     
     try:
+        cursor.execute('''
+            SELECT o.customer_id FROM payment_channels pc
+            JOIN operators o ON pc.operator_id = o.id
+            WHERE pc.id = ?
+        ''', (channel_id,))
+        channel = cursor.fetchone()
+        
         cursor.execute('DELETE FROM payment_channels WHERE id = ?', (channel_id,))
         conn.commit()
+        invalidate_customer(channel['customer_id'] if channel else None)
         
         return jsonify({'success': True, 'message': '支付渠道删除成功'})
     except Exception as e:
@@ -176,36 +195,40 @@ def api_list_customer_operators(customer_id):
     cursor = conn.cursor()
     
     try:
-        cursor.execute('''
-            SELECT o.id, o.name, 
-                   GROUP_CONCAT(pc.id || ':' || pc.name) as channels
-            FROM operators o
-            LEFT JOIN payment_channels pc ON o.id = pc.operator_id
-            WHERE (o.customer_id = ? OR o.customer_id IS NULL) AND o.is_active = 1
-            GROUP BY o.id
-            ORDER BY o.name
-        ''', (customer_id,))
+        # 操作员列表（缓存，该客户或公共操作员变化时失效）
+        def load_operators():
+            cursor.execute('''
+                SELECT o.id, o.name, 
+                       GROUP_CONCAT(pc.id || ':' || pc.name) as channels
+                FROM operators o
+                LEFT JOIN payment_channels pc ON o.id = pc.operator_id
+                WHERE (o.customer_id = ? OR o.customer_id IS NULL) AND o.is_active = 1
+                GROUP BY o.id
+                ORDER BY o.name
+            ''', (customer_id,))
         
-        operators = []
-        for row in cursor.fetchall():
-            operator = {
-                'id': row['id'],
-                'name': row['name'],
-                'channels': []
-            }
-            
-            # 解析渠道
-            if row['channels']:
-                for channel_str in row['channels'].split(','):
-                    parts = channel_str.split(':')
-                    if len(parts) >= 2:
-                        operator['channels'].append({
-                            'id': int(parts[0]),
-                            'name': parts[1]
-                        })
+            operators = []
+            for row in cursor.fetchall():
+                operator = {
+                    'id': row['id'],
+                    'name': row['name'],
+                    'channels': []
+                }
             
-            operators.append(operator)
+                # 解析渠道
+                if row['channels']:
+                    for channel_str in row['channels'].split(','):
+                        parts = channel_str.split(':')
+                        if len(parts) >= 2:
+                            operator['channels'].append({
+                                'id': int(parts[0]),
+                                'name': parts[1]
+                            })
             
+                operators.append(operator)
+            return operators
+        
+        operators = stats_cache.get_or_set(('operators', customer_id), load_operators, conn)
         return jsonify({'operators': operators})
     finally:
         close_db(conn)
@@ -219,38 +242,42 @@ def api_list_operators():
     cursor = conn.cursor()
     
     try:
-        cursor.execute('''
-            SELECT o.id, o.name, 
-                   GROUP_CONCAT(pc.id || ':' || pc.name) as channels
-            FROM operators o
-            LEFT JOIN payment_channels pc ON o.id = pc.operator_id
-            WHERE o.is_active = 1
-            GROUP BY o.id
-            ORDER BY o.name
-        ''')
+        # 全部操作员列表（缓存，任一操作员变化时失效）
+        def load_operators():
+            cursor.execute('''
+                SELECT o.id, o.name, 
+                       GROUP_CONCAT(pc.id || ':' || pc.name) as channels
+                FROM operators o
+                LEFT JOIN payment_channels pc ON o.id = pc.operator_id
+                WHERE o.is_active = 1
+                GROUP BY o.id
+                ORDER BY o.name
+            ''')
         
-        operators = []
-        for row in cursor.fetchall():
-            operator = {
-                'id': row['id'],
-                'name': row['name']
-            }
+            operators = []
+            for row in cursor.fetchall():
+                operator = {
+                    'id': row['id'],
+                    'name': row['name']
+                }
             
-            # 解析渠道
-            if row['channels']:
-                channels = []
-                for channel_str in row['channels'].split(','):
-                    channel_id, channel_name = channel_str.split(':')
-                    channels.append({
-                        'id': int(channel_id),
-                        'name': channel_name
-                    })
-                operator['channels'] = channels
-            else:
-                operator['channels'] = []
+                # 解析渠道
+                if row['channels']:
+                    channels = []
+                    for channel_str in row['channels'].split(','):
+                        channel_id, channel_name = channel_str.split(':')
+                        channels.append({
+                            'id': int(channel_id),
+                            'name': channel_name
+                        })
+                    operator['channels'] = channels
+                else:
+                    operator['channels'] = []
             
-            operators.append(operator)
+                operators.append(operator)
+            return operators
         
+        operators = stats_cache.get_or_set(('operators', None), load_operators, conn)
         return jsonify({'operators': operators})
     finally:
         close_db(conn)
@@ -274,7 +301,7 @@ def stats():
                 SUM(CASE WHEN dr.status = 'pending' THEN dr.amount ELSE 0 END) as pending_amount,
                 COUNT(CASE WHEN dr.status = 'done' THEN 1 END) as completed_count
             FROM operators o
-            LEFT JOIN daily_records dr ON o.id = dr.operator_id
+            LEFT JOIN daily_records dr ON o.id = dr.operator_id AND dr.is_daily_summary = 0
             WHERE o.is_active = 1
             GROUP BY o.id
             ORDER BY completed_amount DESC
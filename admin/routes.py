@@ -3,17 +3,24 @@
 处理管理员仪表盘、Excel导入、目标管理、记录查看等功能
 """
 
-from flask import render_template, request, redirect, url_for, session, jsonify, flash
-import pandas as pd
+from flask import render_template, request, redirect, url_for, session, jsonify, flash, Response, stream_with_context
 from datetime import datetime, timedelta
-from database import get_db, close_db
+from database import get_db, close_db, DatabaseManager
+from cache import stats_cache, invalidate_customer
+from config import Config
+from record_search import SearchFilter, search_response, stream_search_json
+from stats import count_records, query_customer_stats
+from .importer import run_import
+from .import_cache import load_workbook
+from .import_jobs import write_lock
 from utils import (
     require_admin,
     parse_date_from_form,
     parse_date_range_from_request,
-    log_action
+    validate_file_upload,
+    log_action,
+    KeysetPagination
 )
-from werkzeug.security import generate_password_hash
 
 
 @require_admin
@@ -26,42 +33,39 @@ def dashboard():
     cursor = conn.cursor()
     
     try:
-        # 获取统计信息
-        # 1. 客户总数（从users表获取，确保实时准确）
-        cursor.execute('SELECT COUNT(*) FROM users WHERE role = "customer"')
-        customer_count = cursor.fetchone()[0]
+        # 获取统计信息（缓存，写入流水、目标或客户时失效）
+        def load_stats():
+            # 1. 客户总数（从users表获取）
+            cursor.execute('SELECT COUNT(*) FROM users WHERE role = "customer"')
+            customer_count = cursor.fetchone()[0]
+
+            # 2. 流水统计（从每日汇总表获取）
+            cursor.execute('''
+                SELECT SUM(done_amount) as completed, SUM(total) as total
+                FROM daily_aggregates
+            ''')
+            flow_stats = cursor.fetchone()
+
+            return {
+                'customer_count': customer_count,
+                'completed': flow_stats['completed'] if flow_stats else 0,
+                'total': flow_stats['total'] if flow_stats else 0
+            }
 
-        # 2. 流水统计（从daily_records表获取）
-        cursor.execute('''
-            SELECT 
-                   SUM(CASE WHEN status = 'done' THEN amount ELSE 0 END) as completed,
-                   SUM(amount) as total
-            FROM daily_records WHERE is_daily_summary = 0
-        ''')
-        flow_stats = cursor.fetchone()
-        
-        # 合并统计数据
-        stats = {
-            'customer_count': customer_count,
-            'completed': flow_stats['completed'] if flow_stats else 0,
-            'total': flow_stats['total'] if flow_stats else 0
-        }
+        stats = stats_cache.get_or_set(('admin_dashboard', None), load_stats, conn)
         
         # 获取所有客户
         cursor.execute('SELECT * FROM users WHERE role = "customer" ORDER BY created_at DESC')
         customers = cursor.fetchall()
 
-        # 获取所有目标列表（带统计）
+        # 获取所有目标列表（带进度，来自目标进度表）
         cursor.execute('''
             SELECT mt.*, u.username,
-                   (SELECT SUM(amount) FROM daily_records dr 
-                    WHERE dr.customer_id = mt.customer_id 
-                    AND dr.date >= mt.start_date 
-                    AND dr.date <= mt.end_date 
-                    AND dr.status = 'done'
-                    AND dr.is_daily_summary = 0) as completed_amount
+                   tp.completed_amount, tp.completed_count,
+                   tp.updated_at as progress_updated_at
             FROM monthly_targets mt
             JOIN users u ON mt.customer_id = u.id
+            LEFT JOIN target_progress tp ON tp.target_id = mt.id
             ORDER BY u.username, mt.period_number
         ''')
         targets = cursor.fetchall()
@@ -102,218 +106,46 @@ def import_excel():
                                      error='请选择文件')
             
             file = request.files['file']
-            if file.filename == '':
+            is_valid, error = validate_file_upload(file)
+            if not is_valid:
                 return render_template('admin/import_excel.html', 
                                      customers=customers,
-                                     error='请选择文件')
+                                     error=error)
             
-            # 获取用户选择模式
-            user_mode = request.form.get('user_mode', 'new')
-            existing_customer_id = request.form.get('existing_customer_id')
-            
-            if file and file.filename.endswith(('.xlsx', '.xls')):
+            if file:
                 try:
-                    # 先读取前几行判断Excel格式
-                    df_raw = pd.read_excel(file, sheet_name=0, header=None, nrows=3)
-                    first_row = str(df_raw.iloc[0, 0]) if len(df_raw) > 0 else ''
-                    
-                    # 判断Excel格式
-                    if '至' in first_row and len(first_row.split()) >= 2:
-                        # 格式B：有标题行（如"2026-01-27至2026-02-27 李先生流水表"）
-                        df = pd.read_excel(file, sheet_name=0, header=1)  # 从第2行作为表头
-                        first_cell = first_row  # 使用第0行提取信息
-                        print(f"[DEBUG] 检测到格式B（带标题行），从第2行开始读取数据")
-                    else:
-                        # 格式A：无标题行（如"50万流水1.xlsx"），第一行就是表头
-                        df = pd.read_excel(file, sheet_name=0)  # 从第1行作为表头
-                        first_cell = 'Unknown'  # 无法提取标题信息
-                        print(f"[DEBUG] 检测到格式A（无标题行），从第1行开始读取数据")
-                    
-                    # 解析日期范围和客户名（仅格式B可以提取）
-                    date_range = ''
-                    excel_customer_name = 'Unknown'
-                    
-                    if first_cell != 'Unknown':
-                        parts = first_cell.split()
-                        date_range = parts[0] if len(parts) > 0 else ''
-                        excel_customer_name = ' '.join(parts[1:]) if len(parts) > 1 else 'Unknown'
-                        # 清理客户名
-                        excel_customer_name = excel_customer_name.replace('流水表', '').strip()
-                    
-                    # 格式A：使用统一提取方式从数据中获取日期范围和目标金额
-                    if date_range == '' and len(df) > 0:
-                        # 起始日期：第一行第一列
-                        first_date = str(df.iloc[0, 0])
-                        
-                        # 结束日期：倒数第二行第一列（排除总计行）
-                        if len(df) >= 2:
-                            last_date = str(df.iloc[-2, 0])
-                        else:
-                            last_date = first_date
-                        
-                        # 目标金额：最后一行最后一列
-                        if len(df) >= 1:
-                            last_row = df.iloc[-1]
-                            last_column_value = last_row.iloc[-1]
-                            try:
-                                total_amount = float(last_column_value) if pd.notna(last_column_value) else 0
-                                print(f"[DEBUG] 格式A：从最后一行最后一列提取目标金额: {total_amount}")
-                            except (ValueError, TypeError):
-                                total_amount = 0
-                        
-                        date_range = f'{first_date}至{last_date}'
-                        print(f"[DEBUG] 格式A：从数据推断日期范围: {date_range}")
-                    
-                    # 解析日期
-                    if '至' in date_range:
-                        start_date, end_date = date_range.split('至')
-                    else:
-                        start_date = end_date = date_range
-                    
-                    # 验证日期不为空
-                    if not start_date or not end_date:
-                        start_date = end_date = datetime.now().strftime('%Y-%m-%d')
-                        print(f"[DEBUG] Excel日期为空，使用当前日期: {start_date}")
-                    
-                    # 生成年月
-                    year_month = start_date[:7] if start_date else datetime.now().strftime('%Y-%m')
-                    
-                    # 格式B：从最后一行最后一列获取目标金额（如果格式A还没获取）
-                    if total_amount == 0 and len(df) > 0:
-                        last_row = df.iloc[-1]
-                        last_column_value = last_row.iloc[-1]
-                        try:
-                            total_amount = float(last_column_value) if pd.notna(last_column_value) else 0
-                            print(f"[DEBUG] 格式B：从最后一行最后一列提取目标金额: {total_amount}")
-                        except (ValueError, TypeError):
-                            total_amount = 0
-                    
-                    # 处理客户账户
-                    if user_mode == 'new':
-                        custom_username = request.form.get('custom_username', '').strip()
-                        customer_name = custom_username if custom_username else excel_customer_name
-                        
-                        cursor.execute('SELECT id FROM users WHERE username = ?', (customer_name,))
-                        customer = cursor.fetchone()
-                        
-                        if not customer:
-                            password_hash = generate_password_hash('123456')
-                            cursor.execute('''
-                                INSERT INTO users (username, password_hash, role)
-                                VALUES (?, ?, ?)
-                            ''', (customer_name, password_hash, 'customer'))
-                            customer_id = cursor.lastrowid
-                            is_new_user = True
-                        else:
-                            customer_id = customer['id']
-                            is_new_user = False
-                    else:
-                        if not existing_customer_id:
-                            return render_template('admin/import_excel.html', 
-                                                 customers=customers,
-                                                 error='请选择已有用户')
-                        
-                        customer_id = int(existing_customer_id)
-                        cursor.execute('SELECT username FROM users WHERE id = ?', (customer_id,))
-                        user = cursor.fetchone()
-                        customer_name = user['username']
-                        is_new_user = False
-                    
-                    # 1. 预扫描日期范围 (用于验证和冲突检查)
-                    import_dates = []
-                    for idx, row in df.iterrows():
-                        date_str = str(row.iloc[0]) if len(row) > 0 else ''
-                        if date_str and date_str != '总计' and date_str != 'nan':
-                            import_dates.append(date_str)
-                    
-                    if not import_dates:
-                        actual_start_date = start_date or datetime.now().strftime('%Y-%m-%d')
-                        actual_end_date = end_date or datetime.now().strftime('%Y-%m-%d')
-                    else:
-                        import_dates.sort()
-                        actual_start_date = import_dates[0]
-                        actual_end_date = import_dates[-1]
-
-                    # 2. 获取期数
-                    period_number = request.form.get('period_number', 1)
+                    # 打开Excel（同一文件命中解析缓存，大文件自动使用流式读取）
+                    workbook = load_workbook(file, file.filename)
+                    print(f"[DEBUG] 检测到格式{workbook.format}，读取方式: {type(workbook).__name__}")
                     
-                    # 3. 验证日期冲突 (检查与其他期数是否重叠)
-                    cursor.execute('''
-                        SELECT period_number, start_date, end_date 
-                        FROM monthly_targets 
-                        WHERE customer_id = ? AND period_number != ?
-                    ''', (customer_id, period_number))
-                    existing_targets = cursor.fetchall()
-
-                    for target in existing_targets:
-                        # 检查重叠: max(start1, start2) <= min(end1, end2)
-                        if max(actual_start_date, target['start_date']) <= min(actual_end_date, target['end_date']):
-                             raise ValueError(f"日期范围冲突：导入的数据 ({actual_start_date} 至 {actual_end_date}) 与第 {target['period_number']} 期 ({target['start_date']} 至 {target['end_date']}) 重叠")
-
-                    # 4. 清理旧数据 (仅清理当前期数的数据)
-                    # 获取当前期数旧的日期范围，以便删除对应的流水记录
-                    cursor.execute('SELECT start_date, end_date FROM monthly_targets WHERE customer_id = ? AND period_number = ?', (customer_id, period_number))
-                    current_target = cursor.fetchone()
-                    
-                    if current_target:
-                        # 删除旧范围内的流水记录
-                        cursor.execute('DELETE FROM daily_records WHERE customer_id = ? AND date >= ? AND date <= ?', (customer_id, current_target['start_date'], current_target['end_date']))
-                        # 删除旧目标
-                        cursor.execute('DELETE FROM monthly_targets WHERE customer_id = ? AND period_number = ?', (customer_id, period_number))
-                    
-                    # 5. 插入每日流水
-                    record_count = 0
-                    for idx, row in df.iterrows():
-                        date_str = str(row.iloc[0]) if len(row) > 0 else ''
-                        
-                        if date_str and date_str != '总计' and date_str != 'nan':
-                            # 解析交易1-20
-                            daily_records = []
-                            for i in range(1, 21):
-                                try:
-                                    amount = float(row.iloc[i]) if len(row) > i and pd.notna(row.iloc[i]) else 0
-                                    if amount > 0:
-                                        cursor.execute('''
-                                            INSERT INTO daily_records 
-                                            (customer_id, date, amount, status)
-                                            VALUES (?, ?, ?, ?)
-                                        ''', (customer_id, date_str, amount, 'pending'))
-                                        daily_records.append(amount)
-                                        record_count += 1
-                                except (ValueError, IndexError):
-                                    pass
-                            
-                            # 创建当日汇总记录
-                            if daily_records:
-                                daily_total = sum(daily_records)
-                                cursor.execute('''
-                                    INSERT INTO daily_records 
-                                    (customer_id, date, amount, daily_total, status, is_daily_summary)
-                                    VALUES (?, ?, ?, ?, ?, ?)
-                                ''', (customer_id, date_str, daily_total, daily_total, 'pending', 1))
-
-                    # 6. 插入月度目标
-                    print(f"[DEBUG] 插入月度目标: start_date={actual_start_date}, end_date={actual_end_date}, amount={total_amount}, period={period_number}")
-                    cursor.execute('''
-                        INSERT INTO monthly_targets 
-                        (customer_id, year_month, start_date, end_date, target_amount, period_number)
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    ''', (customer_id, year_month, actual_start_date, actual_end_date, total_amount, period_number))
-                    
-                    conn.commit()
+                    # 确定客户，校验日期冲突、替换旧数据并批量写入
+                    options = {
+                        'user_mode': request.form.get('user_mode', 'new'),
+                        'custom_username': request.form.get('custom_username', ''),
+                        'existing_customer_id': request.form.get('existing_customer_id'),
+                        'period_number': request.form.get('period_number', 1)
+                    }
+                    with write_lock:
+                        summary = run_import(conn, workbook, options)
+                        conn.commit()
+                    invalidate_customer(summary['customer_id'])
+                    customer_id = summary['customer_id']
+                    period_number = summary['period_number']
                     
                     # 记录日志
                     log_action('EXCEL_IMPORT', session['user_id'], 
-                              f'导入Excel: 客户ID {customer_id}, 期数 {period_number}, 日期 {actual_start_date} 至 {actual_end_date}, 总额 {total_amount}')
+                              f'导入Excel: 客户ID {customer_id}, 期数 {period_number}, 日期 {summary["actual_start_date"]} 至 {summary["actual_end_date"]}, 总额 {summary["total_amount"]}')
                     
                     return render_template('admin/import_excel.html', 
                                          success=True,
-                                         customer_name=customer_name,
-                                         start_date=start_date,
-                                         end_date=end_date,
-                                         total_amount=total_amount,
-                                         record_count=record_count,
-                                         is_new_user=is_new_user)
+                                         customer_name=summary['customer_name'],
+                                         start_date=summary['start_date'],
+                                         end_date=summary['end_date'],
+                                         total_amount=summary['total_amount'],
+                                         record_count=summary['record_count'],
+                                         changes=summary['changes'],
+                                         duplicate=summary['duplicate'],
+                                         is_new_user=summary['is_new_user'])
                 
                 except Exception as e:
                     conn.rollback()
@@ -396,16 +228,21 @@ def add_target():
                     if days_to_fill > 0:
                         daily_amount = target_amount / days_to_fill
                         
-                        for i in range(days_to_fill):
-                            fill_date = (start + timedelta(days=i)).strftime('%Y-%m-%d')
-                            
-                            cursor.execute('''
-                                INSERT INTO daily_records 
-                                (customer_id, date, amount, daily_total, status, operator, is_daily_summary)
-                                VALUES (?, ?, ?, ?, ?, ?, ?)
-                            ''', (customer_id, fill_date, daily_amount, daily_amount, 'done', fill_operator, 1))
+                        DatabaseManager(conn).insert_many('daily_records', (
+                            {
+                                'customer_id': customer_id,
+                                'date': (start + timedelta(days=i)).strftime('%Y-%m-%d'),
+                                'amount': daily_amount,
+                                'daily_total': daily_amount,
+                                'status': 'done',
+                                'operator': fill_operator,
+                                'is_daily_summary': 1
+                            }
+                            for i in range(days_to_fill)
+                        ))
                 
                 conn.commit()
+                invalidate_customer(customer_id)
                 
                 log_action('ADD_TARGET', session['user_id'], 
                           f'客户ID: {customer_id}, 年月: {year_month}, 期数: {period_number}, 金额: {target_amount}')
@@ -468,11 +305,13 @@ def edit_target(target_id):
 
                 cursor.execute('''
                     UPDATE monthly_targets
-                    SET start_date = ?, end_date = ?, target_amount = ?, year_month = ?
+                    SET start_date = ?, end_date = ?, target_amount = ?, year_month = ?,
+                        source_hash = NULL
                     WHERE id = ?
                 ''', (start_date, end_date, target_amount, year_month, target_id))
                 
                 conn.commit()
+                invalidate_customer(target['customer_id'])
                 
                 log_action('EDIT_TARGET', session['user_id'], 
                           f'修改目标ID: {target_id}, 金额: {target_amount}')
@@ -499,13 +338,15 @@ def delete_target(target_id):
     
     try:
         # 检查是否存在
-        cursor.execute('SELECT id FROM monthly_targets WHERE id = ?', (target_id,))
-        if not cursor.fetchone():
+        cursor.execute('SELECT id, customer_id FROM monthly_targets WHERE id = ?', (target_id,))
+        target = cursor.fetchone()
+        if not target:
             flash('未找到该目标', 'error')
             return redirect(url_for('admin.dashboard'))
             
         cursor.execute('DELETE FROM monthly_targets WHERE id = ?', (target_id,))
         conn.commit()
+        invalidate_customer(target['customer_id'])
         
         log_action('DELETE_TARGET', session['user_id'], f'删除目标ID: {target_id}')
         flash('目标已删除', 'success')
@@ -578,35 +419,9 @@ def add_record():
                     VALUES (?, ?, ?, ?, ?, ?)
                 ''', (customer_id, date, amount, status, operator_name, operator_id))
                 
-                # 更新或创建当日汇总
-                cursor.execute('''
-                    SELECT SUM(amount) as total FROM daily_records 
-                    WHERE customer_id = ? AND date = ? AND is_daily_summary = 0
-                ''', (customer_id, date))
-                result = cursor.fetchone()
-                
-                if result and result['total']:
-                    daily_total = result['total']
-                    cursor.execute('''
-                        SELECT id FROM daily_records 
-                        WHERE customer_id = ? AND date = ? AND is_daily_summary = 1
-                    ''', (customer_id, date))
-                    summary = cursor.fetchone()
-                    
-                    if summary:
-                        cursor.execute('''
-                            UPDATE daily_records 
-                            SET amount = ?, daily_total = ?
-                            WHERE id = ?
-                        ''', (daily_total, daily_total, summary['id']))
-                    else:
-                        cursor.execute('''
-                            INSERT INTO daily_records 
-                            (customer_id, date, amount, daily_total, status, is_daily_summary)
-                            VALUES (?, ?, ?, ?, ?, ?)
-                        ''', (customer_id, date, daily_total, daily_total, 'pending', 1))
-                
+                # 每日汇总（daily_aggregates）由触发器更新
                 conn.commit()
+                invalidate_customer(customer_id)
                 
                 log_action('ADD_RECORD', session['user_id'], 
                           f'客户ID: {customer_id}, 日期: {date}, 金额: {amount}')
@@ -629,6 +444,7 @@ def add_record():
 def view_records():
     """
     查看所有流水记录
+    按 (日期, ID) 游标分页，每页条数由服务端限制；总条数按每日汇总统计，只在第一页计算
     """
     conn = get_db()
     cursor = conn.cursor()
@@ -637,6 +453,13 @@ def view_records():
         # 获取参数
         customer_id = request.args.get('customer_id', type=int)
         start_date, end_date = parse_date_range_from_request(request)
+        pagination = KeysetPagination(
+            after=request.args.get('after'),
+            before=request.args.get('before'),
+            per_page=request.args.get('per_page'),
+            default_per_page=Config.RECORDS_PER_PAGE,
+            max_per_page=Config.RECORDS_MAX_PER_PAGE
+        )
         
         # 获取客户列表
         cursor.execute('SELECT * FROM users WHERE role = "customer"')
@@ -669,10 +492,32 @@ def view_records():
             query += ' AND dr.date <= ?'
             params.append(end_date)
         
-        query += ' ORDER BY dr.date ASC, dr.id DESC'
+        # 游标定位（使用日期索引，不扫描前面的页）
+        sort_columns = ['dr.date', 'dr.id']
+        seek, seek_params = pagination.where(sort_columns)
+        if seek:
+            query += ' AND ' + seek
+            params.extend(seek_params)
+        
+        query += f' ORDER BY {pagination.order_by(sort_columns)} LIMIT ?'
+        params.append(pagination.limit)
         
         cursor.execute(query, params)
-        records = cursor.fetchall()
+        pagination.paginate(cursor.fetchall(), key=lambda r: (r['date'], r['id']))
+        
+        # 总条数：第一页按每日汇总统计，翻页时沿用链接中的值（期间有写入时为近似值）
+        total = request.args.get('total', type=int)
+        if total is None and Config.RECORDS_COUNT_TOTAL:
+            total = count_records(conn, customer_id, start_date, end_date)
+        
+        # 翻页链接保留筛选条件
+        filters = {k: v for k, v in request.args.items() if k not in ('after', 'before', 'total')}
+        if total is not None:
+            filters['total'] = total
+        prev_url = url_for('admin.view_records', before=pagination.prev_cursor, **filters) \
+            if pagination.prev_cursor else None
+        next_url = url_for('admin.view_records', after=pagination.next_cursor, **filters) \
+            if pagination.next_cursor else None
         
         # 获取选中客户的目标列表（用于期数筛选）
         customer_targets = []
@@ -681,7 +526,11 @@ def view_records():
             customer_targets = cursor.fetchall()
         
         return render_template('admin/view_records.html', 
-                             records=records, 
+                             records=pagination.items, 
+                             pagination=pagination,
+                             total=total,
+                             prev_url=prev_url,
+                             next_url=next_url,
                              customers=customers,
                              selected_customer=customer_id,
                              start_date=start_date,
@@ -708,36 +557,10 @@ def reconciliation():
         cursor.execute('SELECT id, username FROM users WHERE role = "customer"')
         customers = cursor.fetchall()
         
-        # 按客户统计查询
-        customer_query = '''
-            SELECT u.username, 
-                   COUNT(CASE WHEN dr.status = 'done' THEN 1 END) as completed_count,
-                   SUM(CASE WHEN dr.status = 'done' THEN dr.amount ELSE 0 END) as completed,
-                   COUNT(*) as total_count,
-                   SUM(dr.amount) as total
-            FROM users u
-            LEFT JOIN daily_records dr ON u.id = dr.customer_id AND dr.is_daily_summary = 0
-            WHERE u.role = 'customer'
-        '''
-        
-        params = []
-        
-        if customer_id:
-            customer_query += ' AND u.id = ?'
-            params.append(customer_id)
-        
-        if start_date:
-            customer_query += ' AND (dr.date >= ? OR dr.date IS NULL)'
-            params.append(start_date)
-        
-        if end_date:
-            customer_query += ' AND (dr.date <= ? OR dr.date IS NULL)'
-            params.append(end_date)
-        
-        customer_query += ' GROUP BY u.id, u.username ORDER BY completed DESC'
-        
-        cursor.execute(customer_query, params)
-        customer_stats = cursor.fetchall()
+        # 按客户统计（统计引擎，一次查询；没有流水的客户各项为0）
+        stats = query_customer_stats(conn, [customer_id] if customer_id else None,
+                                     start_date, end_date)
+        customer_stats = sorted(stats.values(), key=lambda s: s['completed'], reverse=True)
         
         return render_template('admin/reconciliation.html',
                              customer_stats=customer_stats,
@@ -805,91 +628,27 @@ def customer_query_view(customer_id):
 
 @require_admin
 def customer_query_search(customer_id):
-    """执行客户流水查询（管理员版）"""
-    data = request.get_json()
+    """
+    执行客户流水查询（管理员版，默认只显示已刷流水，按日期倒序；可只查统计或分页查询，见 search_response）
+    参数 stream 为真时流式返回全部记录和统计（见 stream_search_json）
+    """
+    data = request.get_json(silent=True)
     print(f"DEBUG: customer_query_search called for customer_id={customer_id}")
     print(f"DEBUG: data={data}")
     
-    start_date = data.get('start_date', '')
-    end_date = data.get('end_date', '')
-    operator_id = data.get('operator_id', '')
-    channel_id = data.get('channel_id', '')
+    try:
+        search_filter = SearchFilter.from_request(customer_id, data, descending=True)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    if data and data.get('stream'):
+        generate = stream_search_json(get_db(), search_filter)
+        return Response(stream_with_context(generate), mimetype='application/json')
     
     conn = get_db()
-    cursor = conn.cursor()
     
     try:
-        # 构建查询
-        query = '''
-            SELECT dr.date, dr.amount, dr.status,
-                   CASE 
-                       WHEN dr.operator_id = 999 THEN '自己'
-                       WHEN dr.operator_id = 999999 THEN '管理员'
-                       ELSE o.name 
-                   END as operator_name,
-                   CASE 
-                       WHEN dr.channel_id = 1 THEN '微信支付'
-                       WHEN dr.channel_id = 2 THEN '支付宝'
-                       WHEN dr.channel_id = 3 THEN '其他渠道'
-                       ELSE pc.name 
-                   END as channel_name
-            FROM daily_records dr
-            LEFT JOIN operators o ON dr.operator_id = o.id
-            LEFT JOIN payment_channels pc ON dr.channel_id = pc.id
-            WHERE dr.customer_id = ? AND dr.is_daily_summary = 0 AND dr.status = 'done'
-        '''
-        params = [customer_id]
-        
-        if start_date:
-            query += ' AND dr.date >= ?'
-            params.append(start_date)
-        
-        if end_date:
-            query += ' AND dr.date <= ?'
-            params.append(end_date)
-            
-        if operator_id:
-            if operator_id == 'self':
-                query += ' AND dr.operator_id = 999'
-            else:
-                query += ' AND dr.operator_id = ?'
-                params.append(operator_id)
-                
-        if channel_id:
-            if channel_id == '0': # 不选择
-                query += ' AND (dr.channel_id = 0 OR dr.channel_id IS NULL)'
-            else:
-                query += ' AND dr.channel_id = ?'
-                params.append(channel_id)
-                
-        query += ' ORDER BY dr.date DESC'
-        
-        cursor.execute(query, params)
-        records = cursor.fetchall()
-        
-        # 统计
-        total_count = len(records)
-        total_amount = sum(r['amount'] for r in records)
-        
-        # 转换为字典列表
-        result_records = []
-        for r in records:
-            result_records.append({
-                'date': r['date'],
-                'amount': r['amount'],
-                'status': r['status'],
-                'operator_name': r['operator_name'],
-                'channel_name': r['channel_name']
-            })
-            
-        return jsonify({
-            'success': True,
-            'records': result_records,
-            'stats': {
-                'total_count': total_count,
-                'total_amount': total_amount
-            }
-        })
+        return jsonify({'success': True, **search_response(conn, search_filter, data)})
         
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
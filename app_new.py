@@ -7,6 +7,8 @@ from flask import Flask, render_template, session
 from flask_cors import CORS
 from config import config
 from database import init_db
+import database
+import cache
 import os
 import logging
 from logging.handlers import RotatingFileHandler
@@ -24,6 +26,12 @@ def create_app(config_name='default'):
     app.config.from_object(config[config_name])
     config[config_name].init_app(app)
     
+    # 注册数据库连接池
+    database.init_app(app)
+    
+    # 配置统计缓存
+    cache.init_app(app)
+    
     # 初始化数据库
     with app.app_context():
         init_db()
@@ -119,25 +127,30 @@ def create_app(config_name='default'):
         cursor = conn.cursor()
         
         try:
-            # 从daily_records表中获取所有不重复的操作人
-            if role == 'customer':
-                cursor.execute('''
-                    SELECT DISTINCT operator FROM daily_records 
-                    WHERE operator IS NOT NULL AND operator != '' 
-                    AND customer_id = ?
-                    ORDER BY operator DESC
-                    LIMIT 50
-                ''', (customer_id,))
-            else:
-                # 管理员可以看到所有
-                cursor.execute('''
-                    SELECT DISTINCT operator FROM daily_records 
-                    WHERE operator IS NOT NULL AND operator != ''
-                    ORDER BY operator DESC
-                    LIMIT 50
-                ''')
+            # 缓存，写入该客户的流水时失效
+            def load_operators():
+                # 从daily_records表中获取所有不重复的操作人
+                if role == 'customer':
+                    cursor.execute('''
+                        SELECT DISTINCT operator FROM daily_records 
+                        WHERE operator IS NOT NULL AND operator != '' 
+                        AND customer_id = ?
+                        ORDER BY operator DESC
+                        LIMIT 50
+                    ''', (customer_id,))
+                else:
+                    # 管理员可以看到所有
+                    cursor.execute('''
+                        SELECT DISTINCT operator FROM daily_records 
+                        WHERE operator IS NOT NULL AND operator != ''
+                        ORDER BY operator DESC
+                        LIMIT 50
+                    ''')
                 
-            operators = [row['operator'] for row in cursor.fetchall()]
+                return [row['operator'] for row in cursor.fetchall()]
+            
+            scope = customer_id if role == 'customer' else None
+            operators = cache.stats_cache.get_or_set(('operator_names', scope), load_operators, conn)
             
             return jsonify({'operators': operators})
         finally:
@@ -166,6 +179,9 @@ def create_app(config_name='default'):
         cursor = conn.cursor()
         
         try:
+            cursor.execute('SELECT customer_id FROM daily_records WHERE id = ?', (record_id,))
+            record = cursor.fetchone()
+            
             # 更新记录
             cursor.execute('''
                 UPDATE daily_records 
@@ -174,6 +190,8 @@ def create_app(config_name='default'):
             ''', (operator, status, record_id))
             
             conn.commit()
+            if record:
+                cache.invalidate_customer(record['customer_id'])
             
             return jsonify({'success': True})
         except Exception as e:
@@ -202,6 +220,9 @@ def create_app(config_name='default'):
         cursor = conn.cursor()
         
         try:
+            cursor.execute('SELECT customer_id FROM daily_records WHERE id = ?', (record_id,))
+            record = cursor.fetchone()
+            
             if status == 'pending':
                 # 取消标记，清空操作员和渠道
                 cursor.execute('''
@@ -218,6 +239,8 @@ def create_app(config_name='default'):
                 ''', (operator_id, channel_id, status, record_id))
             
             conn.commit()
+            if record:
+                cache.invalidate_customer(record['customer_id'])
             
             return jsonify({'success': True})
         except Exception as e:
@@ -233,54 +256,65 @@ def create_app(config_name='default'):
         from flask import jsonify
         from database import get_db, close_db
         from datetime import datetime
+        from stats import get_stats
         
-        conn = get_db()
-        cursor = conn.cursor()
+        today = datetime.now().strftime('%Y-%m-%d')
+        
+        def load_stats():
+            conn = get_db()
+            try:
+                # 已完成、待刷、今日流水和最近一期目标（统计引擎，一次查询）
+                stats = get_stats(conn, customer_id, today=today, with_target=True)
+                completed = stats['completed']
+                pending = stats['pending']
+                total_flow = completed + pending
+                daily_flow = stats['today']
+                target_amount = stats['target_amount'] or 0
+                
+                # 计算当日完成度
+                daily_completion_rate = (daily_flow / target_amount * 100) if target_amount > 0 else 0
+                
+                return {
+                    'completed_flow': completed,
+                    'pending_flow': pending,
+                    'total_flow': total_flow,
+                    'daily_flow': daily_flow,
+                    'target_amount': target_amount,
+                    'daily_completion_rate': daily_completion_rate
+                }
+            finally:
+                close_db(conn)
+        
+        # 缓存按客户和日期区分，写入该客户的流水或目标时失效
+        return jsonify(cache.stats_cache.get_or_set(('customer_stats', customer_id, today), load_stats))
+    
+    # API路由 - 统计缓存命中情况（仅管理员）
+    @app.route('/api/cache/status')
+    def get_cache_status():
+        """获取统计缓存的命中率和条目数"""
+        from flask import jsonify
         
+        if session.get('role') != 'admin':
+            return jsonify({'success': False, 'error': 'Unauthorized'}), 401
+        
+        return jsonify({'success': True, 'cache': cache.stats_cache.get_stats()})
+    
+    # API路由 - 数据库运行状态（仅管理员）
+    @app.route('/api/db/status')
+    def get_db_status():
+        """获取数据库连接池统计和当前生效的引擎参数"""
+        from flask import jsonify
+        from database import get_db, close_db, get_pool_stats, get_engine_settings
+        
+        if session.get('role') != 'admin':
+            return jsonify({'success': False, 'error': 'Unauthorized'}), 401
+        
+        conn = get_db()
         try:
-            # 获取已完成流水
-            cursor.execute('''
-                SELECT SUM(amount) as completed FROM daily_records 
-                WHERE customer_id = ? AND status = 'done' AND is_daily_summary = 0
-            ''', (customer_id,))
-            completed = cursor.fetchone()['completed'] or 0
-            
-            # 获取待刷流水
-            cursor.execute('''
-                SELECT SUM(amount) as pending FROM daily_records 
-                WHERE customer_id = ? AND status = 'pending' AND is_daily_summary = 0
-            ''', (customer_id,))
-            pending = cursor.fetchone()['pending'] or 0
-            
-            # 获取总流水
-            total_flow = completed + pending
-            
-            # 获取今日流水
-            today = datetime.now().strftime('%Y-%m-%d')
-            cursor.execute('''
-                SELECT SUM(amount) as daily FROM daily_records 
-                WHERE customer_id = ? AND date = ? AND is_daily_summary = 0
-            ''', (customer_id, today))
-            daily_flow = cursor.fetchone()['daily'] or 0
-            
-            # 获取月度目标
-            cursor.execute('''
-                SELECT target_amount FROM monthly_targets 
-                WHERE customer_id = ? ORDER BY year_month DESC LIMIT 1
-            ''', (customer_id,))
-            target_row = cursor.fetchone()
-            target_amount = target_row['target_amount'] if target_row else 0
-            
-            # 计算当日完成度
-            daily_completion_rate = (daily_flow / target_amount * 100) if target_amount > 0 else 0
-            
             return jsonify({
-                'completed_flow': completed,
-                'pending_flow': pending,
-                'total_flow': total_flow,
-                'daily_flow': daily_flow,
-                'target_amount': target_amount,
-                'daily_completion_rate': daily_completion_rate
+                'success': True,
+                'pool': get_pool_stats(),
+                'engine': get_engine_settings(conn)
             })
         finally:
             close_db(conn)
@@ -0,0 +1,175 @@
+"""
+批量导入脚本 - 流水管理系统
+将一个目录中的流水文件（.xlsx/.xls/.csv/.parquet）批量导入数据库
+
+解析在多个进程中并行进行（规则与后台导入相同：格式A/B判断、跳过总计行、最后一格为目标金额），
+写入由主进程单独完成，每个文件一个保存点，每 --commit-every 个文件提交一次。
+
+对应关系文件为CSV，表头为 file,customer,period：
+    file      文件名（相对于目录）
+    customer  客户用户名（不存在时自动创建，默认密码123456），或 #客户ID 表示已有客户
+    period    期数，默认为1
+
+使用方法：
+    python batch_import.py <目录> --mapping mapping.csv [--workers 4] [--commit-every 10]
+"""
+
+import argparse
+import csv
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from config import Config
+
+
+def read_mapping(path):
+    """
+    读取文件与客户/期数的对应关系
+    :return: {文件名: 导入选项字典}
+    """
+    mapping = {}
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        for line, row in enumerate(csv.DictReader(f), start=2):
+            filename = (row.get('file') or '').strip()
+            customer = (row.get('customer') or '').strip()
+            if not filename or not customer:
+                print(f"[ERROR] 对应关系第 {line} 行缺少 file 或 customer")
+                sys.exit(1)
+
+            options = {'period_number': int(row.get('period') or 1)}
+            if customer.startswith('#'):
+                options.update(user_mode='existing', existing_customer_id=int(customer[1:]))
+            else:
+                options.update(user_mode='new', custom_username=customer)
+            mapping[filename] = options
+    return mapping
+
+
+def parse_file(path):
+    """
+    解析单个文件（在子进程中运行）
+    :return: (文件路径, 解析结果字典, 内容哈希, 解析耗时)
+    """
+    from admin.importer import open_workbook
+    from admin.import_cache import file_hash
+
+    started = time.perf_counter()
+    workbook = open_workbook(path, streaming=False)
+    return path, workbook.to_dict(), file_hash(path), time.perf_counter() - started
+
+
+def write_file(conn, data, content_hash, options):
+    """
+    写入单个文件的解析结果
+    使用保存点，失败时只撤销该文件的写入
+    :return: 导入结果字典
+    """
+    from admin.importer import ParsedWorkbook, run_import
+
+    workbook = ParsedWorkbook.from_dict(data)
+    workbook.content_hash = content_hash
+
+    conn.execute('SAVEPOINT batch_file')
+    try:
+        result = run_import(conn, workbook, options)
+    except Exception:
+        conn.execute('ROLLBACK TO batch_file')
+        conn.execute('RELEASE batch_file')
+        raise
+    conn.execute('RELEASE batch_file')
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批量导入流水文件')
+    parser.add_argument('directory', help='流水文件所在目录')
+    parser.add_argument('--mapping', required=True, help='文件与客户/期数的对应关系（CSV）')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='解析进程数')
+    parser.add_argument('--commit-every', type=int, default=10, help='每写入多少个文件提交一次')
+    args = parser.parse_args()
+
+    mapping = read_mapping(args.mapping)
+    extensions = tuple(f'.{ext}' for ext in Config.ALLOWED_EXTENSIONS)
+    files = []
+    for name in sorted(os.listdir(args.directory)):
+        if not name.lower().endswith(extensions):
+            continue
+        if name not in mapping:
+            print(f"[INFO] 跳过未配置客户的文件: {name}")
+            continue
+        files.append(os.path.join(args.directory, name))
+
+    missing = set(mapping) - {os.path.basename(path) for path in files}
+    for name in sorted(missing):
+        print(f"[ERROR] 对应关系中的文件不存在: {name}")
+
+    if not files:
+        print("[INFO] 没有需要导入的文件")
+        return
+
+    from database import get_db, close_db
+    from migrations import migrate
+
+    conn = get_db()
+    migrate(conn)
+
+    print(f"[INFO] 共 {len(files)} 个文件，{args.workers} 个解析进程")
+    print("-" * 72)
+
+    started = time.perf_counter()
+    succeeded = failed = total_records = pending = 0
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            futures = [executor.submit(parse_file, path) for path in files]
+            for future in as_completed(futures):
+                try:
+                    path, data, content_hash, parse_seconds = future.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"[ERROR] 解析失败: {e}")
+                    continue
+
+                name = os.path.basename(path)
+                if not conn.in_transaction:
+                    conn.execute('BEGIN IMMEDIATE')
+
+                write_started = time.perf_counter()
+                try:
+                    result = write_file(conn, data, content_hash, mapping[name])
+                except Exception as e:
+                    failed += 1
+                    print(f"[ERROR] {name}: {e}")
+                    continue
+                write_seconds = time.perf_counter() - write_started
+
+                succeeded += 1
+                pending += 1
+                total_records += result['record_count']
+                if pending >= args.commit_every:
+                    conn.commit()
+                    pending = 0
+
+                rate = result['record_count'] / (parse_seconds + write_seconds) if result['record_count'] else 0
+                status = '重复，跳过' if result['duplicate'] else \
+                    '新增 {inserted} / 更新 {updated} / 删除 {deleted}'.format(**result['changes'])
+                print(f"  {name}: {result['customer_name']} 第{result['period_number']}期, "
+                      f"{result['record_count']} 条, 解析 {parse_seconds:.2f} 秒, 写入 {write_seconds:.2f} 秒, "
+                      f"{rate:,.0f} 条/秒 ({status})")
+
+        if conn.in_transaction:
+            conn.commit()
+    finally:
+        close_db(conn)
+
+    elapsed = time.perf_counter() - started
+    print("-" * 72)
+    print(f"[INFO] 成功 {succeeded} 个，失败 {failed} 个，共 {total_records} 条明细，"
+          f"耗时 {elapsed:.2f} 秒（{total_records / elapsed:,.0f} 条/秒）")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
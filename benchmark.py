@@ -0,0 +1,524 @@
+"""
+性能基准脚本 - 流水管理系统
+在临时数据库上测量关键路径的性能，不会修改正式数据库
+
+使用方法：
+    python benchmark.py concurrency [--seconds 5] [--readers 4] [--records 50000]
+    python benchmark.py startup [--runs 20]
+    python benchmark.py import [--days 5000]
+    python benchmark.py stats [--records 1000000] [--runs 50]
+    python benchmark.py search [--records 1000000] [--runs 20]
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from werkzeug.security import generate_password_hash
+
+import database
+from config import Config
+from database import connect, get_engine_profile, get_engine_settings
+from migrations import MIGRATIONS, migrate
+
+
+def seed_database(path, record_count, customer_count=20):
+    """
+    生成测试数据
+    :param path: 数据库文件路径
+    :param record_count: 流水记录条数
+    :param customer_count: 客户数量
+    """
+    conn = sqlite3.connect(path)
+    migrate(conn)
+    conn.executemany(
+        'INSERT INTO users (username, password_hash, role) VALUES (?, ?, ?)',
+        [(f'customer{i}', '-', 'customer') for i in range(1, customer_count + 1)]
+    )
+    start = date(2026, 1, 1)
+    rng = random.Random(42)
+    conn.executemany(
+        'INSERT INTO daily_records (customer_id, date, amount, status) VALUES (?, ?, ?, ?)',
+        (
+            (
+                rng.randint(1, customer_count),
+                (start + timedelta(days=rng.randint(0, 364))).strftime('%Y-%m-%d'),
+                round(rng.uniform(100, 5000), 2),
+                'done' if rng.random() < 0.5 else 'pending'
+            )
+            for _ in range(record_count)
+        )
+    )
+    conn.commit()
+    conn.close()
+
+
+def run_concurrency(path, profile, seconds, readers, record_count):
+    """
+    并发读写测试
+    多个线程反复执行仪表盘统计查询，同时一个线程模拟 /api/update_record 写入
+    :return: 结果字典
+    """
+    stop = threading.Event()
+    counters = {'reads': 0, 'writes': 0, 'read_errors': 0, 'write_errors': 0}
+    lock = threading.Lock()
+
+    def reader():
+        conn = connect(path, profile)
+        customer_id = random.randint(1, 20)
+        while not stop.is_set():
+            try:
+                conn.execute('''
+                    SELECT SUM(CASE WHEN status = 'done' THEN amount ELSE 0 END),
+                           SUM(amount)
+                    FROM daily_records
+                    WHERE customer_id = ? AND is_daily_summary = 0
+                ''', (customer_id,)).fetchone()
+                key = 'reads'
+            except sqlite3.OperationalError:
+                key = 'read_errors'
+            with lock:
+                counters[key] += 1
+        conn.close()
+
+    def writer():
+        conn = connect(path, profile)
+        rng = random.Random(7)
+        while not stop.is_set():
+            try:
+                conn.execute(
+                    'UPDATE daily_records SET status = ?, operator_id = ? WHERE id = ?',
+                    (rng.choice(['done', 'pending']), 999, rng.randint(1, record_count))
+                )
+                conn.commit()
+                key = 'writes'
+            except sqlite3.OperationalError:
+                conn.rollback()
+                key = 'write_errors'
+            with lock:
+                counters[key] += 1
+        conn.close()
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads.append(threading.Thread(target=writer))
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    return {k: v / seconds for k, v in counters.items()}
+
+
+def bench_concurrency(args):
+    """对比SQLite默认参数与配置的引擎参数下的并发读写吞吐"""
+    profiles = [
+        ('SQLite默认值', {}),
+        ('Config引擎参数', get_engine_profile(Config)),
+    ]
+    workdir = tempfile.mkdtemp(prefix='flow_bench_')
+    try:
+        template = os.path.join(workdir, 'template.db')
+        seed_database(template, args.records)
+
+        print(f"并发读写测试: {args.readers} 个读线程 + 1 个写线程, {args.seconds} 秒, {args.records} 条记录")
+        print("-" * 60)
+        for name, profile in profiles:
+            path = os.path.join(workdir, 'bench.db')
+            shutil.copy2(template, path)
+            result = run_concurrency(path, profile, args.seconds, args.readers, args.records)
+
+            conn = connect(path, profile)
+            settings = get_engine_settings(conn)
+            conn.close()
+
+            print(f"[{name}] journal_mode={settings['journal_mode']}, "
+                  f"synchronous={settings['synchronous']}, busy_timeout={settings['busy_timeout']}")
+            print(f"  读: {result['reads']:.0f} 次/秒 (失败 {result['read_errors']:.1f} 次/秒)")
+            print(f"  写: {result['writes']:.0f} 次/秒 (失败 {result['write_errors']:.1f} 次/秒)")
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _legacy_init_db(path):
+    """
+    旧版 init_db 每次启动的工作量：执行全部建表/建索引语句、
+    探测 period_number 字段，并计算一次默认管理员密码哈希
+    """
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    for _, _, func in MIGRATIONS[:3]:
+        func(cursor)
+    cursor.execute('SELECT period_number FROM monthly_targets LIMIT 1')
+    try:
+        cursor.execute(
+            'INSERT INTO users (username, password_hash, role) VALUES (?, ?, ?)',
+            ('admin', generate_password_hash('admin123'), 'admin')
+        )
+    except sqlite3.IntegrityError:
+        pass
+    conn.commit()
+    conn.close()
+
+
+def bench_startup(args):
+    """对比旧版与当前 init_db 在已初始化数据库上的启动耗时（即每个工作进程的启动开销）"""
+    workdir = tempfile.mkdtemp(prefix='flow_bench_')
+    try:
+        path = os.path.join(workdir, 'bench.db')
+        database.pool.configure(database=path)
+        database.init_db()
+
+        def measure(func):
+            timings = []
+            for _ in range(args.runs):
+                started = time.perf_counter()
+                func()
+                timings.append(time.perf_counter() - started)
+                database.pool.close_all()
+            timings.sort()
+            return timings[len(timings) // 2] * 1000
+
+        legacy_ms = measure(lambda: _legacy_init_db(path))
+        current_ms = measure(database.init_db)
+
+        print(f"启动耗时（已初始化数据库，{args.runs} 次取中位数）")
+        print("-" * 60)
+        print(f"  旧版 init_db: {legacy_ms:.2f} ms")
+        print(f"  当前 init_db: {current_ms:.2f} ms")
+        print(f"  每个工作进程节省: {legacy_ms - current_ms:.2f} ms")
+    finally:
+        database.pool.close_all()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _sheet_rows(days, seed=1):
+    """
+    生成格式A流水表的各行：表头、每天一行（交易1-20）、总计行
+    :return: (行列表, 交易明细条数)
+    """
+    rng = random.Random(seed)
+    rows = [['日期'] + [f'交易{i}' for i in range(1, 21)] + ['合计']]
+    start = date(2000, 1, 1)
+    grand_total = 0
+    count = 0
+    for d in range(days):
+        amounts = [round(rng.uniform(100, 5000), 2) if rng.random() < 0.8 else None for _ in range(20)]
+        total = sum(a for a in amounts if a)
+        count += sum(1 for a in amounts if a)
+        grand_total += total
+        rows.append([(start + timedelta(days=d)).strftime('%Y-%m-%d')] + amounts + [total])
+    rows.append(['总计'] + [None] * 20 + [grand_total])
+    return rows, count
+
+
+def write_workbook(path, days, seed=1):
+    """
+    生成格式A的流水Excel：每行一天，交易1-20，最后一行为总计行
+    :return: 交易明细条数
+    """
+    from openpyxl import Workbook
+
+    rows, count = _sheet_rows(days, seed)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    for row in rows:
+        ws.append(row)
+    wb.save(path)
+    return count
+
+
+def write_csv(path, days, seed=1):
+    """
+    生成与 write_workbook 内容相同的流水CSV
+    :return: 交易明细条数
+    """
+    import csv
+
+    rows, count = _sheet_rows(days, seed)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        csv.writer(f).writerows(['' if cell is None else cell for cell in row] for row in rows)
+    return count
+
+
+def _legacy_import(path, conn, customer_id):
+    """原 import_excel 的解析与写入方式：读取两次，逐行逐单元格 INSERT"""
+    import pandas as pd
+
+    pd.read_excel(path, sheet_name=0, header=None, nrows=3)
+    df = pd.read_excel(path, sheet_name=0)
+    cursor = conn.cursor()
+    import_dates = []
+    for idx, row in df.iterrows():
+        date_str = str(row.iloc[0]) if len(row) > 0 else ''
+        if date_str and date_str != '总计' and date_str != 'nan':
+            import_dates.append(date_str)
+    for idx, row in df.iterrows():
+        date_str = str(row.iloc[0]) if len(row) > 0 else ''
+        if date_str and date_str != '总计' and date_str != 'nan':
+            daily_records = []
+            for i in range(1, 21):
+                try:
+                    amount = float(row.iloc[i]) if len(row) > i and pd.notna(row.iloc[i]) else 0
+                    if amount > 0:
+                        cursor.execute(
+                            'INSERT INTO daily_records (customer_id, date, amount, status) VALUES (?, ?, ?, ?)',
+                            (customer_id, date_str, amount, 'pending'))
+                        daily_records.append(amount)
+                except (ValueError, IndexError):
+                    pass
+            if daily_records:
+                daily_total = sum(daily_records)
+                cursor.execute(
+                    'INSERT INTO daily_records (customer_id, date, amount, daily_total, status, is_daily_summary) VALUES (?, ?, ?, ?, ?, ?)',
+                    (customer_id, date_str, daily_total, daily_total, 'pending', 1))
+    conn.commit()
+
+
+def _current_import(path, conn, customer_id):
+    """当前导入方式：向量化解析 + 批量写入"""
+    from admin.importer import parse_workbook
+
+    parse_workbook(path).save(conn, customer_id, 1)
+    conn.commit()
+
+
+def _streaming_import(path, conn, customer_id):
+    """流式导入：openpyxl只读模式逐行读取，分批写入"""
+    from admin.importer import WorkbookStream
+
+    WorkbookStream(path).save(conn, customer_id, 1)
+    conn.commit()
+
+
+def _csv_import(path, conn, customer_id):
+    """CSV流式导入：csv模块逐行读取，分批写入"""
+    from admin.importer import CsvStream
+
+    CsvStream(path).save(conn, customer_id, 1)
+    conn.commit()
+
+
+def bench_import(args):
+    """对比原逐行导入、向量化导入、流式导入和CSV导入的吞吐（明细条数/秒）与内存峰值"""
+    import tracemalloc
+
+    workdir = tempfile.mkdtemp(prefix='flow_bench_')
+    try:
+        xlsx = os.path.join(workdir, 'bench.xlsx')
+        count = write_workbook(xlsx, args.days)
+        csv_path = os.path.join(workdir, 'bench.csv')
+        write_csv(csv_path, args.days)
+        print(f"导入测试: {args.days} 天, {count} 条明细")
+        print("-" * 60)
+
+        methods = [
+            ('原逐行导入', _legacy_import, xlsx),
+            ('向量化导入', _current_import, xlsx),
+            ('流式导入', _streaming_import, xlsx),
+            ('CSV流式导入', _csv_import, csv_path),
+        ]
+        for name, func, source in methods:
+            path = os.path.join(workdir, f'{func.__name__}.db')
+            seed_database(path, 0)
+            conn = connect(path, get_engine_profile(Config))
+            tracemalloc.start()
+            started = time.perf_counter()
+            func(source, conn, 1)
+            elapsed = time.perf_counter() - started
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            imported = conn.execute(
+                'SELECT COUNT(*) FROM daily_records WHERE is_daily_summary = 0').fetchone()[0]
+            conn.close()
+            print(f"  {name}: {elapsed:.2f} 秒, {imported / elapsed:,.0f} 条/秒, 内存峰值 {peak / 1024 / 1024:.1f} MB")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _legacy_customer_stats(conn, customer_id, today):
+    """原客户统计接口：已完成、待刷、今日各一次 SUM 查询，再查询目标"""
+    for status in ('done', 'pending'):
+        conn.execute('''
+            SELECT SUM(amount) FROM daily_records
+            WHERE customer_id = ? AND status = ? AND is_daily_summary = 0
+        ''', (customer_id, status)).fetchone()
+    conn.execute('''
+        SELECT SUM(amount) FROM daily_records
+        WHERE customer_id = ? AND date = ? AND is_daily_summary = 0
+    ''', (customer_id, today)).fetchone()
+    conn.execute('''
+        SELECT target_amount FROM monthly_targets
+        WHERE customer_id = ? ORDER BY year_month DESC LIMIT 1
+    ''', (customer_id,)).fetchone()
+
+
+def _legacy_reconciliation(conn, start_date, end_date):
+    """原对账报表：按客户聚合流水明细"""
+    conn.execute('''
+        SELECT u.username,
+               COUNT(CASE WHEN dr.status = 'done' THEN 1 END),
+               SUM(CASE WHEN dr.status = 'done' THEN dr.amount ELSE 0 END),
+               COUNT(*), SUM(dr.amount)
+        FROM users u
+        LEFT JOIN daily_records dr ON u.id = dr.customer_id AND dr.is_daily_summary = 0
+        WHERE u.role = 'customer'
+          AND (dr.date >= ? OR dr.date IS NULL) AND (dr.date <= ? OR dr.date IS NULL)
+        GROUP BY u.id, u.username
+    ''', (start_date, end_date)).fetchall()
+
+
+def bench_stats(args):
+    """对比原统计查询（扫描流水明细）与统计引擎（每日汇总表一次查询）的耗时"""
+    from stats import get_stats, query_customer_stats
+
+    workdir = tempfile.mkdtemp(prefix='flow_bench_')
+    try:
+        path = os.path.join(workdir, 'bench.db')
+        started = time.perf_counter()
+        seed_database(path, args.records)
+        print(f"统计查询测试: {args.records} 条记录, 20 个客户, 每项 {args.runs} 次 "
+              f"(生成数据 {time.perf_counter() - started:.1f} 秒)")
+        print("-" * 60)
+
+        conn = connect(path, get_engine_profile(Config))
+        today, start_date, end_date = '2026-06-30', '2026-03-01', '2026-09-30'
+        cases = [
+            ('客户统计 原4次查询', lambda i: _legacy_customer_stats(conn, i % 20 + 1, today)),
+            ('客户统计 统计引擎', lambda i: get_stats(conn, i % 20 + 1, today=today, with_target=True)),
+            ('期间统计 原明细聚合', lambda i: conn.execute('''
+                SELECT SUM(CASE WHEN status = 'done' THEN amount ELSE 0 END), COUNT(*), SUM(amount)
+                FROM daily_records
+                WHERE customer_id = ? AND date >= ? AND date <= ? AND is_daily_summary = 0
+            ''', (i % 20 + 1, start_date, end_date)).fetchone()),
+            ('期间统计 统计引擎', lambda i: get_stats(conn, i % 20 + 1, start_date, end_date)),
+            ('对账报表 原明细聚合', lambda i: _legacy_reconciliation(conn, start_date, end_date)),
+            ('对账报表 统计引擎', lambda i: query_customer_stats(conn, None, start_date, end_date)),
+        ]
+        for name, func in cases:
+            func(0)
+            started = time.perf_counter()
+            for i in range(args.runs):
+                func(i)
+            elapsed = (time.perf_counter() - started) / args.runs
+            print(f"  {name}: {elapsed * 1000:.2f} 毫秒/次")
+        conn.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _legacy_search_stats(records):
+    """原查询接口的统计方式：在Python中合计全部记录"""
+    completed = [r for r in records if r['status'] == 'done']
+    pending = [r for r in records if r['status'] == 'pending']
+    return {
+        'total_count': len(records),
+        'total_amount': sum(r['amount'] for r in records),
+        'completed_count': len(completed),
+        'completed_amount': sum(r['amount'] for r in completed),
+        'pending_count': len(pending),
+        'pending_amount': sum(r['amount'] for r in pending)
+    }
+
+
+def bench_search(args):
+    """
+    对比流水查询接口的几种返回方式：全部记录+Python合计 / 全部记录+SQL统计 / 只查统计 / 第一页+统计 / 流式输出
+    每项的响应都编码为JSON，并记录一次执行的内存峰值
+    """
+    from record_search import SearchFilter, search_records, search_response, stream_search_json
+
+    workdir = tempfile.mkdtemp(prefix='flow_bench_')
+    try:
+        path = os.path.join(workdir, 'bench.db')
+        started = time.perf_counter()
+        seed_database(path, args.records)
+        print(f"流水查询测试: {args.records} 条记录, 20 个客户, 每项 {args.runs} 次 "
+              f"(生成数据 {time.perf_counter() - started:.1f} 秒)")
+        print("-" * 60)
+
+        conn = connect(path, get_engine_profile(Config))
+        conn.row_factory = sqlite3.Row
+        data = {'status': 'all', 'start_date': '2026-01-01', 'end_date': '2026-12-31'}
+
+        def search(i):
+            return SearchFilter.from_request(i % 20 + 1, data, descending=True)
+
+        def legacy(i):
+            records = search_records(conn, search(i))
+            return json.dumps({'records': records, 'stats': _legacy_search_stats(records)})
+
+        def stream(i):
+            for _ in stream_search_json(conn, search(i)):
+                pass
+
+        cases = [
+            ('全部记录 + Python合计', legacy),
+            ('全部记录 + SQL统计', lambda i: json.dumps(search_response(conn, search(i), data))),
+            ('只查统计', lambda i: json.dumps(search_response(conn, search(i), {**data, 'stats_only': True}))),
+            ('第一页 + SQL统计', lambda i: json.dumps(search_response(conn, search(i), {**data, 'per_page': 50}))),
+            ('流式输出', stream),
+        ]
+        for name, func in cases:
+            func(0)
+            started = time.perf_counter()
+            for i in range(args.runs):
+                func(i)
+            elapsed = (time.perf_counter() - started) / args.runs
+
+            tracemalloc.start()
+            func(0)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"  {name}: {elapsed * 1000:.2f} 毫秒/次, 内存峰值 {peak / 1024 / 1024:.1f} MB")
+        conn.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='流水管理系统性能基准')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    p = subparsers.add_parser('concurrency', help='并发读写吞吐（引擎参数对比）')
+    p.add_argument('--seconds', type=float, default=5)
+    p.add_argument('--readers', type=int, default=4)
+    p.add_argument('--records', type=int, default=50000)
+    p.set_defaults(func=bench_concurrency)
+
+    p = subparsers.add_parser('startup', help='启动耗时（init_db 对比）')
+    p.add_argument('--runs', type=int, default=20)
+    p.set_defaults(func=bench_startup)
+
+    p = subparsers.add_parser('import', help='导入吞吐（逐行 / 向量化 / 流式 / CSV）')
+    p.add_argument('--days', type=int, default=5000)
+    p.set_defaults(func=bench_import)
+
+    p = subparsers.add_parser('stats', help='统计查询耗时（原查询 / 统计引擎）')
+    p.add_argument('--records', type=int, default=1000000)
+    p.add_argument('--runs', type=int, default=50)
+    p.set_defaults(func=bench_stats)
+
+    p = subparsers.add_parser('search', help='流水查询耗时和内存（全部记录 / 只查统计 / 第一页 / 流式输出）')
+    p.add_argument('--records', type=int, default=1000000)
+    p.add_argument('--runs', type=int, default=20)
+    p.set_defaults(func=bench_search)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
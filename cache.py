@@ -0,0 +1,423 @@
+"""
+统计缓存模块 - 流水管理系统
+缓存客户统计、仪表盘汇总和操作员列表，减少前端轮询带来的重复查询
+
+- 缓存键为元组 (类别, 客户ID, ...)，客户ID为None表示涉及所有客户的汇总（如管理员仪表盘）
+- 写入流水、目标、客户或操作员后调用 invalidate_customer，清除该客户和所有全局汇总的缓存
+- ENABLE_CACHING 为False时不缓存，每次直接查询
+- 多个工作进程时，CACHE_COHERENCE 为True的缓存条目记录加载时的变更版本（database.change_tracker），
+  读取时版本不同即视为过期，其他进程的写入也能立即生效
+
+存储后端由 CACHE_BACKEND 选择：
+    local   进程内LRU（默认），超过 CACHE_MAX_ENTRIES 个条目时淘汰最久未使用的
+    redis   Redis协议的共享缓存（CACHE_REDIS_URL），多个工作进程共用；淘汰策略由服务端的 maxmemory-policy 决定
+            本地开发可以用 cache_server.py 启动一个兼容的缓存服务
+两种后端的值都序列化为JSON，有效期都是 CACHE_TIMEOUT 秒，失效都通过递增版本号计数完成
+"""
+
+import json
+import socket
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+from config import Config
+from database import get_db, close_db, change_tracker
+
+
+class CacheError(Exception):
+    """缓存后端不可用"""
+
+
+class CacheBackend:
+    """
+    缓存存储后端接口
+    值为序列化后的字节串；计数（incr）用于失效版本号，不过期也不会被淘汰
+    """
+
+    name = None
+
+    def get_many(self, keys):
+        """
+        批量读取
+        :return: 与 keys 一一对应的列表，不存在或已过期的为None
+        """
+        raise NotImplementedError
+
+    def set(self, key, value, timeout):
+        """
+        写入
+        :param value: 字节串
+        :param timeout: 有效期（秒）
+        """
+        raise NotImplementedError
+
+    def incr(self, key):
+        """计数加一，返回新值"""
+        raise NotImplementedError
+
+    def get_stats(self):
+        """
+        后端统计
+        :return: 字典，包含 entries（条目数）、evictions（淘汰数）、expirations（过期数）
+        """
+        raise NotImplementedError
+
+
+class LocalCacheBackend(CacheBackend):
+    """进程内LRU存储（线程安全）"""
+
+    name = 'local'
+
+    def __init__(self, max_entries=1024):
+        """
+        :param max_entries: 最多保留的条目数，超出时淘汰最久未使用的
+        """
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # 键 -> (过期时间, 值)
+        self._counters = {}
+        self._lock = threading.Lock()
+        self._stats = {'evictions': 0, 'expirations': 0}
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        values = []
+        with self._lock:
+            for key in keys:
+                if key in self._counters:
+                    values.append(str(self._counters[key]).encode())
+                    continue
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] <= now:
+                    del self._entries[key]
+                    self._stats['expirations'] += 1
+                    entry = None
+                if entry is None:
+                    values.append(None)
+                else:
+                    self._entries.move_to_end(key)
+                    values.append(entry[1])
+        return values
+
+    def set(self, key, value, timeout):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + timeout, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def delete(self, key):
+        """删除条目或计数，返回删除的个数"""
+        with self._lock:
+            removed = self._entries.pop(key, None) is not None
+            removed = self._counters.pop(key, None) is not None or removed
+            return int(removed)
+
+    def flush(self):
+        """清空所有条目和计数"""
+        with self._lock:
+            self._entries.clear()
+            self._counters.clear()
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        stats['max_entries'] = self.max_entries
+        return stats
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Redis协议（RESP）客户端存储，不依赖 redis 包
+    每个线程一个连接，出错时关闭连接，下次调用重新连接
+    """
+
+    name = 'redis'
+
+    def __init__(self, url='redis://127.0.0.1:6379/0', socket_timeout=1.0):
+        """
+        :param url: redis://[:密码@]主机[:端口][/库号]
+        :param socket_timeout: 连接和读写超时（秒），超时视为缓存不可用
+        """
+        parsed = urlparse(url)
+        self.host = parsed.hostname or '127.0.0.1'
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip('/') or 0)
+        self.socket_timeout = socket_timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.socket_timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._local.sock = sock
+        self._local.reader = sock.makefile('rb')
+        if self.password:
+            self._command('AUTH', self.password)
+        if self.db:
+            self._command('SELECT', self.db)
+
+    def _disconnect(self):
+        sock = getattr(self._local, 'sock', None)
+        self._local.sock = self._local.reader = None
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    @staticmethod
+    def _encode(args):
+        parts = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+        return b''.join(parts)
+
+    def _read_reply(self):
+        line = self._local.reader.readline()
+        if not line.endswith(b'\r\n'):
+            raise CacheError('缓存服务连接已断开')
+        kind, payload = line[:1], line[1:-2]
+        if kind == b'+':
+            return payload.decode()
+        if kind == b'-':
+            raise CacheError(payload.decode())
+        if kind == b':':
+            return int(payload)
+        if kind == b'$':
+            length = int(payload)
+            if length < 0:
+                return None
+            return self._local.reader.read(length + 2)[:-2]
+        if kind == b'*':
+            count = int(payload)
+            return None if count < 0 else [self._read_reply() for _ in range(count)]
+        raise CacheError(f'无法解析的响应: {line!r}')
+
+    def _command(self, *args):
+        if getattr(self._local, 'sock', None) is None:
+            self._connect()
+        self._local.sock.sendall(self._encode(args))
+        return self._read_reply()
+
+    def execute(self, *args):
+        """
+        执行一条命令
+        :raises CacheError: 连接失败、超时或服务端返回错误时
+        """
+        try:
+            return self._command(*args)
+        except CacheError:
+            self._disconnect()
+            raise
+        except (OSError, ValueError) as e:
+            self._disconnect()
+            raise CacheError(f'缓存服务不可用: {e}') from e
+
+    def get_many(self, keys):
+        return self.execute('MGET', *keys)
+
+    def set(self, key, value, timeout):
+        self.execute('SET', key, value, 'EX', max(1, int(timeout)))
+
+    def incr(self, key):
+        return self.execute('INCR', key)
+
+    def get_stats(self):
+        info = {}
+        for line in self.execute('INFO', 'stats').decode().splitlines():
+            name, sep, value = line.partition(':')
+            if sep:
+                info[name] = value
+        return {
+            'entries': self.execute('DBSIZE'),
+            'evictions': int(info.get('evicted_keys', 0)),
+            'expirations': int(info.get('expired_keys', 0)),
+            'server': f'{self.host}:{self.port}/{self.db}'
+        }
+
+
+def create_backend(config_source=Config):
+    """
+    按配置创建缓存后端
+    :param config_source: 配置类或 app.config
+    """
+    def option(name):
+        if isinstance(config_source, dict):
+            return config_source.get(name, getattr(Config, name))
+        return getattr(config_source, name)
+
+    backend = option('CACHE_BACKEND')
+    if backend == 'local':
+        return LocalCacheBackend(option('CACHE_MAX_ENTRIES'))
+    if backend == 'redis':
+        return RedisCacheBackend(option('CACHE_REDIS_URL'))
+    raise ValueError(f'未知的缓存后端: {backend}（可选 local、redis）')
+
+
+class StatsCache:
+    """
+    统计缓存
+    每个条目连同加载时的失效版本号和变更版本一起序列化保存，读取时任一不同即视为过期，
+    因此加载期间发生的写入不会把旧数据留在缓存中；后端不可用时直接查询
+    """
+
+    def __init__(self, backend, timeout=60, enabled=True, coherent=True, prefix='flow:'):
+        """
+        :param backend: 存储后端（CacheBackend）
+        :param timeout: 条目有效期（秒）
+        :param enabled: 是否启用缓存
+        :param coherent: 是否在读取时检查变更版本（其他进程的写入）
+        :param prefix: 键前缀，多个应用共用一个缓存服务时区分
+        """
+        self.backend = backend
+        self.timeout = timeout
+        self.enabled = enabled
+        self.coherent = coherent
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'stale': 0, 'invalidations': 0, 'errors': 0}
+
+    def configure(self, backend=None, timeout=None, enabled=None, coherent=None, prefix=None):
+        """修改缓存参数"""
+        if backend is not None:
+            self.backend = backend
+        if timeout is not None:
+            self.timeout = timeout
+        if enabled is not None:
+            self.enabled = enabled
+        if coherent is not None:
+            self.coherent = coherent
+        if prefix is not None:
+            self.prefix = prefix
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _generation_keys(self, customer_id):
+        # 客户条目随该客户失效；全局条目随任一客户失效；clear() 使所有条目失效
+        scope = 'global' if customer_id is None else customer_id
+        return [f'{self.prefix}gen:{scope}', f'{self.prefix}gen:epoch']
+
+    def _change_version(self, customer_id, conn=None):
+        """读取客户（None表示所有客户）当前的变更版本"""
+        if conn is not None:
+            return change_tracker.version(conn, customer_id)
+        conn = get_db()
+        try:
+            return change_tracker.version(conn, customer_id)
+        finally:
+            close_db(conn)
+
+    def _bump(self, keys):
+        try:
+            for key in keys:
+                self.backend.incr(key)
+        except CacheError as e:
+            self._count('errors')
+            print(f"[ERROR] 统计缓存失效失败: {e}")
+
+    def get_or_set(self, key, loader, conn=None):
+        """
+        读取缓存，未命中时调用 loader 加载并写入缓存
+        :param key: 缓存键，元组 (类别, 客户ID, ...)
+        :param loader: 无参数的加载函数，返回值需可以序列化为JSON
+        :param conn: 用于检查变更版本的连接，默认取 get_db()
+        :return: 缓存的值或 loader 的返回值
+        """
+        if not self.enabled:
+            return loader()
+
+        # 版本在加载之前读取，加载期间的写入会使下次读取时版本不一致
+        version = self._change_version(key[1], conn) if self.coherent else None
+        cache_key = self.prefix + ':'.join(str(part) for part in key)
+        try:
+            raw, *generations = self.backend.get_many([cache_key] + self._generation_keys(key[1]))
+        except CacheError as e:
+            self._count('errors')
+            print(f"[ERROR] 读取统计缓存失败: {e}")
+            return loader()
+        generations = [int(g or 0) for g in generations]
+
+        if raw is not None:
+            entry = json.loads(raw)
+            if entry['version'] == version and entry['generations'] == generations:
+                self._count('hits')
+                return entry['value']
+            self._count('stale')
+        self._count('misses')
+
+        value = loader()
+        payload = json.dumps({'value': value, 'version': version, 'generations': generations},
+                             ensure_ascii=False, default=str).encode()
+        try:
+            self.backend.set(cache_key, payload, self.timeout)
+        except CacheError as e:
+            self._count('errors')
+            print(f"[ERROR] 写入统计缓存失败: {e}")
+        return value
+
+    def invalidate_customer(self, customer_id):
+        """
+        使某个客户的缓存以及所有全局汇总的缓存失效
+        在写入事务提交之后调用
+        :param customer_id: 客户ID，None表示影响所有客户（如公共操作员），清空全部缓存
+        """
+        if customer_id is None:
+            self.clear()
+            return
+        self._bump([f'{self.prefix}gen:{customer_id}', f'{self.prefix}gen:global'])
+        self._count('invalidations')
+
+    def clear(self):
+        """使全部缓存失效"""
+        self._bump([f'{self.prefix}gen:epoch'])
+        self._count('invalidations')
+
+    def get_stats(self):
+        """获取缓存命中统计（包括后端的条目数、淘汰数和过期数）"""
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        stats['backend'] = self.backend.name
+        try:
+            stats.update(self.backend.get_stats())
+        except CacheError as e:
+            stats['backend_error'] = str(e)
+        stats['timeout'] = self.timeout
+        stats['enabled'] = self.enabled
+        stats['coherent'] = self.coherent
+        stats['change_tracker'] = change_tracker.get_stats()
+        return stats
+
+
+stats_cache = StatsCache(LocalCacheBackend(Config.CACHE_MAX_ENTRIES), Config.CACHE_TIMEOUT,
+                         Config.ENABLE_CACHING, Config.CACHE_COHERENCE, Config.CACHE_KEY_PREFIX)
+
+
+def init_app(app):
+    """按应用配置设置统计缓存（包括存储后端）"""
+    stats_cache.configure(
+        backend=create_backend(app.config),
+        timeout=app.config.get('CACHE_TIMEOUT', Config.CACHE_TIMEOUT),
+        enabled=app.config.get('ENABLE_CACHING', Config.ENABLE_CACHING),
+        coherent=app.config.get('CACHE_COHERENCE', Config.CACHE_COHERENCE),
+        prefix=app.config.get('CACHE_KEY_PREFIX', Config.CACHE_KEY_PREFIX)
+    )
+
+
+def invalidate_customer(customer_id):
+    """使某个客户及全局汇总的统计缓存失效（写入提交之后调用）"""
+    stats_cache.invalidate_customer(customer_id)
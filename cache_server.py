@@ -0,0 +1,155 @@
+"""
+本地缓存服务 - 流水管理系统
+实现统计缓存用到的Redis协议命令子集，开发和测试多进程部署时代替Redis（CACHE_BACKEND = 'redis'）
+
+支持的命令：PING、GET、MGET、SET（EX/PX）、INCR、DEL、DBSIZE、INFO、FLUSHDB、SELECT、AUTH、QUIT
+数据保存在内存中（LocalCacheBackend），超过 --max-keys 个条目时按LRU淘汰，重启后清空
+
+使用方法：
+    python cache_server.py [--host 127.0.0.1] [--port 6379] [--max-keys 10000]
+    CACHE_BACKEND=redis CACHE_REDIS_URL=redis://127.0.0.1:6379/0 python app_new.py
+"""
+
+import argparse
+import socketserver
+import time
+
+from cache import LocalCacheBackend
+
+
+class RespError(Exception):
+    """返回给客户端的错误"""
+
+
+class CacheRequestHandler(socketserver.StreamRequestHandler):
+    """处理一个客户端连接上的所有命令"""
+
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b'*'):
+            # 内联命令（如 telnet 中输入的 PING）
+            return line.split()
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    @staticmethod
+    def _encode(value):
+        if value is None:
+            return b'$-1\r\n'
+        if isinstance(value, bool):
+            return b'+OK\r\n'
+        if isinstance(value, int):
+            return b':%d\r\n' % value
+        if isinstance(value, list):
+            return b'*%d\r\n' % len(value) + b''.join(CacheRequestHandler._encode(v) for v in value)
+        if isinstance(value, str):
+            return b'+%s\r\n' % value.encode()
+        return b'$%d\r\n%s\r\n' % (len(value), value)
+
+    def handle(self):
+        while True:
+            try:
+                args = self._read_command()
+            except (OSError, ValueError):
+                return
+            if args is None:
+                return
+            if not args:
+                continue
+
+            name = args[0].decode().upper()
+            try:
+                if name == 'QUIT':
+                    self.wfile.write(b'+OK\r\n')
+                    return
+                reply = self.server.execute(name, args[1:])
+                data = self._encode(reply)
+            except RespError as e:
+                data = b'-ERR %s\r\n' % str(e).encode()
+            except (ValueError, IndexError):
+                data = b'-ERR syntax error\r\n'
+            try:
+                self.wfile.write(data)
+            except OSError:
+                return
+
+
+class CacheServer(socketserver.ThreadingTCPServer):
+    """每个连接一个线程的缓存服务"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, max_keys=10000):
+        """
+        :param address: (主机, 端口)，端口为0时自动分配
+        :param max_keys: 最多保留的条目数
+        """
+        super().__init__(address, CacheRequestHandler)
+        self.backend = LocalCacheBackend(max_keys)
+        self.started = time.time()
+
+    def execute(self, name, args):
+        """执行一条命令，返回要编码的结果"""
+        backend = self.backend
+        if name == 'PING':
+            return args[0] if args else 'PONG'
+        if name in ('SELECT', 'AUTH'):
+            return True
+        if name == 'GET':
+            return backend.get_many([args[0]])[0]
+        if name == 'MGET':
+            return backend.get_many(args)
+        if name == 'SET':
+            timeout = 365 * 86400
+            options = [a.decode().upper() for a in args[2:]]
+            if options[:1] == ['EX']:
+                timeout = int(options[1])
+            elif options[:1] == ['PX']:
+                timeout = int(options[1]) / 1000
+            elif options:
+                raise RespError('不支持的SET选项')
+            backend.set(args[0], args[1], timeout)
+            return True
+        if name == 'INCR':
+            return backend.incr(args[0])
+        if name == 'DEL':
+            return sum(backend.delete(key) for key in args)
+        if name == 'DBSIZE':
+            return backend.get_stats()['entries']
+        if name == 'FLUSHDB':
+            backend.flush()
+            return True
+        if name == 'INFO':
+            stats = backend.get_stats()
+            info = (f"# Stats\r\nuptime_in_seconds:{int(time.time() - self.started)}\r\n"
+                    f"evicted_keys:{stats['evictions']}\r\nexpired_keys:{stats['expirations']}\r\n"
+                    f"maxkeys:{stats['max_entries']}\r\n")
+            return info.encode()
+        raise RespError(f"unknown command '{name}'")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地缓存服务（Redis协议）')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6379)
+    parser.add_argument('--max-keys', type=int, default=10000, help='最多保留的条目数')
+    args = parser.parse_args()
+
+    server = CacheServer((args.host, args.port), args.max_keys)
+    print(f"[INFO] 缓存服务已启动: {args.host}:{server.server_address[1]}，最多 {args.max_keys} 个条目")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -18,10 +18,56 @@ class Config:
     # 文件上传配置
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB
     UPLOAD_FOLDER = os.path.join(basedir, 'uploads')
-    ALLOWED_EXTENSIONS = {'xlsx', 'xls'}
+    ALLOWED_EXTENSIONS = {'xlsx', 'xls', 'csv', 'parquet'}  # parquet 需要安装 pyarrow
+    IMPORT_STREAM_THRESHOLD = 2 * 1024 * 1024  # 超过2MB的.xlsx使用流式导入（内存占用恒定）
+    IMPORT_BATCH_SIZE = 5000  # 流式导入每批写入的明细条数
+    IMPORT_CSV_ENCODINGS = ('utf-8-sig', 'gb18030')  # CSV导入依次尝试的编码
+    IMPORT_WORKERS = 2  # 后台导入任务的工作线程数
+    IMPORT_CACHE_DIR = os.path.join(basedir, 'data', 'import_cache')  # 解析结果缓存目录
+    IMPORT_CACHE_SIZE = 20  # 解析结果缓存最多保留的文件数（LRU淘汰）
     
     # 数据库配置
     DATABASE_PATH = os.path.join(basedir, 'data', 'flow.db')
+    DATABASE_POOL_SIZE = int(os.getenv('DATABASE_POOL_SIZE', 10))  # 最多保留的长连接数
+    DATABASE_POOL_HEALTH_CHECK = True  # 复用连接前先检查是否可用
+    
+    # 数据库备份配置（使用SQLite在线备份API，不阻塞正常读写）
+    DATABASE_BACKUP_ENABLED = os.getenv('DATABASE_BACKUP_ENABLED', 'False').lower() == 'true'
+    DATABASE_BACKUP_INTERVAL = 86400  # 定时备份间隔（秒）
+    DATABASE_BACKUP_DIR = os.path.join(basedir, 'data', 'backups')
+    DATABASE_BACKUP_KEEP = 7  # 保留最近7个备份
+    DATABASE_BACKUP_COMPRESS = False  # 是否gzip压缩
+    DATABASE_BACKUP_PAGES = 256  # 每批复制的页数
+    DATABASE_BACKUP_SLEEP = 0.05  # 每批之间暂停的秒数
+    
+    # SQLite引擎参数（每个新连接都会应用，设为None则使用SQLite默认值）
+    SQLITE_JOURNAL_MODE = 'WAL'  # 读写互不阻塞
+    SQLITE_SYNCHRONOUS = 'NORMAL'  # WAL模式下NORMAL即可保证一致性
+    SQLITE_BUSY_TIMEOUT = 5000  # 遇到锁时最多等待5秒（毫秒）
+    SQLITE_CACHE_SIZE = -16000  # 页缓存约16MB（负数表示KB）
+    SQLITE_MMAP_SIZE = 64 * 1024 * 1024  # 64MB内存映射
+    SQLITE_TEMP_STORE = 'MEMORY'  # 临时表和排序使用内存
+    SQLITE_WAL_AUTOCHECKPOINT = 1000  # 每1000页执行一次检查点
+    
+    # 统计缓存配置（客户统计、仪表盘汇总和操作员列表，写入时按客户失效）
+    ENABLE_CACHING = os.getenv('ENABLE_CACHING', 'True').lower() == 'true'
+    CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'local')  # local（进程内LRU）或 redis（多进程共享）
+    CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', 'redis://127.0.0.1:6379/0')
+    CACHE_KEY_PREFIX = 'flow:'  # 缓存键前缀
+    CACHE_TIMEOUT = 60  # 缓存有效期（秒）
+    CACHE_MAX_ENTRIES = 1024  # 进程内缓存最多保留的条目数（LRU淘汰）
+    CACHE_COHERENCE = True  # 读取缓存时检查变更计数，多个工作进程的写入立即生效
+    
+    # 流水列表分页配置（按 (日期, ID) 游标分页）
+    RECORDS_PER_PAGE = 50  # 默认每页条数
+    RECORDS_MAX_PER_PAGE = 200  # 每页条数上限，per_page 参数超过时按上限
+    RECORDS_COUNT_TOTAL = True  # 第一页是否按每日汇总统计总条数
+    RECORDS_STREAM_BATCH = 500  # 流式查询每次从游标读取并输出的条数
+    
+    # 初始管理员（仅在数据库中没有任何管理员时使用）
+    # ADMIN_PASSWORD_HASH 可用 create_admin.py --print-hash 生成，未设置时创建默认账户 admin / admin123
+    ADMIN_USERNAME = os.getenv('ADMIN_USERNAME', 'admin')
+    ADMIN_PASSWORD_HASH = os.getenv('ADMIN_PASSWORD_HASH')
     
     # Session配置
     SESSION_COOKIE_SECURE = False
@@ -0,0 +1,63 @@
+"""
+管理员账户创建脚本
+一次性创建管理员账户，或生成可用于 ADMIN_PASSWORD_HASH 环境变量的密码哈希
+
+使用方法：
+    python create_admin.py <用户名>               交互输入密码并创建管理员
+    python create_admin.py <用户名> --hash <哈希>  使用已生成的哈希创建管理员
+    python create_admin.py --print-hash            交互输入密码，只输出哈希
+"""
+
+import argparse
+import getpass
+import sqlite3
+import sys
+
+from werkzeug.security import generate_password_hash
+
+
+def read_password():
+    """交互读取并确认密码"""
+    password = getpass.getpass('密码: ')
+    if len(password) < 6:
+        print("[ERROR] 密码长度至少为6位")
+        sys.exit(1)
+    if getpass.getpass('确认密码: ') != password:
+        print("[ERROR] 两次输入的密码不一致")
+        sys.exit(1)
+    return password
+
+
+def main():
+    parser = argparse.ArgumentParser(description='创建管理员账户')
+    parser.add_argument('username', nargs='?', help='管理员用户名')
+    parser.add_argument('--hash', dest='password_hash', help='已生成的密码哈希')
+    parser.add_argument('--print-hash', action='store_true', help='只生成并输出密码哈希')
+    args = parser.parse_args()
+
+    if args.print_hash:
+        print(generate_password_hash(read_password()))
+        return
+
+    if not args.username:
+        parser.error('请提供管理员用户名')
+
+    from database import get_db, close_db, create_admin
+    from migrations import migrate
+
+    conn = get_db()
+    try:
+        migrate(conn)
+        password = None if args.password_hash else read_password()
+        admin_id = create_admin(conn, args.username, password=password,
+                                password_hash=args.password_hash)
+        print(f"[INFO] 管理员账户已创建: {args.username} (ID: {admin_id})")
+    except sqlite3.IntegrityError:
+        print(f"[ERROR] 用户名已存在: {args.username}")
+        sys.exit(1)
+    finally:
+        close_db(conn)
+
+
+if __name__ == '__main__':
+    main()
@@ -6,6 +6,7 @@
 from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for
 from functools import wraps
 from database import get_db, close_db
+from cache import stats_cache, invalidate_customer
 
 operator_bp = Blueprint('customer_operator', __name__, url_prefix='/customer/operators')
 
@@ -79,6 +80,7 @@ def add_operator():
         )
         operator_id = cursor.lastrowid
         conn.commit()
+        invalidate_customer(customer_id)
         
         return jsonify({
             'success': True,
@@ -117,6 +119,7 @@ def delete_operator(operator_id):
         # 删除操作员
         cursor.execute('DELETE FROM operators WHERE id = ?', (operator_id,))
         conn.commit()
+        invalidate_customer(customer_id)
         
         return jsonify({'success': True, 'message': '操作员删除成功'})
     except Exception as e:
@@ -165,6 +168,7 @@ def add_channel(operator_id):
             (channel_name, operator_id)
         )
         conn.commit()
+        invalidate_customer(customer_id)
         
         return jsonify({
             'success': True,
@@ -200,6 +204,7 @@ def delete_channel(channel_id):
         
         cursor.execute('DELETE FROM payment_channels WHERE id = ?', (channel_id,))
         conn.commit()
+        invalidate_customer(customer_id)
         
         return jsonify({'success': True, 'message': '支付渠道删除成功'})
     except Exception as e:
@@ -218,38 +223,42 @@ def api_list_operators():
     cursor = conn.cursor()
     
     try:
-        cursor.execute('''
-            SELECT o.id, o.name,
-                   GROUP_CONCAT(pc.id || ':' || pc.name) as channels
-            FROM operators o
-            LEFT JOIN payment_channels pc ON o.id = pc.operator_id
-            WHERE (o.customer_id = ? OR o.customer_id IS NULL) AND o.is_active = 1
-            GROUP BY o.id
-            ORDER BY o.name
-        ''', (customer_id,))
+        # 操作员列表（缓存，该客户或公共操作员变化时失效）
+        def load_operators():
+            cursor.execute('''
+                SELECT o.id, o.name,
+                       GROUP_CONCAT(pc.id || ':' || pc.name) as channels
+                FROM operators o
+                LEFT JOIN payment_channels pc ON o.id = pc.operator_id
+                WHERE (o.customer_id = ? OR o.customer_id IS NULL) AND o.is_active = 1
+                GROUP BY o.id
+                ORDER BY o.name
+            ''', (customer_id,))
         
-        operators = []
-        for row in cursor.fetchall():
-            operator = {
-                'id': row['id'],
-                'name': row['name']
-            }
+            operators = []
+            for row in cursor.fetchall():
+                operator = {
+                    'id': row['id'],
+                    'name': row['name']
+                }
             
-            # 解析渠道
-            if row['channels']:
-                channels = []
-                for channel_str in row['channels'].split(','):
-                    channel_id, channel_name = channel_str.split(':')
-                    channels.append({
-                        'id': int(channel_id),
-                        'name': channel_name
-                    })
-                operator['channels'] = channels
-            else:
-                operator['channels'] = []
+                # 解析渠道
+                if row['channels']:
+                    channels = []
+                    for channel_str in row['channels'].split(','):
+                        channel_id, channel_name = channel_str.split(':')
+                        channels.append({
+                            'id': int(channel_id),
+                            'name': channel_name
+                        })
+                    operator['channels'] = channels
+                else:
+                    operator['channels'] = []
             
-            operators.append(operator)
+                operators.append(operator)
+            return operators
         
+        operators = stats_cache.get_or_set(('customer_operators', customer_id), load_operators, conn)
         return jsonify({'operators': operators})
     finally:
         close_db(conn)
@@ -3,9 +3,10 @@
 处理流水记录的多条件查询
 """
 
-from flask import Blueprint, render_template, request, jsonify, session
+from flask import Blueprint, render_template, request, jsonify, session, Response, stream_with_context
 from functools import wraps
 from database import get_db, close_db
+from record_search import SearchFilter, search_response, stream_search_json
 
 query_bp = Blueprint('query', __name__, url_prefix='/customer/query')
 
@@ -58,116 +59,39 @@ def index():
         close_db(conn)
 
 
+def _add_legacy_names(record):
+    """operator / channel 为原有字段，与 operator_name / channel_name 相同"""
+    record['operator'] = record['operator_name']
+    record['channel'] = record['channel_name'] or '-'
+
+
 @query_bp.route('/search', methods=['POST'])
 @login_required
 def search():
-    """执行查询"""
+    """
+    执行查询（默认只显示已刷流水，按日期正序；可只查统计或分页查询，见 search_response）
+    参数 stream 为真时流式返回全部记录和统计（见 stream_search_json）
+    """
     customer_id = session['user_id']
-    data = request.get_json()
+    data = request.get_json(silent=True)
+    
+    try:
+        search_filter = SearchFilter.from_request(customer_id, data)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     
-    # 获取筛选参数
-    start_date = data.get('start_date', '')
-    end_date = data.get('end_date', '')
-    operator_id = data.get('operator_id', '')
-    channel_id = data.get('channel_id', '')
+    if data and data.get('stream'):
+        generate = stream_search_json(get_db(), search_filter, transform=_add_legacy_names)
+        return Response(stream_with_context(generate), mimetype='application/json')
     
     conn = get_db()
-    cursor = conn.cursor()
     
     try:
-        # 构建查询（默认只显示已刷流水）
-        query = '''
-            SELECT dr.*, o.name as operator_name, pc.name as channel_name
-            FROM daily_records dr
-            LEFT JOIN operators o ON dr.operator_id = o.id
-            LEFT JOIN payment_channels pc ON dr.channel_id = pc.id
-            WHERE dr.customer_id = ? AND dr.is_daily_summary = 0 AND dr.status = 'done'
-        '''
-        params = [customer_id]
-        
-        # 日期筛选
-        if start_date:
-            query += ' AND dr.date >= ?'
-            params.append(start_date)
-        
-        if end_date:
-            query += ' AND dr.date <= ?'
-            params.append(end_date)
-        
-        # 操作员筛选
-        if operator_id:
-            if operator_id == 'self':
-                # 查询"自己"的记录（operator_id = 999）
-                query += ' AND dr.operator_id = ?'
-                params.append(999)
-            else:
-                query += ' AND dr.operator_id = ?'
-                params.append(operator_id)
-        
-        # 支付渠道筛选
-        if channel_id and channel_id != '0':
-            # 0表示不选择渠道，不添加筛选条件
-            query += ' AND dr.channel_id = ?'
-            params.append(channel_id)
-        
-        query += ' ORDER BY dr.date ASC'
-        
-        cursor.execute(query, params)
-        records = cursor.fetchall()
-        
-        # 统计数据
-        total_amount = sum(r['amount'] for r in records) if records else 0
-        completed_amount = sum(r['amount'] for r in records if r['status'] == 'done') if records else 0
-        pending_amount = sum(r['amount'] for r in records if r['status'] == 'pending') if records else 0
-        
-        # 格式化结果
-        results = []
-        for record in records:
-            # 操作员显示逻辑
-            operator_name = None
-            if record['operator_id'] == 999:
-                operator_name = '自己'
-            elif record['operator_id'] is not None:
-                operator_name = record['operator_name'] or None
-            else:
-                operator_name = None
-            
-            # 渠道显示逻辑（1=微信, 2=支付宝, 3=其他）
-            channel_name = None
-            if record['channel_id'] is not None:
-                if record['channel_id'] == 0:
-                    channel_name = None  # 0表示不选择
-                elif record['channel_id'] == 1:
-                    channel_name = '微信支付'
-                elif record['channel_id'] == 2:
-                    channel_name = '支付宝'
-                elif record['channel_id'] == 3:
-                    channel_name = '其他渠道'
-                else:
-                    channel_name = None
-            else:
-                channel_name = None
-            
-            results.append({
-                'id': record['id'],
-                'date': record['date'],
-                'amount': record['amount'],
-                'status': record['status'],
-                'operator': operator_name,
-                'channel': channel_name or '-',
-                'daily_total': record['daily_total']
-            })
+        result = search_response(conn, search_filter, data)
+        for record in result.get('records', []):
+            _add_legacy_names(record)
         
-        return jsonify({
-            'success': True,
-            'records': results,
-            'stats': {
-                'total_count': len(records),
-                'total_amount': total_amount,
-                'completed_amount': completed_amount,
-                'pending_amount': pending_amount
-            }
-        })
+        return jsonify({'success': True, **result})
         
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -3,9 +3,13 @@
 处理客户仪表盘、流水记录查看等功能
 """
 
-from flask import render_template, request, session, Blueprint
+from flask import render_template, request, session, Blueprint, url_for
 from database import get_db, close_db
-from utils import require_customer, parse_date_range_from_request
+from cache import stats_cache
+from config import Config
+from record_names import NameMap
+from stats import get_stats
+from utils import require_customer, parse_date_range_from_request, KeysetPagination
 
 # 创建客户蓝图
 customer_bp = Blueprint('customer', __name__)
@@ -43,32 +47,24 @@ def dashboard():
         cursor.execute('SELECT username FROM users WHERE id = ?', (user_id,))
         user = cursor.fetchone()
         
-        # 获取最近的月度目标
-        cursor.execute('''
-            SELECT * FROM monthly_targets 
-            WHERE customer_id = ? 
-            ORDER BY period_number DESC LIMIT 1
-        ''', (user_id,))
-        latest_target = cursor.fetchone()
+        # 获取最近的月度目标及其期间的流水统计（缓存，写入该客户的流水或目标时失效）
+        def load_progress():
+            cursor.execute('''
+                SELECT * FROM monthly_targets 
+                WHERE customer_id = ? 
+                ORDER BY period_number DESC LIMIT 1
+            ''', (user_id,))
+            target = cursor.fetchone()
+            if not target:
+                return None, None
+            
+            # 获取目标期间的流水统计（限制日期范围）
+            return dict(target), get_stats(conn, user_id, target['start_date'], target['end_date'])
         
-        stats = None
+        latest_target, stats = stats_cache.get_or_set(('customer_dashboard', user_id), load_progress, conn)
         progress = 0
         
         if latest_target:
-            # 获取目标期间的流水统计（限制日期范围）
-            cursor.execute('''
-                SELECT SUM(CASE WHEN status = 'done' THEN amount ELSE 0 END) as completed,
-                       COUNT(CASE WHEN status = 'done' THEN 1 END) as completed_count,
-                       SUM(amount) as total,
-                       COUNT(*) as total_count
-                FROM daily_records 
-                WHERE customer_id = ? 
-                AND date >= ? AND date <= ?
-                AND is_daily_summary = 0
-            ''', (user_id, latest_target['start_date'], latest_target['end_date']))
-            
-            stats = cursor.fetchone()
-            
             # 调试信息
             print(f"[DEBUG] 客户ID: {user_id}")
             print(f"[DEBUG] 最新目标: {latest_target}")
@@ -108,7 +104,7 @@ def dashboard():
 def records():
     """
     客户流水记录查看
-    显示客户自己的所有流水记录，支持筛选
+    显示客户自己的流水记录，支持筛选，按 (日期, ID) 游标分页
     """
     user_id = session.get('user_id')
     
@@ -119,6 +115,13 @@ def records():
         # 获取筛选参数
         start_date, end_date = parse_date_range_from_request(request)
         status_filter = request.args.get('status', '')
+        pagination = KeysetPagination(
+            after=request.args.get('after'),
+            before=request.args.get('before'),
+            per_page=request.args.get('per_page'),
+            default_per_page=Config.RECORDS_PER_PAGE,
+            max_per_page=Config.RECORDS_MAX_PER_PAGE
+        )
         
         # 获取最近的月度目标
         cursor.execute('''
@@ -147,7 +150,14 @@ def records():
             query += ' AND status = ?'
             params.append(status_filter)
         
-        query += ' ORDER BY date ASC'
+        sort_columns = ['date', 'id']
+        seek, seek_params = pagination.where(sort_columns)
+        if seek:
+            query += ' AND ' + seek
+            params.extend(seek_params)
+        
+        query += f' ORDER BY {pagination.order_by(sort_columns)} LIMIT ?'
+        params.append(pagination.limit)
         
         # 调试信息
         print(f"[DEBUG] SQL查询: {query}")
@@ -155,54 +165,25 @@ def records():
         print(f"[DEBUG] start_date={start_date}, end_date={end_date}, status_filter={status_filter}")
         
         cursor.execute(query, params)
-        records = cursor.fetchall()
-        
-        # 为每条记录添加操作员和渠道信息
-        records_with_info = []
-        for record in records:
-            record_dict = dict(record)
-            
-            # 操作员显示逻辑
-            if record['operator_id'] == 999:
-                record_dict['operator_name'] = '自己'
-            elif record['operator_id'] is not None:
-                cursor.execute('SELECT name FROM operators WHERE id = ?', (record['operator_id'],))
-                op = cursor.fetchone()
-                record_dict['operator_name'] = op['name'] if op else None
-            else:
-                record_dict['operator_name'] = None
-            
-            # 渠道显示逻辑（1=微信, 2=支付宝, 3=其他）
-            if record['channel_id'] is not None:
-                if record['channel_id'] == 0:
-                    record_dict['channel_name'] = None  # 0表示不选择
-                elif record['channel_id'] == 1:
-                    record_dict['channel_name'] = '微信支付'
-                elif record['channel_id'] == 2:
-                    record_dict['channel_name'] = '支付宝'
-                elif record['channel_id'] == 3:
-                    record_dict['channel_name'] = '其他渠道'
-                else:
-                    record_dict['channel_name'] = None
-            else:
-                record_dict['channel_name'] = None
-            
-            records_with_info.append(record_dict)
+        pagination.paginate(cursor.fetchall(), key=lambda r: (r['date'], r['id']))
         
-        records = records_with_info
+        # 操作员和渠道名称：本页用到的一次查询取回
+        names = NameMap().load(conn, pagination.items)
+        records = [names.label(record) for record in pagination.items]
+        print(f"[DEBUG] 本页记录数量: {len(records)}")
         
-        # 调试：打印前5条和后5条记录的日期
-        print(f"[DEBUG] 查询结果数量: {len(records)}")
-        print(f"[DEBUG] 前5条记录:")
-        for i, record in enumerate(records[:5]):
-            print(f"[DEBUG]   记录{i+1}: 日期={record['date']}, 金额={record['amount']}")
-        if len(records) > 5:
-            print(f"[DEBUG] 后5条记录:")
-            for i, record in enumerate(records[-5:]):
-                print(f"[DEBUG]   记录{len(records)-4+i}: 日期={record['date']}, 金额={record['amount']}")
+        # 翻页链接保留筛选条件
+        filters = {k: v for k, v in request.args.items() if k not in ('after', 'before')}
+        prev_url = url_for('customer.records', before=pagination.prev_cursor, **filters) \
+            if pagination.prev_cursor else None
+        next_url = url_for('customer.records', after=pagination.next_cursor, **filters) \
+            if pagination.next_cursor else None
         
         return render_template('customer/records.html',
                              records=records,
+                             pagination=pagination,
+                             prev_url=prev_url,
+                             next_url=next_url,
                              target=target,
                              status_filter=status_filter,
                              start_date=start_date,
@@ -5,190 +5,647 @@
 
 import sqlite3
 import os
+import threading
+import time
+from datetime import datetime
+from collections.abc import Mapping
+from itertools import chain, islice
+from flask import g, has_app_context
 from werkzeug.security import generate_password_hash
 from config import Config
 
 
+# 连接时应用的PRAGMA及其对应的配置项（按应用顺序排列）
+# busy_timeout 必须最先设置，切换WAL时遇到锁才会等待而不是直接报错
+ENGINE_PRAGMAS = [
+    ('busy_timeout', 'SQLITE_BUSY_TIMEOUT'),
+    ('journal_mode', 'SQLITE_JOURNAL_MODE'),
+    ('synchronous', 'SQLITE_SYNCHRONOUS'),
+    ('cache_size', 'SQLITE_CACHE_SIZE'),
+    ('mmap_size', 'SQLITE_MMAP_SIZE'),
+    ('temp_store', 'SQLITE_TEMP_STORE'),
+    ('wal_autocheckpoint', 'SQLITE_WAL_AUTOCHECKPOINT'),
+]
+
+# PRAGMA 读回时的数值含义
+_SYNCHRONOUS_NAMES = {0: 'OFF', 1: 'NORMAL', 2: 'FULL', 3: 'EXTRA'}
+_TEMP_STORE_NAMES = {0: 'DEFAULT', 1: 'FILE', 2: 'MEMORY'}
+
+
+def get_engine_profile(config_source=Config):
+    """
+    从配置中读取SQLite引擎参数
+    :param config_source: 配置类或 app.config 字典
+    :return: {pragma名: 值} 字典，未配置（None）的项不包含在内
+    """
+    profile = {}
+    for pragma, key in ENGINE_PRAGMAS:
+        if isinstance(config_source, dict):
+            value = config_source.get(key)
+        else:
+            value = getattr(config_source, key, None)
+        if value is not None:
+            profile[pragma] = value
+    return profile
+
+
+def apply_engine_profile(conn, profile):
+    """
+    在连接上应用SQLite引擎参数
+    :param conn: 数据库连接
+    :param profile: get_engine_profile 返回的字典
+    """
+    names = dict(ENGINE_PRAGMAS)
+    for pragma, value in profile.items():
+        if pragma not in names:
+            raise ValueError(f'不支持的PRAGMA: {pragma}')
+        if isinstance(value, str) and not value.isalnum():
+            raise ValueError(f'PRAGMA {pragma} 的值无效: {value}')
+        conn.execute(f'PRAGMA {pragma} = {value}').fetchall()
+
+
+def get_engine_settings(conn):
+    """
+    读取连接上实际生效的SQLite引擎参数
+    :param conn: 数据库连接
+    :return: {pragma名: 当前值} 字典
+    """
+    settings = {}
+    for pragma, _ in ENGINE_PRAGMAS:
+        row = conn.execute(f'PRAGMA {pragma}').fetchone()
+        settings[pragma] = row[0] if row else None
+    settings['synchronous'] = _SYNCHRONOUS_NAMES.get(settings['synchronous'], settings['synchronous'])
+    settings['temp_store'] = _TEMP_STORE_NAMES.get(settings['temp_store'], settings['temp_store'])
+    return settings
+
+
+def connect(database, profile=None):
+    """
+    创建新的数据库连接并应用引擎参数
+    :param database: 数据库文件路径
+    :param profile: 引擎参数字典，None表示使用SQLite默认值
+    """
+    conn = sqlite3.connect(database, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    if profile:
+        apply_engine_profile(conn, profile)
+    return conn
+
+
+class ConnectionPool:
+    """
+    SQLite连接池
+    每个工作线程保留一个长连接，避免每次请求重新连接和重新读取表结构
+    """
+    
+    def __init__(self, database, max_size=10, health_check=True, profile=None):
+        """
+        :param database: 数据库文件路径
+        :param max_size: 最多保留的长连接数量（超出时使用临时连接）
+        :param health_check: 取出空闲连接时是否先做健康检查
+        :param profile: 新建连接时应用的引擎参数
+        """
+        self.database = database
+        self.max_size = max_size
+        self.health_check = health_check
+        self.profile = profile or {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = {}  # 线程ID -> 长连接
+        self._generation = 0
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'overflows': 0,
+            'health_check_failures': 0
+        }
+    
+    def configure(self, database=None, max_size=None, health_check=None, profile=None):
+        """
+        修改连接池参数
+        已有连接会在下次取用时被丢弃并按新参数重建
+        """
+        with self._lock:
+            if database is not None:
+                self.database = database
+            if max_size is not None:
+                self.max_size = max_size
+            if health_check is not None:
+                self.health_check = health_check
+            if profile is not None:
+                self.profile = profile
+            self._generation += 1
+    
+    def _connect(self):
+        """创建新连接"""
+        return connect(self.database, self.profile)
+    
+    def _is_healthy(self, conn):
+        """检查连接是否可用"""
+        try:
+            conn.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+    
+    def _discard(self, conn):
+        """关闭并移除当前线程的长连接"""
+        with self._lock:
+            if self._connections.get(threading.get_ident()) is conn:
+                del self._connections[threading.get_ident()]
+        self._local.conn = None
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+    
+    def _prune_dead_threads(self):
+        """回收已结束线程遗留的连接（需在持有锁时调用）"""
+        alive = {t.ident for t in threading.enumerate()}
+        for ident in [i for i in self._connections if i not in alive]:
+            try:
+                self._connections.pop(ident).close()
+            except sqlite3.Error:
+                pass
+    
+    def acquire(self):
+        """
+        获取连接
+        优先复用当前线程的空闲长连接，否则新建连接
+        """
+        conn = getattr(self._local, 'conn', None)
+        
+        if conn is not None and getattr(self._local, 'generation', None) != self._generation:
+            self._discard(conn)
+            conn = None
+        
+        if conn is not None and not self._local.in_use:
+            if not self.health_check or self._is_healthy(conn):
+                self._local.in_use = True
+                with self._lock:
+                    self._stats['hits'] += 1
+                return conn
+            with self._lock:
+                self._stats['health_check_failures'] += 1
+            self._discard(conn)
+            conn = None
+        
+        with self._lock:
+            self._stats['misses'] += 1
+            if conn is None and len(self._connections) >= self.max_size:
+                self._prune_dead_threads()
+            pooled = conn is None and len(self._connections) < self.max_size
+            if not pooled:
+                self._stats['overflows'] += 1
+        
+        new_conn = self._connect()
+        if pooled:
+            with self._lock:
+                self._connections[threading.get_ident()] = new_conn
+            self._local.conn = new_conn
+            self._local.generation = self._generation
+            self._local.in_use = True
+        return new_conn
+    
+    def release(self, conn):
+        """
+        归还连接
+        长连接回滚未提交的事务后留待复用，临时连接直接关闭
+        """
+        if conn is None:
+            return
+        
+        if conn is getattr(self._local, 'conn', None):
+            try:
+                if conn.in_transaction:
+                    conn.rollback()
+                self._local.in_use = False
+            except sqlite3.Error:
+                self._discard(conn)
+        else:
+            conn.close()
+    
+    def close_all(self):
+        """关闭所有长连接"""
+        with self._lock:
+            for conn in self._connections.values():
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._connections.clear()
+            self._generation += 1
+    
+    def get_stats(self):
+        """
+        获取连接池统计
+        :return: 字典，包含命中/未命中次数、命中率和当前连接数
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._connections)
+            stats['max_size'] = self.max_size
+        requests = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / requests * 100, 2) if requests else 0
+        return stats
+
+
+# 全局连接池，init_app 时按应用配置重新设置
+pool = ConnectionPool(
+    Config.DATABASE_PATH,
+    max_size=Config.DATABASE_POOL_SIZE,
+    health_check=Config.DATABASE_POOL_HEALTH_CHECK,
+    profile=get_engine_profile(Config)
+)
+
+
+def init_app(app):
+    """
+    将连接池注册到Flask应用
+    请求结束时自动归还本次请求使用的连接
+    """
+    pool.configure(
+        database=app.config.get('DATABASE_PATH', Config.DATABASE_PATH),
+        max_size=app.config.get('DATABASE_POOL_SIZE', Config.DATABASE_POOL_SIZE),
+        health_check=app.config.get('DATABASE_POOL_HEALTH_CHECK', Config.DATABASE_POOL_HEALTH_CHECK),
+        profile=get_engine_profile(app.config)
+    )
+    
+    @app.teardown_appcontext
+    def release_db(exception=None):
+        conn = g.pop('db_conn', None)
+        if conn is not None:
+            pool.release(conn)
+    
+    # 定时在线备份
+    if app.config.get('DATABASE_BACKUP_ENABLED') and not app.testing:
+        scheduler = BackupScheduler(
+            interval=app.config.get('DATABASE_BACKUP_INTERVAL', Config.DATABASE_BACKUP_INTERVAL),
+            backup_dir=app.config.get('DATABASE_BACKUP_DIR', Config.DATABASE_BACKUP_DIR),
+            keep=app.config.get('DATABASE_BACKUP_KEEP', Config.DATABASE_BACKUP_KEEP),
+            compress=app.config.get('DATABASE_BACKUP_COMPRESS', Config.DATABASE_BACKUP_COMPRESS)
+        )
+        scheduler.start()
+        app.extensions['db_backup_scheduler'] = scheduler
+
+
 def get_db():
     """
     获取数据库连接
     使用Row工厂，使结果可以像字典一样访问
+    请求内多次调用返回同一个连接，请求结束时归还连接池
     """
-    conn = sqlite3.connect(Config.DATABASE_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    if has_app_context():
+        if 'db_conn' not in g:
+            g.db_conn = pool.acquire()
+        return g.db_conn
+    return pool.acquire()
 
 
 def close_db(conn):
-    """关闭数据库连接"""
-    if conn:
-        conn.close()
+    """
+    关闭数据库连接
+    请求内的连接只回滚未提交的事务，真正的归还在请求结束时进行
+    """
+    if not conn:
+        return
+    if has_app_context() and g.get('db_conn') is conn:
+        if conn.in_transaction:
+            conn.rollback()
+        return
+    pool.release(conn)
+
+
+def get_pool_stats():
+    """获取连接池命中统计"""
+    return pool.get_stats()
+
+
+def get_data_version(conn):
+    """
+    读取连接的 PRAGMA data_version
+    其他连接（包括其他进程）每提交一次写入该值就会变化，本连接自己的写入不会改变它
+    """
+    return conn.execute('PRAGMA data_version').fetchone()[0]
+
+
+def get_change_version(conn, customer_id=None, tables=None):
+    """
+    读取变更计数（change_counters 表，由触发器在增删改时递增）
+    :param customer_id: 只统计该客户的变更（包括对所有客户生效的公共行，记在客户ID 0 下），None表示所有客户
+    :param tables: 只统计这些表的变更（表名列表），None表示所有表
+    :return: 计数之和，数据变化后一定增大
+    """
+    query = 'SELECT COALESCE(SUM(version), 0) FROM change_counters WHERE 1 = 1'
+    params = []
+    if customer_id is not None:
+        query += ' AND customer_id IN (?, 0)'
+        params.append(customer_id)
+    if tables:
+        query += f" AND table_name IN ({', '.join('?' * len(tables))})"
+        params.extend(tables)
+    return conn.execute(query, params).fetchone()[0]
+
+
+class ChangeTracker:
+    """
+    缓存一致性检查
+    记录每个线程当前连接上次读到的 data_version 和本连接的写入次数（total_changes），
+    两者都没变时说明没有任何新提交，直接返回上次读取的变更计数，不查询计数表；
+    任一变化时重新读取。多个工作进程只需共享同一个数据库文件
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {'checks': 0, 'reads': 0}
+
+    def version(self, conn, customer_id=None, tables=None):
+        """
+        获取某个范围的变更版本
+        缓存的数据记录加载时的版本，读取时版本不同即说明已过期
+        :param conn: 数据库连接
+        :param customer_id: 客户ID，None表示所有客户
+        :param tables: 表名列表，None表示所有表
+        :return: 变更版本（整数）
+        """
+        marker = (get_data_version(conn), conn.total_changes)
+        memo = getattr(self._local, 'memo', None)
+        if memo is None or memo[0] is not conn or memo[1] != marker:
+            memo = (conn, marker, {})
+            self._local.memo = memo
+
+        key = (customer_id, tuple(tables) if tables else None)
+        versions = memo[2]
+        if key not in versions:
+            versions[key] = get_change_version(conn, customer_id, tables)
+            with self._lock:
+                self._stats['reads'] += 1
+        with self._lock:
+            self._stats['checks'] += 1
+        return versions[key]
+
+    def get_stats(self):
+        """获取检查次数和实际读取计数表的次数"""
+        with self._lock:
+            return dict(self._stats)
+
+
+# 全局一致性检查器
+change_tracker = ChangeTracker()
 
 
 def init_db():
     """
     初始化数据库
-    创建所有必要的表和默认数据
+    执行待执行的结构迁移；结构已是最新版本时只读取一次版本号，不执行任何DDL
+    已存在管理员时不会计算任何密码哈希
     """
+    from migrations import LATEST_VERSION, get_schema_version, migrate
+    
     # 确保数据目录存在
     if not os.path.exists('data'):
         os.makedirs('data')
     
     conn = get_db()
-    cursor = conn.cursor()
     
     try:
-        # 创建用户表
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                role TEXT NOT NULL CHECK(role IN ('admin', 'customer')),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # 创建月度目标表
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS monthly_targets (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                customer_id INTEGER NOT NULL,
-                year_month TEXT NOT NULL,
-                start_date TEXT NOT NULL,
-                end_date TEXT NOT NULL,
-                target_amount REAL NOT NULL,
-                period_number INTEGER DEFAULT 1,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (customer_id) REFERENCES users(id)
-            )
-        ''')
-        
-        # 检查是否需要迁移period_number字段
-        try:
-            cursor.execute('SELECT period_number FROM monthly_targets LIMIT 1')
-        except sqlite3.OperationalError:
-            print("Running migration: adding period_number to monthly_targets")
-            cursor.execute('ALTER TABLE monthly_targets ADD COLUMN period_number INTEGER DEFAULT 1')
-            conn.commit()
-        
-        # 创建流水记录表
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS daily_records (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                customer_id INTEGER NOT NULL,
-                date TEXT NOT NULL,
-                amount REAL NOT NULL,
-                daily_total REAL,
-                status TEXT DEFAULT 'pending' CHECK(status IN ('pending', 'done')),
-                operator TEXT,
-                operator_id INTEGER,
-                channel_id INTEGER,
-                is_daily_summary INTEGER DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (customer_id) REFERENCES users(id),
-                FOREIGN KEY (operator_id) REFERENCES operators(id),
-                FOREIGN KEY (channel_id) REFERENCES payment_channels(id)
-            )
-        ''')
-        
-        # 创建操作员表
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS operators (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                customer_id INTEGER,
-                is_active BOOLEAN DEFAULT 1,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (customer_id) REFERENCES users(id)
-            )
-        ''')
-        
-        # 创建支付渠道表
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS payment_channels (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                operator_id INTEGER NOT NULL,
-                is_active BOOLEAN DEFAULT 1,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (operator_id) REFERENCES operators(id)
-            )
-        ''')
-        
-        # 创建索引以提高查询性能
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_records_customer_date 
-            ON daily_records(customer_id, date)
-        ''')
+        if get_schema_version(conn) < LATEST_VERSION:
+            migrate(conn)
+            print("[INFO] 数据库初始化完成")
         
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_records_status 
-            ON daily_records(status)
-        ''')
-        
-        # 创建默认管理员账户
-        try:
-            admin_hash = generate_password_hash('admin123')
-            cursor.execute(
-                'INSERT INTO users (username, password_hash, role) VALUES (?, ?, ?)',
-                ('admin', admin_hash, 'admin')
-            )
-            print("[INFO] 默认管理员账户已创建: admin / admin123")
-        except sqlite3.IntegrityError:
-            print("[INFO] 管理员账户已存在，跳过创建")
-        
-        conn.commit()
-        print("[INFO] 数据库初始化完成")
+        ensure_admin(conn)
         
     except Exception as e:
         conn.rollback()
         print(f"[ERROR] 数据库初始化失败: {e}")
         raise
     finally:
-        conn.close()
+        close_db(conn)
 
 
-def backup_database(backup_path=None):
+def create_admin(conn, username, password=None, password_hash=None):
     """
-    备份数据库
-    :param backup_path: 备份文件路径，如果为None则自动生成
+    创建管理员账户
+    :param conn: 数据库连接
+    :param username: 用户名
+    :param password: 明文密码（与 password_hash 二选一）
+    :param password_hash: 已生成的密码哈希
+    :return: 新用户ID
+    """
+    if password_hash is None:
+        if not password:
+            raise ValueError('必须提供密码或密码哈希')
+        password_hash = generate_password_hash(password)
+    
+    cursor = conn.cursor()
+    cursor.execute(
+        'INSERT INTO users (username, password_hash, role) VALUES (?, ?, ?)',
+        (username, password_hash, 'admin')
+    )
+    conn.commit()
+    return cursor.lastrowid
+
+
+def ensure_admin(conn):
+    """
+    确保至少存在一个管理员账户
+    已有管理员时只执行一次查询；否则优先使用环境变量 ADMIN_PASSWORD_HASH 提供的哈希，
+    未提供时才创建默认账户 admin / admin123
+    :return: 新建管理员的ID，已存在管理员时返回None
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM users WHERE role = 'admin' LIMIT 1")
+    if cursor.fetchone():
+        return None
+    
+    username = Config.ADMIN_USERNAME
+    if Config.ADMIN_PASSWORD_HASH:
+        admin_id = create_admin(conn, username, password_hash=Config.ADMIN_PASSWORD_HASH)
+        print(f"[INFO] 已使用 ADMIN_PASSWORD_HASH 创建管理员账户: {username}")
+    else:
+        admin_id = create_admin(conn, username, password='admin123')
+        print(f"[INFO] 默认管理员账户已创建: {username} / admin123")
+    return admin_id
+
+
+def backup_database(backup_path=None, compress=None, keep=None, pages=None, sleep=None):
+    """
+    在线备份数据库
+    使用SQLite备份API分批复制页面，每批之间暂停，备份期间不阻塞正常读写
+    :param backup_path: 备份文件路径，如果为None则在备份目录下自动生成
+    :param compress: 是否gzip压缩，None表示使用配置
+    :param keep: 备份目录中保留的备份数量，None表示使用配置，0表示不清理
+    :param pages: 每批复制的页数，None表示使用配置
+    :param sleep: 每批之间暂停的秒数，None表示使用配置
     :return: 备份文件路径
     """
+    import gzip
     import shutil
-    from datetime import datetime
+    
+    compress = Config.DATABASE_BACKUP_COMPRESS if compress is None else compress
+    pages = Config.DATABASE_BACKUP_PAGES if pages is None else pages
+    sleep = Config.DATABASE_BACKUP_SLEEP if sleep is None else sleep
     
     if backup_path is None:
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        backup_path = f'data/flow_backup_{timestamp}.db'
+        backup_path = os.path.join(Config.DATABASE_BACKUP_DIR, f'flow_backup_{timestamp}.db')
+        if keep is None:
+            keep = Config.DATABASE_BACKUP_KEEP
     
     # 确保备份目录存在
-    os.makedirs(os.path.dirname(backup_path), exist_ok=True)
+    backup_dir = os.path.dirname(backup_path) or '.'
+    os.makedirs(backup_dir, exist_ok=True)
+    
+    # 先备份到临时文件，完成后再改名，避免留下不完整的备份
+    temp_path = backup_path + '.tmp'
+    source = connect(pool.database, {'busy_timeout': pool.profile.get('busy_timeout', 5000)})
+    target = sqlite3.connect(temp_path)
+    try:
+        source.backup(target, pages=pages, sleep=sleep)
+    except Exception:
+        target.close()
+        os.remove(temp_path)
+        raise
+    finally:
+        source.close()
+    target.close()
+    
+    if compress:
+        if not backup_path.endswith('.gz'):
+            backup_path += '.gz'
+        with open(temp_path, 'rb') as src, gzip.open(backup_path, 'wb') as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        os.remove(temp_path)
+    else:
+        os.replace(temp_path, backup_path)
     
-    # 复制数据库文件
-    shutil.copy2(Config.DATABASE_PATH, backup_path)
     print(f"[INFO] 数据库已备份到: {backup_path}")
     
+    if keep:
+        prune_backups(backup_dir, keep)
+    
     return backup_path
 
 
+def list_backups(backup_dir=None):
+    """
+    列出备份文件
+    :param backup_dir: 备份目录，None表示使用配置
+    :return: 按修改时间从新到旧排列的文件路径列表
+    """
+    backup_dir = backup_dir or Config.DATABASE_BACKUP_DIR
+    if not os.path.isdir(backup_dir):
+        return []
+    
+    backups = [
+        os.path.join(backup_dir, name) for name in os.listdir(backup_dir)
+        if name.startswith('flow_backup_') and name.endswith(('.db', '.db.gz'))
+    ]
+    return sorted(backups, key=os.path.getmtime, reverse=True)
+
+
+def prune_backups(backup_dir, keep):
+    """
+    清理旧备份，只保留最新的 keep 个
+    :return: 删除的文件路径列表
+    """
+    removed = []
+    for path in list_backups(backup_dir)[keep:]:
+        os.remove(path)
+        removed.append(path)
+    if removed:
+        print(f"[INFO] 已清理 {len(removed)} 个旧备份")
+    return removed
+
+
+class BackupScheduler:
+    """
+    定时备份
+    后台线程按间隔执行在线备份；以最新备份的时间判断是否到期，
+    多个工作进程同时运行时不会重复备份
+    """
+    
+    def __init__(self, interval, backup_dir, keep=None, compress=None):
+        """
+        :param interval: 备份间隔（秒）
+        :param backup_dir: 备份目录
+        :param keep: 保留的备份数量
+        :param compress: 是否gzip压缩
+        """
+        self.interval = interval
+        self.backup_dir = backup_dir
+        self.keep = keep
+        self.compress = compress
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def seconds_until_due(self):
+        """距离下次备份的秒数"""
+        backups = list_backups(self.backup_dir)
+        if not backups:
+            return 0
+        age = time.time() - os.path.getmtime(backups[0])
+        return max(0, self.interval - age)
+    
+    def run_once(self):
+        """到期时执行一次备份"""
+        if self.seconds_until_due() > 0:
+            return None
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        path = os.path.join(self.backup_dir, f'flow_backup_{timestamp}.db')
+        return backup_database(path, compress=self.compress, keep=self.keep)
+    
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"[ERROR] 定时备份失败: {e}")
+            # 最多等待一分钟后重新检查，以便感知其他进程完成的备份
+            self._stop.wait(min(max(self.seconds_until_due(), 1), 60))
+    
+    def start(self):
+        """启动后台备份线程"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='db-backup', daemon=True)
+            self._thread.start()
+    
+    def stop(self):
+        """停止后台备份线程"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
 class DatabaseManager:
     """
     数据库管理器类
     提供更高级的数据库操作接口
+    
+    用法一：with DatabaseManager() as db: ...  自动获取连接，退出时提交或回滚
+    用法二：db = DatabaseManager(conn)        使用已有连接，由调用方负责提交
     """
     
-    def __init__(self):
-        self.conn = None
+    # 批量写入时每次 executemany 的行数
+    BULK_CHUNK_SIZE = 1000
+    
+    def __init__(self, conn=None):
+        self.conn = conn
+        self._owns_conn = conn is None
+        self._savepoint_depth = 0
     
     def __enter__(self):
         """上下文管理器入口"""
-        self.conn = get_db()
+        if self._owns_conn:
+            self.conn = get_db()
         return self
     
     def __exit__(self, exc_type, exc_val, exc_tb):
         """上下文管理器出口"""
+        if not self._owns_conn:
+            return
         if exc_type:
             self.conn.rollback()
         else:
@@ -263,3 +720,127 @@ class DatabaseManager:
         query = f'DELETE FROM {table} WHERE {where_clause}'
         cursor = self.execute(query, where_params)
         return cursor.rowcount
+    
+    def _bulk_execute(self, query, params_iter, chunk_size=None, progress=None):
+        """
+        分批执行 executemany，所有批次在同一个事务（保存点）中完成
+        任一批次失败时撤销本次调用写入的全部数据
+        :param progress: 每批完成后调用 progress(累计行数)
+        :return: 影响的总行数
+        """
+        chunk_size = chunk_size or self.BULK_CHUNK_SIZE
+        params_iter = iter(params_iter)
+        savepoint = f'bulk_write_{self._savepoint_depth}'
+        cursor = self.conn.cursor()
+        
+        self._savepoint_depth += 1
+        cursor.execute(f'SAVEPOINT {savepoint}')
+        try:
+            count = 0
+            while True:
+                chunk = list(islice(params_iter, chunk_size))
+                if not chunk:
+                    break
+                cursor.executemany(query, chunk)
+                count += cursor.rowcount
+                if progress:
+                    progress(count)
+            cursor.execute(f'RELEASE {savepoint}')
+            return count
+        except Exception:
+            cursor.execute(f'ROLLBACK TO {savepoint}')
+            cursor.execute(f'RELEASE {savepoint}')
+            raise
+        finally:
+            self._savepoint_depth -= 1
+    
+    @staticmethod
+    def _bulk_columns(rows, columns):
+        """
+        确定批量写入的字段列表
+        :return: (字段列表, 行迭代器)
+        """
+        rows = iter(rows)
+        if columns is None:
+            first = next(rows, None)
+            if first is None:
+                return [], iter(())
+            columns = list(first.keys())
+            rows = chain([first], rows)
+        return list(columns), rows
+    
+    @staticmethod
+    def _row_values(row, columns):
+        """按字段顺序取出一行的值，支持字典或已按字段排好序的元组"""
+        if isinstance(row, Mapping):
+            return tuple(row[c] for c in columns)
+        return tuple(row)
+    
+    def insert_many(self, table, rows, columns=None, chunk_size=None, progress=None):
+        """
+        批量插入数据
+        :param table: 表名
+        :param rows: 字典列表（或可迭代对象），所有字典包含相同的键；
+                     指定 columns 时也可以是按字段顺序排列的元组
+        :param columns: 字段列表，None表示使用第一行的键
+        :param chunk_size: 每批行数
+        :param progress: 每批完成后调用 progress(累计插入行数)
+        :return: 插入的行数
+        """
+        columns, rows = self._bulk_columns(rows, columns)
+        if not columns:
+            return 0
+        
+        placeholders = ', '.join(['?' for _ in columns])
+        query = f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({placeholders})'
+        params = (self._row_values(row, columns) for row in rows)
+        return self._bulk_execute(query, params, chunk_size, progress)
+    
+    def upsert_many(self, table, rows, conflict_columns, update_columns=None, columns=None, chunk_size=None):
+        """
+        批量插入或更新数据（INSERT ... ON CONFLICT）
+        :param table: 表名
+        :param rows: 字典列表（或可迭代对象）；指定 columns 时也可以是元组
+        :param conflict_columns: 冲突判断字段（需有唯一索引）
+        :param update_columns: 冲突时更新的字段，None表示除冲突字段外的全部字段，空列表表示忽略冲突行
+        :param columns: 字段列表，None表示使用第一行的键
+        :param chunk_size: 每批行数
+        :return: 插入或更新的行数
+        """
+        columns, rows = self._bulk_columns(rows, columns)
+        if not columns:
+            return 0
+        
+        if update_columns is None:
+            update_columns = [c for c in columns if c not in conflict_columns]
+        
+        placeholders = ', '.join(['?' for _ in columns])
+        query = f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({placeholders}) ' \
+                f'ON CONFLICT ({", ".join(conflict_columns)}) '
+        if update_columns:
+            query += 'DO UPDATE SET ' + ', '.join(f'{c} = excluded.{c}' for c in update_columns)
+        else:
+            query += 'DO NOTHING'
+        
+        params = (self._row_values(row, columns) for row in rows)
+        return self._bulk_execute(query, params, chunk_size)
+    
+    def update_many(self, table, rows, key='id', columns=None, chunk_size=None):
+        """
+        按主键批量更新数据
+        :param table: 表名
+        :param rows: 字典列表（或可迭代对象），每个字典都包含 key 字段
+        :param key: 用于定位记录的字段
+        :param columns: 要更新的字段，None表示使用第一行除 key 外的全部键
+        :param chunk_size: 每批行数
+        :return: 更新的行数
+        """
+        columns, rows = self._bulk_columns(rows, columns)
+        columns = [c for c in columns if c != key]
+        if not columns:
+            return 0
+        
+        set_clause = ', '.join([f'{c} = ?' for c in columns])
+        query = f'UPDATE {table} SET {set_clause} WHERE {key} = ?'
+        params = (tuple(row[c] for c in columns) + (row[key],) for row in rows)
+        return self._bulk_execute(query, params, chunk_size)
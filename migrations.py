@@ -0,0 +1,658 @@
+"""
+数据库迁移模块 - 流水管理系统
+按编号顺序升级数据库结构，当前版本记录在 PRAGMA user_version 中
+
+新增迁移：编写一个接收 cursor 的函数，并追加到 MIGRATIONS 列表末尾。
+已发布的迁移不要修改或调整顺序。
+
+使用方法：
+    python migrations.py status     查看当前版本和待执行的迁移
+    python migrations.py upgrade    执行所有待执行的迁移
+    python migrations.py rebuild [客户ID]
+                                    按明细重建每日汇总和目标进度（批量回填数据后使用）
+"""
+
+import sys
+from datetime import datetime
+
+
+def _column_names(cursor, table):
+    """获取表的所有字段名"""
+    cursor.execute(f'PRAGMA table_info({table})')
+    return {row[1] for row in cursor.fetchall()}
+
+
+def _migration_001_initial_schema(cursor):
+    """创建基础表结构和索引"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            role TEXT NOT NULL CHECK(role IN ('admin', 'customer')),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS monthly_targets (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            customer_id INTEGER NOT NULL,
+            year_month TEXT NOT NULL,
+            start_date TEXT NOT NULL,
+            end_date TEXT NOT NULL,
+            target_amount REAL NOT NULL,
+            period_number INTEGER DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (customer_id) REFERENCES users(id)
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS daily_records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            customer_id INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            amount REAL NOT NULL,
+            daily_total REAL,
+            status TEXT DEFAULT 'pending' CHECK(status IN ('pending', 'done')),
+            operator TEXT,
+            operator_id INTEGER,
+            channel_id INTEGER,
+            is_daily_summary INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (customer_id) REFERENCES users(id),
+            FOREIGN KEY (operator_id) REFERENCES operators(id),
+            FOREIGN KEY (channel_id) REFERENCES payment_channels(id)
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_records_customer_date
+        ON daily_records(customer_id, date)
+    ''')
+
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_records_status
+        ON daily_records(status)
+    ''')
+
+
+def _migration_002_period_number(cursor):
+    """为旧版 monthly_targets 表添加 period_number 字段"""
+    if 'period_number' not in _column_names(cursor, 'monthly_targets'):
+        cursor.execute('ALTER TABLE monthly_targets ADD COLUMN period_number INTEGER DEFAULT 1')
+
+
+def _migration_003_operators_and_channels(cursor):
+    """添加操作员和支付渠道功能（原 upgrade_database.py）"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS operators (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            customer_id INTEGER,
+            is_active BOOLEAN DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (customer_id) REFERENCES users(id)
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS payment_channels (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            operator_id INTEGER NOT NULL,
+            is_active BOOLEAN DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (operator_id) REFERENCES operators(id)
+        )
+    ''')
+
+    columns = _column_names(cursor, 'daily_records')
+    if 'operator_id' not in columns:
+        cursor.execute('ALTER TABLE daily_records ADD COLUMN operator_id INTEGER')
+    if 'channel_id' not in columns:
+        cursor.execute('ALTER TABLE daily_records ADD COLUMN channel_id INTEGER')
+
+
+def _migration_004_fix_empty_target_dates(cursor):
+    """修复 monthly_targets 中日期为空的记录（原 fix_dates.py）"""
+    cursor.execute('''
+        SELECT id, customer_id
+        FROM monthly_targets
+        WHERE start_date IS NULL OR start_date = '' OR end_date IS NULL OR end_date = '' OR start_date = '日期' OR end_date = '日期'
+    ''')
+    empty_targets = cursor.fetchall()
+
+    for target_id, customer_id in empty_targets:
+        # 使用该客户实际流水的日期范围，没有流水则使用当前日期
+        cursor.execute('''
+            SELECT MIN(date), MAX(date), COUNT(*)
+            FROM daily_records
+            WHERE customer_id = ? AND is_daily_summary = 0
+        ''', (customer_id,))
+        min_date, max_date, count = cursor.fetchone()
+
+        if not count:
+            min_date = max_date = datetime.now().strftime('%Y-%m-%d')
+
+        cursor.execute('''
+            UPDATE monthly_targets
+            SET start_date = ?, end_date = ?
+            WHERE id = ?
+        ''', (min_date, max_date, target_id))
+
+
+def _migration_005_import_jobs(cursor):
+    """创建后台导入任务表"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS import_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_by INTEGER,
+            filename TEXT NOT NULL,
+            options TEXT,
+            state TEXT NOT NULL DEFAULT 'queued'
+                CHECK(state IN ('queued', 'parsing', 'waiting', 'writing', 'done', 'failed')),
+            customer_id INTEGER,
+            period_number INTEGER,
+            rows_processed INTEGER DEFAULT 0,
+            record_count INTEGER,
+            result TEXT,
+            error TEXT,
+            parse_seconds REAL,
+            write_seconds REAL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP,
+            FOREIGN KEY (created_by) REFERENCES users(id)
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_import_jobs_created
+        ON import_jobs(created_at)
+    ''')
+
+
+def _migration_006_record_slot(cursor):
+    """daily_records 添加交易序号字段，用于重复导入时按 (客户, 日期, 序号) 比对"""
+    if 'slot' not in _column_names(cursor, 'daily_records'):
+        cursor.execute('ALTER TABLE daily_records ADD COLUMN slot INTEGER')
+
+    # 旧数据的序号为空，首次重新导入该期数时补上
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_records_customer_date_slot
+        ON daily_records(customer_id, date, slot)
+        WHERE slot IS NOT NULL
+    ''')
+
+
+def _migration_007_target_source_hash(cursor):
+    """monthly_targets 记录导入文件的内容哈希，用于识别重复导入"""
+    if 'source_hash' not in _column_names(cursor, 'monthly_targets'):
+        cursor.execute('ALTER TABLE monthly_targets ADD COLUMN source_hash TEXT')
+
+
+def _migration_008_daily_aggregates(cursor):
+    """
+    创建按客户、日期汇总的 daily_aggregates 表，由触发器随明细的增删改增量维护，
+    取代由程序写入的当日汇总行（is_daily_summary = 1, status = 'pending'）
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS daily_aggregates (
+            customer_id INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            total REAL NOT NULL DEFAULT 0,
+            done_amount REAL NOT NULL DEFAULT 0,
+            done_count INTEGER NOT NULL DEFAULT 0,
+            pending_amount REAL NOT NULL DEFAULT 0,
+            pending_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (customer_id, date)
+        ) WITHOUT ROWID
+    ''')
+
+    # 计入一条明细
+    add_new = '''
+        INSERT INTO daily_aggregates
+            (customer_id, date, total, done_amount, done_count, pending_amount, pending_count)
+        SELECT NEW.customer_id, NEW.date, NEW.amount,
+               CASE WHEN NEW.status = 'done' THEN NEW.amount ELSE 0 END,
+               CASE WHEN NEW.status = 'done' THEN 1 ELSE 0 END,
+               CASE WHEN NEW.status = 'done' THEN 0 ELSE NEW.amount END,
+               CASE WHEN NEW.status = 'done' THEN 0 ELSE 1 END
+        WHERE true
+        ON CONFLICT (customer_id, date) DO UPDATE SET
+            total = total + excluded.total,
+            done_amount = done_amount + excluded.done_amount,
+            done_count = done_count + excluded.done_count,
+            pending_amount = pending_amount + excluded.pending_amount,
+            pending_count = pending_count + excluded.pending_count;
+    '''
+
+    # 扣除一条明细，当日已无明细时删除汇总行
+    remove_old = '''
+        UPDATE daily_aggregates SET
+            total = total - OLD.amount,
+            done_amount = done_amount - CASE WHEN OLD.status = 'done' THEN OLD.amount ELSE 0 END,
+            done_count = done_count - CASE WHEN OLD.status = 'done' THEN 1 ELSE 0 END,
+            pending_amount = pending_amount - CASE WHEN OLD.status = 'done' THEN 0 ELSE OLD.amount END,
+            pending_count = pending_count - CASE WHEN OLD.status = 'done' THEN 0 ELSE 1 END
+        WHERE customer_id = OLD.customer_id AND date = OLD.date;
+        DELETE FROM daily_aggregates
+        WHERE customer_id = OLD.customer_id AND date = OLD.date
+          AND done_count <= 0 AND pending_count <= 0;
+    '''
+
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_daily_records_aggregate_insert
+        AFTER INSERT ON daily_records
+        WHEN COALESCE(NEW.is_daily_summary, 0) = 0
+        BEGIN {add_new} END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_daily_records_aggregate_delete
+        AFTER DELETE ON daily_records
+        WHEN COALESCE(OLD.is_daily_summary, 0) = 0
+        BEGIN {remove_old} END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_daily_records_aggregate_update_old
+        AFTER UPDATE OF customer_id, date, amount, status, is_daily_summary ON daily_records
+        WHEN COALESCE(OLD.is_daily_summary, 0) = 0
+        BEGIN {remove_old} END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_daily_records_aggregate_update_new
+        AFTER UPDATE OF customer_id, date, amount, status, is_daily_summary ON daily_records
+        WHEN COALESCE(NEW.is_daily_summary, 0) = 0
+        BEGIN {add_new} END
+    ''')
+
+    # 按现有明细回填
+    cursor.execute('DELETE FROM daily_aggregates')
+    cursor.execute('''
+        INSERT INTO daily_aggregates
+            (customer_id, date, total, done_amount, done_count, pending_amount, pending_count)
+        SELECT customer_id, date, SUM(amount),
+               SUM(CASE WHEN status = 'done' THEN amount ELSE 0 END),
+               SUM(CASE WHEN status = 'done' THEN 1 ELSE 0 END),
+               SUM(CASE WHEN status = 'done' THEN 0 ELSE amount END),
+               SUM(CASE WHEN status = 'done' THEN 0 ELSE 1 END)
+        FROM daily_records
+        WHERE COALESCE(is_daily_summary, 0) = 0
+        GROUP BY customer_id, date
+    ''')
+
+    # 删除程序生成的当日汇总行；补充历史写入的汇总行（status = 'done'）保留
+    cursor.execute("DELETE FROM daily_records WHERE is_daily_summary = 1 AND status = 'pending'")
+
+
+def _migration_009_target_progress(cursor):
+    """
+    创建目标进度表 target_progress，每个月度目标一行，记录期间内已完成的金额和笔数
+    由触发器维护：daily_aggregates 变化时更新覆盖该日期的目标，目标增改时按日期范围重新汇总
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS target_progress (
+            target_id INTEGER PRIMARY KEY,
+            customer_id INTEGER NOT NULL,
+            completed_amount REAL NOT NULL DEFAULT 0,
+            completed_count INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_targets_customer_range
+        ON monthly_targets(customer_id, start_date, end_date)
+    ''')
+
+    # 覆盖某一天的所有目标
+    def covering(row):
+        return f'''
+            SELECT id FROM monthly_targets
+            WHERE customer_id = {row}.customer_id
+              AND start_date <= {row}.date AND end_date >= {row}.date
+        '''
+
+    def adjust(row, sign):
+        return f'''
+            UPDATE target_progress SET
+                completed_amount = completed_amount {sign} {row}.done_amount,
+                completed_count = completed_count {sign} {row}.done_count,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE target_id IN ({covering(row)});
+        '''
+
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_daily_aggregates_progress_insert
+        AFTER INSERT ON daily_aggregates
+        WHEN NEW.done_count != 0
+        BEGIN {adjust('NEW', '+')} END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_daily_aggregates_progress_delete
+        AFTER DELETE ON daily_aggregates
+        WHEN OLD.done_count != 0
+        BEGIN {adjust('OLD', '-')} END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_daily_aggregates_progress_update
+        AFTER UPDATE ON daily_aggregates
+        WHEN OLD.done_amount != NEW.done_amount OR OLD.done_count != NEW.done_count
+          OR OLD.customer_id != NEW.customer_id OR OLD.date != NEW.date
+        BEGIN {adjust('OLD', '-')} {adjust('NEW', '+')} END
+    ''')
+
+    # 目标新增或修改日期范围时按每日汇总重新计算
+    recompute = '''
+        INSERT OR REPLACE INTO target_progress
+            (target_id, customer_id, completed_amount, completed_count, updated_at)
+        SELECT NEW.id, NEW.customer_id,
+               COALESCE(SUM(da.done_amount), 0), COALESCE(SUM(da.done_count), 0), CURRENT_TIMESTAMP
+        FROM daily_aggregates da
+        WHERE da.customer_id = NEW.customer_id
+          AND da.date >= NEW.start_date AND da.date <= NEW.end_date;
+    '''
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_monthly_targets_progress_insert
+        AFTER INSERT ON monthly_targets
+        BEGIN {recompute} END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_monthly_targets_progress_update
+        AFTER UPDATE OF customer_id, start_date, end_date ON monthly_targets
+        BEGIN {recompute} END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_monthly_targets_progress_delete
+        AFTER DELETE ON monthly_targets
+        BEGIN
+            DELETE FROM target_progress WHERE target_id = OLD.id;
+        END
+    ''')
+
+    rebuild_target_progress(cursor)
+
+
+def _migration_010_change_counters(cursor):
+    """
+    创建变更计数表 change_counters，按 (表名, 客户ID) 记录写入次数
+    由触发器在每次增删改时递增，多个工作进程的缓存据此判断数据是否变化（见 database.ChangeTracker）
+    不属于任何客户的行（如公共操作员）记在客户ID 0 下
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS change_counters (
+            customer_id INTEGER NOT NULL,
+            table_name TEXT NOT NULL,
+            version INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (customer_id, table_name)
+        ) WITHOUT ROWID
+    ''')
+
+    def bump(table, customer_expr, where='true'):
+        return f'''
+            INSERT INTO change_counters (customer_id, table_name, version)
+            SELECT COALESCE({customer_expr}, 0), '{table}', 1 WHERE {where}
+            ON CONFLICT (customer_id, table_name) DO UPDATE SET version = version + 1;
+        '''
+
+    # 表名 -> 行所属客户ID的表达式（{row} 替换为 NEW 或 OLD）
+    tables = {
+        'daily_records': '{row}.customer_id',
+        'monthly_targets': '{row}.customer_id',
+        'users': '{row}.id',
+        'operators': '{row}.customer_id',
+        'payment_channels': '(SELECT customer_id FROM operators WHERE id = {row}.operator_id)',
+    }
+    for table, expr in tables.items():
+        new, old = expr.format(row='NEW'), expr.format(row='OLD')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_changes_insert
+            AFTER INSERT ON {table}
+            BEGIN {bump(table, new)} END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_changes_delete
+            AFTER DELETE ON {table}
+            BEGIN {bump(table, old)} END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_changes_update
+            AFTER UPDATE ON {table}
+            BEGIN
+                {bump(table, new)}
+                {bump(table, old, f'{old} IS NOT {new}')}
+            END
+        ''')
+
+
+def _migration_011_query_indexes(cursor):
+    """
+    按实际查询调整索引（用 python query_check.py plans 核对执行计划）
+    流水查询都带 is_daily_summary = 0，明细索引均为该条件下的部分索引；
+    查询、统计用到的筛选字段和金额放进索引，按条件筛选和求和时不再回表
+    status 单列索引区分度太低，已由 (客户, 状态, ...) 索引取代
+    """
+    cursor.execute('DROP INDEX IF EXISTS idx_records_status')
+
+    # 客户流水查询（已完成 + 日期 / 操作员 / 渠道筛选）、按状态筛选的流水记录
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_records_live_customer_status
+        ON daily_records(customer_id, status, date, operator_id, channel_id, amount)
+        WHERE is_daily_summary = 0
+    ''')
+    # 管理员按日期查看所有客户的流水
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_records_live_date
+        ON daily_records(date)
+        WHERE is_daily_summary = 0
+    ''')
+    # 操作员业绩统计
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_records_live_operator
+        ON daily_records(operator_id, status, amount)
+        WHERE is_daily_summary = 0 AND operator_id IS NOT NULL
+    ''')
+    # 旧版操作人名称（/api/operators）
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_records_operator_name
+        ON daily_records(operator)
+        WHERE operator IS NOT NULL AND operator != ''
+    ''')
+
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_users_role
+        ON users(role, username)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_operators_customer
+        ON operators(customer_id, name)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_operators_name
+        ON operators(name)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_channels_operator
+        ON payment_channels(operator_id, name)
+    ''')
+
+
+def rebuild_daily_aggregates(cursor, customer_id=None):
+    """
+    按明细重建每日汇总
+    :param customer_id: 只重建该客户，None表示全部
+    """
+    where = 'WHERE COALESCE(is_daily_summary, 0) = 0'
+    params = ()
+    if customer_id is not None:
+        where += ' AND customer_id = ?'
+        params = (customer_id,)
+
+    cursor.execute('DELETE FROM daily_aggregates' + (' WHERE customer_id = ?' if params else ''), params)
+    cursor.execute(f'''
+        INSERT INTO daily_aggregates
+            (customer_id, date, total, done_amount, done_count, pending_amount, pending_count)
+        SELECT customer_id, date, SUM(amount),
+               SUM(CASE WHEN status = 'done' THEN amount ELSE 0 END),
+               SUM(CASE WHEN status = 'done' THEN 1 ELSE 0 END),
+               SUM(CASE WHEN status = 'done' THEN 0 ELSE amount END),
+               SUM(CASE WHEN status = 'done' THEN 0 ELSE 1 END)
+        FROM daily_records
+        {where}
+        GROUP BY customer_id, date
+    ''', params)
+
+
+def rebuild_target_progress(cursor, customer_id=None):
+    """
+    按每日汇总重建目标进度
+    :param customer_id: 只重建该客户的目标，None表示全部
+    """
+    where = ''
+    params = ()
+    if customer_id is not None:
+        where = 'WHERE mt.customer_id = ?'
+        params = (customer_id,)
+
+    cursor.execute('DELETE FROM target_progress' + (' WHERE customer_id = ?' if params else ''), params)
+    cursor.execute(f'''
+        INSERT INTO target_progress (target_id, customer_id, completed_amount, completed_count)
+        SELECT mt.id, mt.customer_id,
+               COALESCE(SUM(da.done_amount), 0), COALESCE(SUM(da.done_count), 0)
+        FROM monthly_targets mt
+        LEFT JOIN daily_aggregates da
+            ON da.customer_id = mt.customer_id
+           AND da.date >= mt.start_date AND da.date <= mt.end_date
+        {where}
+        GROUP BY mt.id
+    ''', params)
+
+
+def rebuild_rollups(conn, customer_id=None):
+    """
+    重建每日汇总和目标进度（在一个事务中）
+    先清空目标进度，重建每日汇总时触发器不再逐行调整，最后一次性汇总
+    :param customer_id: 只重建该客户，None表示全部
+    """
+    if conn.in_transaction:
+        conn.commit()
+    cursor = conn.cursor()
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+        cursor.execute('DELETE FROM target_progress' + (' WHERE customer_id = ?' if customer_id is not None else ''),
+                       () if customer_id is None else (customer_id,))
+        rebuild_daily_aggregates(cursor, customer_id)
+        rebuild_target_progress(cursor, customer_id)
+        # 汇总表不计入变更计数，这里手动递增，使各进程的统计缓存失效
+        cursor.execute('UPDATE change_counters SET version = version + 1'
+                       + (' WHERE customer_id = ?' if customer_id is not None else ''),
+                       () if customer_id is None else (customer_id,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+# 迁移列表：(版本号, 说明, 迁移函数)，版本号必须连续递增
+MIGRATIONS = [
+    (1, '创建基础表结构', _migration_001_initial_schema),
+    (2, 'monthly_targets 添加 period_number', _migration_002_period_number),
+    (3, '添加操作员和支付渠道', _migration_003_operators_and_channels),
+    (4, '修复月度目标空日期', _migration_004_fix_empty_target_dates),
+    (5, '创建后台导入任务表', _migration_005_import_jobs),
+    (6, 'daily_records 添加交易序号', _migration_006_record_slot),
+    (7, 'monthly_targets 添加导入文件哈希', _migration_007_target_source_hash),
+    (8, '创建每日汇总表 daily_aggregates', _migration_008_daily_aggregates),
+    (9, '创建目标进度表 target_progress', _migration_009_target_progress),
+    (10, '创建变更计数表 change_counters', _migration_010_change_counters),
+    (11, '按查询调整索引', _migration_011_query_indexes),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn):
+    """读取数据库当前的结构版本"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def get_pending_migrations(conn):
+    """
+    获取待执行的迁移
+    :return: [(版本号, 说明, 迁移函数), ...]
+    """
+    current = get_schema_version(conn)
+    return [m for m in MIGRATIONS if m[0] > current]
+
+
+def migrate(conn, target_version=None):
+    """
+    执行待执行的迁移
+    每个迁移在独立事务中执行，失败时回滚该迁移并抛出异常，版本号停在上一个成功的迁移
+    :param conn: 数据库连接
+    :param target_version: 升级到的版本，None表示最新版本
+    :return: 已执行的迁移版本号列表
+    """
+    if target_version is None:
+        target_version = LATEST_VERSION
+
+    applied = []
+    for version, description, func in get_pending_migrations(conn):
+        if version > target_version:
+            break
+
+        if conn.in_transaction:
+            conn.commit()
+        cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            # 其他进程可能已经完成了该迁移
+            if get_schema_version(conn) >= version:
+                conn.rollback()
+                continue
+            func(cursor)
+            cursor.execute(f'PRAGMA user_version = {int(version)}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        print(f"[INFO] 已执行迁移 {version:03d}: {description}")
+        applied.append(version)
+
+    return applied
+
+
+def main():
+    from database import get_db, close_db
+
+    command = sys.argv[1] if len(sys.argv) > 1 else 'status'
+    conn = get_db()
+
+    try:
+        if command == 'status':
+            print(f"当前版本: {get_schema_version(conn)}, 最新版本: {LATEST_VERSION}")
+            for version, description, _ in get_pending_migrations(conn):
+                print(f"  待执行 {version:03d}: {description}")
+        elif command == 'upgrade':
+            from database import backup_database
+            if get_pending_migrations(conn):
+                backup_database()
+            applied = migrate(conn)
+            print(f"[INFO] 执行了 {len(applied)} 个迁移，当前版本: {get_schema_version(conn)}")
+        elif command == 'rebuild':
+            customer_id = int(sys.argv[2]) if len(sys.argv) > 2 else None
+            rebuild_rollups(conn, customer_id)
+            scope = f'客户 {customer_id}' if customer_id is not None else '全部客户'
+            print(f"[INFO] 已重建{scope}的每日汇总和目标进度")
+        else:
+            print(f"未知命令: {command}（可用命令: status, upgrade, rebuild）")
+            sys.exit(1)
+    finally:
+        close_db(conn)
+
+
+if __name__ == '__main__':
+    main()
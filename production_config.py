@@ -41,10 +41,23 @@ class ExtendedProductionConfig(ProductionConfig):
     DATABASE_PATH = 'data/flow.db'
     DATABASE_BACKUP_ENABLED = True
     DATABASE_BACKUP_INTERVAL = 86400  # 24小时备份一次
+    DATABASE_BACKUP_DIR = 'data/backups'
+    DATABASE_BACKUP_KEEP = 14  # 保留最近14个备份
+    DATABASE_BACKUP_COMPRESS = True
+    
+    # SQLite引擎参数（生产环境使用更大的缓存）
+    SQLITE_JOURNAL_MODE = 'WAL'
+    SQLITE_SYNCHRONOUS = 'NORMAL'
+    SQLITE_BUSY_TIMEOUT = 10000  # 10秒
+    SQLITE_CACHE_SIZE = -64000  # 约64MB
+    SQLITE_MMAP_SIZE = 256 * 1024 * 1024  # 256MB
+    SQLITE_TEMP_STORE = 'MEMORY'
+    SQLITE_WAL_AUTOCHECKPOINT = 1000
     
     # 性能配置
     ENABLE_CACHING = True
     CACHE_TIMEOUT = 300  # 5分钟缓存
+    CACHE_MAX_ENTRIES = 4096
     
     # 维护模式
     MAINTENANCE_MODE = False
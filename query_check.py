@@ -0,0 +1,334 @@
+"""
+查询检查脚本 - 流水管理系统
+在临时数据库上用测试客户端访问各页面和接口，记录实际执行的SQL并逐条检查，不会修改正式数据库
+
+使用方法：
+    python query_check.py plans [--records 20000]
+        对每条查询执行 EXPLAIN QUERY PLAN，存在不使用索引的全表扫描时列出并以退出码1结束
+    python query_check.py counts [--records 20000]
+        统计每个请求执行的查询，同一查询（参数不同）在一个请求中重复执行过多（N+1）时列出并以退出码1结束
+"""
+
+import argparse
+import io
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+from collections import Counter, OrderedDict
+
+from flask import g, request
+
+from benchmark import seed_database, write_workbook
+from utils import KeysetPagination
+
+# 只检查读写数据的语句（PRAGMA、事务控制、建表等跳过）
+CHECKED_STATEMENTS = ('SELECT', 'WITH', 'UPDATE', 'DELETE', 'INSERT')
+
+# 允许整表扫描的 (页面, 表名或别名)，页面为None表示所有页面
+# 只收录本来就要读取整张表的查询（列出全部数据、全表合计），新增条目需写明原因
+ALLOWED_SCANS = {
+    (None, 'import_staging'): '导入临时表，只保存当前文件的数据',
+    (None, 'change_counters'): '全局缓存版本，每个客户每张表一行',
+    ('admin.dashboard', 'daily_aggregates'): '所有客户的流水合计',
+    ('admin.dashboard', 'mt'): '列出所有月度目标',
+    ('admin.import_jobs_list', 'import_jobs'): '按主键倒序取最近的任务，LIMIT 后停止',
+    ('admin.view_records', 'dr'): '不筛选时按日期索引顺序取第一页（LIMIT 后停止）',
+    ('admin.view_records', 'daily_aggregates'): '不按客户筛选时合计总条数，每个客户每天一行',
+    ('operator.index', 'o'): '列出所有操作员',
+    ('operator.api_list_operators', 'o'): '列出所有启用的操作员',
+    ('operator.stats', 'o'): '所有启用操作员的业绩',
+}
+
+# 执行计划中的整表扫描：SCAN 表名，以及按索引顺序读取整个索引的 SCAN 表名 USING [COVERING] INDEX
+# 用到索引条件的是 SEARCH，不会匹配
+FULL_SCAN = re.compile(r'^SCAN (\w+)(?: USING (?:COVERING )?INDEX \w+)?$')
+
+# 一个请求中同一查询（参数不同）最多执行的次数，超过视为逐条查询（N+1）
+MAX_REPEATED_QUERIES = 5
+
+# 归一化SQL：字符串和数字参数替换为 ?，IN 列表合并
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\(\?(?:\s*,\s*\?)+\)')
+
+
+def normalize_sql(sql):
+    """去掉参数值，得到查询的形状"""
+    sql = _STRING_LITERAL.sub('?', sql)
+    sql = _NUMBER_LITERAL.sub('?', sql)
+    return _IN_LIST.sub('(?)', sql)
+
+
+class SqlRecorder:
+    """
+    记录执行的SQL
+    statements: {语句: 第一次执行它的页面}
+    requests: [(请求, 页面, Counter({查询形状: 执行次数}))]，只统计SELECT
+    """
+
+    def __init__(self):
+        self.statements = OrderedDict()
+        self.requests = []
+
+    def add(self, current, sql):
+        text = ' '.join(sql.split())
+        if not text.upper().startswith(CHECKED_STATEMENTS):
+            return
+        _, endpoint, queries = current
+        self.statements.setdefault(text, endpoint)
+        if text.upper().startswith(('SELECT', 'WITH')):
+            queries[normalize_sql(text)] += 1
+
+    def attach(self, app):
+        """在请求开始时给本次请求的连接设置跟踪回调，请求结束时移除"""
+        from database import get_db
+
+        @app.before_request
+        def start_trace():
+            current = (f'{request.method} {request.full_path.rstrip("?")}', request.endpoint, Counter())
+            self.requests.append(current)
+            get_db().set_trace_callback(lambda sql: self.add(current, sql))
+
+        @app.teardown_request
+        def stop_trace(exception=None):
+            conn = g.get('db_conn')
+            if conn is not None:
+                conn.set_trace_callback(None)
+
+
+def seed_check_data(path, record_count):
+    """
+    生成检查用数据：客户和流水（benchmark.seed_database），再加上目标、操作员、渠道
+    :return: 客户数量
+    """
+    customer_count = 20
+    seed_database(path, record_count, customer_count)
+    conn = sqlite3.connect(path)
+    for customer_id in range(1, customer_count + 1):
+        conn.execute('''
+            INSERT INTO monthly_targets (customer_id, year_month, start_date, end_date, target_amount, period_number)
+            VALUES (?, '2026-03', '2026-03-01', '2026-03-31', 100000, 1)
+        ''', (customer_id,))
+        operator_id = conn.execute('INSERT INTO operators (name, customer_id) VALUES (?, ?)',
+                                   (f'操作员{customer_id}', customer_id)).lastrowid
+        channel_id = conn.execute('INSERT INTO payment_channels (name, operator_id) VALUES (?, ?)',
+                                  ('渠道', operator_id)).lastrowid
+        conn.execute('''
+            UPDATE daily_records SET operator_id = ?, channel_id = ?, operator = ?
+            WHERE id IN (SELECT id FROM daily_records WHERE customer_id = ? LIMIT 100)
+        ''', (operator_id, channel_id, f'操作员{customer_id}', customer_id))
+    conn.execute("INSERT INTO operators (name) VALUES ('公共操作员')")
+    conn.commit()
+    conn.close()
+    return customer_count
+
+
+def _workbook_upload(workdir, seed):
+    path = os.path.join(workdir, f'import_{seed}.xlsx')
+    write_workbook(path, 60, seed=seed)
+    with open(path, 'rb') as f:
+        return io.BytesIO(f.read())
+
+
+def exercise_app(client, workdir):
+    """
+    以管理员和客户身份访问各页面和接口（包括写操作和Excel导入）
+    :return: 出错的请求列表 [(方法, 路径, 状态码或异常名)]
+    """
+    errors = []
+
+    def login(user_id, role, username):
+        with client.session_transaction() as session:
+            session.clear()
+            session.update(user_id=user_id, role=role, username=username)
+
+    def call(method, path, **kwargs):
+        # 页面异常（如前后端分离后缺少的模板）只记录，出错前执行的查询仍会检查
+        try:
+            response = client.open(path, method=method, **kwargs)
+            response.get_data()
+        except Exception as e:
+            errors.append((method, path, type(e).__name__))
+            return
+        if response.status_code >= 400:
+            errors.append((method, path, response.status_code))
+
+    customer_id, operator_id, target_id = 1, 1, 1
+    period = {'start_date': '2026-03-01', 'end_date': '2026-03-31'}
+    # 页面的日期筛选使用年月日三个参数
+    period_args = 'start_year=2026&start_month=03&start_day=01&end_year=2026&end_month=03&end_day=31'
+    cursor = KeysetPagination.encode_cursor(['2026-03-01', 1])
+
+    login(21, 'admin', 'admin')
+    for path in ('/admin/dashboard', '/admin/view_records', '/admin/view_records?customer_id=1',
+                 f'/admin/view_records?{period_args}', f'/admin/view_records?after={cursor}',
+                 f'/admin/view_records?customer_id=1&{period_args}&before={cursor}',
+                 f'/admin/reconciliation?{period_args}',
+                 '/admin/customer_query', f'/admin/customer_query/{customer_id}',
+                 '/admin/operators/', '/admin/operators/stats', '/admin/operators/api/list',
+                 f'/admin/operators/api/list/{customer_id}', '/admin/import_jobs',
+                 f'/admin/edit_target/{target_id}', '/admin/add_target', '/admin/add_record',
+                 f'/api/customer/{customer_id}/stats', '/api/operators', '/api/db/status',
+                 '/api/cache/status', '/auth/status'):
+        call('GET', path)
+    for filters in ({}, {'operator_id': 'self'}, {'operator_id': str(operator_id), 'channel_id': '1'},
+                    {'channel_id': '0'}, {'stats_only': True}, {'per_page': 20},
+                    {'per_page': 20, 'after': cursor}, {'status': 'all', 'before': cursor},
+                    {'stream': True}):
+        call('POST', f'/admin/customer_query/search/{customer_id}', json=dict(period, **filters))
+
+    call('POST', '/api/update_record', json={'record_id': 1, 'status': 'done',
+                                             'operator_id': operator_id, 'channel_id': 1})
+    call('POST', '/api/update_operator', json={'record_id': 2, 'operator': '操作员1', 'status': 'done'})
+    call('POST', '/admin/add_record', data={'customer_id': customer_id, 'record_year': '2026',
+                                            'record_month': '3', 'record_day': '15', 'amount': '100',
+                                            'status': 'done', 'operator_id': str(operator_id)})
+    call('POST', f'/admin/edit_target/{target_id}', data={'start_date': '2026-03-01',
+                                                         'end_date': '2026-03-30', 'target_amount': '90000'})
+    call('POST', '/admin/add_target', data={'customer_name': 'customer2', 'period_number': '2',
+                                            'start_date': '2026-04-01', 'end_date': '2026-04-30',
+                                            'target_amount': '50000'})
+    call('POST', '/admin/operators/add', json={'name': '新操作员', 'customer_id': customer_id})
+    call('POST', f'/admin/operators/{operator_id}/channels/add', json={'name': '新渠道'})
+    call('POST', '/admin/api/add_customer', json={'username': 'query_check', 'password': '123456'})
+    call('POST', f'/admin/reset_password/{customer_id}', json={'password': '654321'})
+    for seed in (1, 2):
+        call('POST', '/admin/import_excel', content_type='multipart/form-data', data={
+            'file': (_workbook_upload(workdir, seed), 'import.xlsx'),
+            'user_mode': 'existing', 'existing_customer_id': '3', 'period_number': '1'})
+    call('POST', '/admin/delete_target/2')
+    call('POST', '/admin/operators/channels/2/delete')
+    call('POST', '/admin/operators/2/delete')
+    call('POST', '/admin/delete_user/4')
+
+    login(customer_id, 'customer', 'customer1')
+    for path in ('/customer/dashboard', '/customer/records',
+                 f'/customer/records?{period_args}&status=done',
+                 '/customer/query/', '/customer/operators/', '/customer/operators/api/list',
+                 f'/api/customer/{customer_id}/stats', '/api/operators'):
+        call('GET', path)
+    for filters in ({}, {'operator_id': 'self'}, {'operator_id': str(operator_id), 'channel_id': '1'},
+                    {'stats_only': True}, {'per_page': 20}, {'per_page': 20, 'after': cursor},
+                    {'operator_id': 'self', 'stream': True}):
+        call('POST', '/customer/query/search', json=dict(period, **filters))
+    call('POST', '/customer/operators/add', json={'name': '客户操作员'})
+    call('POST', f'/customer/operators/{operator_id}/channels/add', json={'name': '客户渠道'})
+    call('POST', '/customer/operators/channels/1/delete')
+    return errors
+
+
+def find_full_scans(conn, sql, endpoint):
+    """
+    :param endpoint: 执行该语句的页面，用于匹配 ALLOWED_SCANS
+    :return: 执行计划中不使用索引且不在 ALLOWED_SCANS 中的整表扫描（计划行列表），以及完整执行计划
+    """
+    plan = [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql).fetchall()]
+    scans = []
+    for detail in plan:
+        match = FULL_SCAN.match(detail)
+        if not match:
+            continue
+        name = match.group(1)
+        if (None, name) not in ALLOWED_SCANS and (endpoint, name) not in ALLOWED_SCANS:
+            scans.append(detail)
+    return scans, plan
+
+
+def run_checks(args, inspect):
+    """
+    在临时数据库上访问所有页面和接口，再调用 inspect(recorder, 数据库路径)
+    :return: inspect 的返回值（退出码）
+    """
+    from app_new import create_app
+    from config import TestingConfig, config
+
+    workdir = tempfile.mkdtemp(prefix='flow_check_')
+    cwd = os.getcwd()
+    try:
+        path = os.path.join(workdir, 'check.db')
+        seed_check_data(path, args.records)
+
+        class CheckConfig(TestingConfig):
+            DATABASE_PATH = path
+            DATABASE_BACKUP_ENABLED = False
+
+        config['query_check'] = CheckConfig
+        os.chdir(workdir)
+        app = create_app('query_check')
+        recorder = SqlRecorder()
+        recorder.attach(app)
+        errors = exercise_app(app.test_client(), workdir)
+
+        print("-" * 60)
+        for method, url, status in errors:
+            print(f"[INFO] {method} {url} 出错: {status}")
+        return inspect(recorder, path)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def check_plans(args):
+    """访问所有页面和接口后检查记录到的每条查询的执行计划"""
+    def inspect(recorder, path):
+        conn = sqlite3.connect(path)
+        failures = []
+        for sql, endpoint in recorder.statements.items():
+            try:
+                scans, plan = find_full_scans(conn, sql, endpoint)
+            except sqlite3.Error:
+                # 临时表等只在请求的连接上存在
+                continue
+            if scans:
+                failures.append((endpoint, sql, plan))
+        conn.close()
+
+        for endpoint, sql, plan in failures:
+            print(f"[ERROR] {endpoint}: {sql[:200]}")
+            for detail in plan:
+                print(f"        {detail}")
+        print(f"[INFO] 检查了 {len(recorder.statements)} 条语句，{len(failures)} 条存在全表扫描")
+        return 1 if failures else 0
+
+    return run_checks(args, inspect)
+
+
+def check_counts(args):
+    """访问所有页面和接口后检查每个请求中是否有逐条执行的查询（N+1）"""
+    def inspect(recorder, path):
+        failures = 0
+        for name, endpoint, queries in recorder.requests:
+            for sql, count in queries.items():
+                if count > MAX_REPEATED_QUERIES:
+                    failures += 1
+                    print(f"[ERROR] {name} ({endpoint}): 执行 {count} 次: {sql[:200]}")
+        busiest = sorted(recorder.requests, key=lambda r: sum(r[2].values()), reverse=True)[:5]
+        for name, endpoint, queries in busiest:
+            print(f"[INFO] {name}: {sum(queries.values())} 次查询")
+        print(f"[INFO] 检查了 {len(recorder.requests)} 个请求，{failures} 处重复查询超过 {MAX_REPEATED_QUERIES} 次")
+        return 1 if failures else 0
+
+    return run_checks(args, inspect)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='流水管理系统查询检查')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    p = subparsers.add_parser('plans', help='执行计划检查（不允许全表扫描）')
+    p.add_argument('--records', type=int, default=20000)
+    p.set_defaults(func=check_plans)
+
+    p = subparsers.add_parser('counts', help='查询次数检查（不允许N+1查询）')
+    p.add_argument('--records', type=int, default=20000)
+    p.set_defaults(func=check_counts)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+流水显示名称 - 流水管理系统
+把流水的 operator_id、channel_id 转换为显示名称
+内置ID（自己、管理员、微信支付等）和数据库中的操作员、渠道统一从 NameMap 中查找，
+一页记录用到的名称一次查询取回，不再逐条查询
+"""
+
+# 内置操作员：客户自己操作、管理员录入
+SELF_OPERATOR_ID = 999
+ADMIN_OPERATOR_ID = 999999
+BUILTIN_OPERATORS = {SELF_OPERATOR_ID: '自己', ADMIN_OPERATOR_ID: '管理员'}
+
+# 内置渠道（0表示不选择渠道）
+NO_CHANNEL_ID = 0
+BUILTIN_CHANNELS = {1: '微信支付', 2: '支付宝', 3: '其他渠道'}
+
+
+class NameMap:
+    """操作员和渠道名称表，内置ID优先于数据库中的同ID记录"""
+
+    def __init__(self):
+        self.operators = dict(BUILTIN_OPERATORS)
+        self.channels = dict(BUILTIN_CHANNELS)
+
+    def load(self, conn, records):
+        """
+        一次查询取回记录中尚未加载的操作员和渠道名称
+        :param conn: 数据库连接
+        :param records: 含 operator_id、channel_id 字段的记录
+        :return: self
+        """
+        operator_ids, channel_ids = set(), set()
+        for record in records:
+            if record['operator_id'] is not None and record['operator_id'] not in self.operators:
+                operator_ids.add(record['operator_id'])
+            if record['channel_id'] and record['channel_id'] not in self.channels:
+                channel_ids.add(record['channel_id'])
+        if not operator_ids and not channel_ids:
+            return self
+
+        # 先记为None，数据库中不存在的ID不会重复查询
+        self.operators.update(dict.fromkeys(operator_ids))
+        self.channels.update(dict.fromkeys(channel_ids))
+
+        operator_marks = ', '.join('?' * len(operator_ids)) or 'NULL'
+        channel_marks = ', '.join('?' * len(channel_ids)) or 'NULL'
+        rows = conn.execute(f'''
+            SELECT 'operator' AS kind, id, name FROM operators WHERE id IN ({operator_marks})
+            UNION ALL
+            SELECT 'channel' AS kind, id, name FROM payment_channels WHERE id IN ({channel_marks})
+        ''', [*operator_ids, *channel_ids]).fetchall()
+        for kind, item_id, name in rows:
+            (self.operators if kind == 'operator' else self.channels)[item_id] = name
+        return self
+
+    def operator_name(self, operator_id):
+        """操作员显示名称，未设置或不存在时返回None"""
+        return self.operators.get(operator_id) if operator_id is not None else None
+
+    def channel_name(self, channel_id):
+        """渠道显示名称，未选择或不存在时返回None"""
+        return self.channels.get(channel_id) if channel_id else None
+
+    def label(self, record):
+        """
+        :return: 记录的字典副本，加上 operator_name 和 channel_name
+        """
+        item = dict(record)
+        item['operator_name'] = self.operator_name(record['operator_id'])
+        item['channel_name'] = self.channel_name(record['channel_id'])
+        return item
@@ -0,0 +1,291 @@
+"""
+流水查询引擎 - 流水管理系统
+客户查询（/customer/query/search）和管理员查询（/admin/customer_query/search/<id>）共用
+
+筛选条件解析为 SearchFilter，按条件的组合（形状）编译出参数化SQL并缓存：
+同一形状的查询SQL文本相同，只有参数不同，sqlite3 的语句缓存可直接复用预编译语句
+记录和统计都在SQL中完成：操作员、渠道名称由 CASE 和关联查询得到，合计由一条聚合查询得到，
+只要统计或只要第一页时不必取回全部记录；需要全部记录时可流式输出，内存占用与结果大小无关
+"""
+
+import json
+from datetime import datetime
+from functools import lru_cache
+
+from config import Config
+from record_names import BUILTIN_CHANNELS, BUILTIN_OPERATORS, NO_CHANNEL_ID, SELF_OPERATOR_ID
+from utils import KeysetPagination
+
+# 状态筛选：'all' 表示不限
+STATUS_VALUES = ('done', 'pending', 'all')
+
+# 记录排序（分页游标）字段
+SORT_COLUMNS = ('dr.date', 'dr.id')
+
+# 统计字段，与 stats_sql 的列顺序一致
+STATS_FIELDS = ('total_count', 'total_amount', 'completed_count', 'completed_amount',
+                'pending_count', 'pending_amount')
+
+
+def _parse_date(value, label):
+    if not value:
+        return None
+    try:
+        datetime.strptime(value, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        raise ValueError(f'{label}格式错误，应为 YYYY-MM-DD')
+    return value
+
+
+def _parse_id(value, label):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{label}无效')
+
+
+class SearchFilter:
+    """
+    流水查询条件
+    operator_id: None 不限，SELF_OPERATOR_ID 表示客户自己，其他为操作员ID
+    channel_id: None 不限，NO_CHANNEL_ID（0）表示未选择渠道，其他为渠道ID
+    status: 'done'、'pending'，None 不限
+    """
+
+    def __init__(self, customer_id, start_date=None, end_date=None, operator_id=None,
+                 channel_id=None, status='done', descending=False):
+        self.customer_id = customer_id
+        self.start_date = start_date
+        self.end_date = end_date
+        self.operator_id = operator_id
+        self.channel_id = channel_id
+        self.status = status
+        self.descending = descending
+
+    @classmethod
+    def from_request(cls, customer_id, data, descending=False):
+        """
+        解析查询接口的JSON参数
+        :param data: start_date、end_date、operator_id（'self' 或ID）、channel_id（'0' 或ID）、
+                     status（'done' 默认、'pending'、'all'），空字符串表示不限
+        :param descending: 是否按日期倒序
+        :raises ValueError: 参数格式错误
+        """
+        data = data or {}
+        operator = data.get('operator_id') or None
+        channel = data.get('channel_id')
+        status = data.get('status') or 'done'
+        if status not in STATUS_VALUES:
+            raise ValueError('状态无效')
+
+        return cls(
+            customer_id,
+            start_date=_parse_date(data.get('start_date'), '起始日期'),
+            end_date=_parse_date(data.get('end_date'), '结束日期'),
+            operator_id=SELF_OPERATOR_ID if operator == 'self' else (
+                _parse_id(operator, '操作员') if operator is not None else None),
+            channel_id=_parse_id(channel, '渠道') if channel not in (None, '') else None,
+            status=None if status == 'all' else status,
+            descending=descending
+        )
+
+    @property
+    def shape(self):
+        """条件的组合，决定SQL文本"""
+        if self.channel_id is None:
+            channel = None
+        else:
+            channel = 'none' if self.channel_id == NO_CHANNEL_ID else 'id'
+        return (self.start_date is not None, self.end_date is not None,
+                self.operator_id is not None, channel, self.status is not None, self.descending)
+
+    def params(self):
+        """按 shape 中条件的顺序排列的参数"""
+        params = [self.customer_id]
+        if self.status is not None:
+            params.append(self.status)
+        if self.start_date is not None:
+            params.append(self.start_date)
+        if self.end_date is not None:
+            params.append(self.end_date)
+        if self.operator_id is not None:
+            params.append(self.operator_id)
+        if self.channel_id is not None and self.channel_id != NO_CHANNEL_ID:
+            params.append(self.channel_id)
+        return params
+
+
+def _label(column, builtin, joined):
+    """内置ID取固定名称，其他取关联表中的名称"""
+    cases = ' '.join(f"WHEN {item_id} THEN '{name}'" for item_id, name in builtin.items())
+    return f'CASE {column} {cases} ELSE {joined} END'
+
+
+class CompiledSearch:
+    """一种筛选形状对应的SQL"""
+
+    def __init__(self, rows_sql, stats_sql):
+        self.rows_sql = rows_sql
+        self.stats_sql = stats_sql
+
+
+@lru_cache(maxsize=None)
+def compile_search(shape, seek='', order=None):
+    """
+    生成某种筛选形状的查询SQL（形状组合有限，全部缓存）
+    :param shape: SearchFilter.shape
+    :param seek: 分页定位条件（KeysetPagination.where 生成，参数追加在筛选参数之后）
+    :param order: 分页排序子句（KeysetPagination.order_by 生成），指定时记录查询末尾带 LIMIT ?
+    :return: CompiledSearch
+    """
+    has_start, has_end, has_operator, channel, has_status, descending = shape
+
+    where = 'dr.customer_id = ? AND dr.is_daily_summary = 0'
+    if has_status:
+        where += ' AND dr.status = ?'
+    if has_start:
+        where += ' AND dr.date >= ?'
+    if has_end:
+        where += ' AND dr.date <= ?'
+    if has_operator:
+        where += ' AND dr.operator_id = ?'
+    if channel == 'none':
+        where += f' AND (dr.channel_id = {NO_CHANNEL_ID} OR dr.channel_id IS NULL)'
+    elif channel == 'id':
+        where += ' AND dr.channel_id = ?'
+
+    if order is None:
+        direction = 'DESC' if descending else 'ASC'
+        order = ', '.join(f'{column} {direction}' for column in SORT_COLUMNS)
+        limit = ''
+    else:
+        limit = ' LIMIT ?'
+    rows_where = f'{where} AND {seek}' if seek else where
+
+    rows_sql = f'''
+        SELECT dr.id, dr.date, dr.amount, dr.status, dr.daily_total,
+               dr.operator_id, dr.channel_id,
+               {_label('dr.operator_id', BUILTIN_OPERATORS, 'o.name')} AS operator_name,
+               {_label('dr.channel_id', BUILTIN_CHANNELS, 'pc.name')} AS channel_name
+        FROM daily_records dr
+        LEFT JOIN operators o ON dr.operator_id = o.id
+        LEFT JOIN payment_channels pc ON dr.channel_id = pc.id
+        WHERE {rows_where}
+        ORDER BY {order}{limit}
+    '''
+
+    stats_sql = f'''
+        SELECT COUNT(*) AS total_count,
+               COALESCE(SUM(dr.amount), 0) AS total_amount,
+               COUNT(CASE WHEN dr.status = 'done' THEN 1 END) AS completed_count,
+               COALESCE(SUM(CASE WHEN dr.status = 'done' THEN dr.amount END), 0) AS completed_amount,
+               COUNT(CASE WHEN dr.status = 'pending' THEN 1 END) AS pending_count,
+               COALESCE(SUM(CASE WHEN dr.status = 'pending' THEN dr.amount END), 0) AS pending_amount
+        FROM daily_records dr
+        WHERE {where}
+    '''
+    return CompiledSearch(rows_sql, stats_sql)
+
+
+def search_records(conn, search):
+    """
+    查询符合条件的流水
+    :return: 记录字典列表（id、date、amount、status、daily_total、operator_id、channel_id、
+             operator_name、channel_name）
+    """
+    compiled = compile_search(search.shape)
+    return [dict(row) for row in conn.execute(compiled.rows_sql, search.params())]
+
+
+def search_stats(conn, search):
+    """
+    统计符合条件的流水（一次聚合查询）
+    :return: total_count、total_amount、completed_count、completed_amount、pending_count、pending_amount
+    """
+    compiled = compile_search(search.shape)
+    row = conn.execute(compiled.stats_sql, search.params()).fetchone()
+    return dict(zip(STATS_FIELDS, row))
+
+
+def search_page(conn, search, pagination):
+    """
+    查询一页流水（按 (日期, ID) 游标分页，只取回本页记录）
+    :param pagination: KeysetPagination，descending 须与 search.descending 一致
+    :return: pagination，本页记录（格式同 search_records）在 items 中
+    """
+    columns = list(SORT_COLUMNS)
+    seek, seek_params = pagination.where(columns)
+    compiled = compile_search(search.shape, seek, pagination.order_by(columns))
+    rows = conn.execute(compiled.rows_sql, search.params() + seek_params + [pagination.limit])
+    return pagination.paginate([dict(row) for row in rows], key=lambda r: (r['date'], r['id']))
+
+
+def search_response(conn, search, data):
+    """
+    按查询接口的参数执行查询
+    :param data: 请求JSON，除筛选条件外还可包含：
+                 stats_only - 只返回统计，不查询记录；
+                 per_page / after / before - 分页返回记录（每页条数受 RECORDS_MAX_PER_PAGE 限制），
+                 第一页附带统计，并返回 next_cursor / prev_cursor；
+                 都没有时返回全部记录和统计（流式输出见 stream_search_json）
+    :return: 接口数据字典（不含 success）
+    """
+    data = data or {}
+    if data.get('stats_only'):
+        return {'stats': search_stats(conn, search)}
+
+    if not any(data.get(key) for key in ('per_page', 'after', 'before')):
+        return {'records': search_records(conn, search), 'stats': search_stats(conn, search)}
+
+    pagination = search_page(conn, search, KeysetPagination(
+        after=data.get('after'),
+        before=data.get('before'),
+        per_page=data.get('per_page'),
+        default_per_page=Config.RECORDS_PER_PAGE,
+        max_per_page=Config.RECORDS_MAX_PER_PAGE,
+        descending=search.descending
+    ))
+    result = {
+        'records': pagination.items,
+        'next_cursor': pagination.next_cursor,
+        'prev_cursor': pagination.prev_cursor
+    }
+    if not pagination.after and not pagination.before:
+        result['stats'] = search_stats(conn, search)
+    return result
+
+
+def stream_search_json(conn, search, transform=None, batch_size=None):
+    """
+    流式生成查询结果JSON：{"success": true, "records": [...], "stats": {...}}
+    记录按批从游标读取并输出，不在内存中保留整个结果；统计在记录之后输出
+    记录和统计在同一个读事务中查询，结果一致
+    :param conn: 数据库连接，生成结束后回滚读事务（由调用方归还）
+    :param transform: 输出前处理每条记录字典的函数（如添加兼容字段），可为None
+    :param batch_size: 每次读取的条数，默认 Config.RECORDS_STREAM_BATCH
+    :return: 生成器，产生JSON文本片段
+    """
+    batch_size = batch_size or Config.RECORDS_STREAM_BATCH
+    compiled = compile_search(search.shape)
+    dumps = lambda obj: json.dumps(obj, ensure_ascii=False, default=str)
+
+    conn.execute('BEGIN')
+    try:
+        cursor = conn.execute(compiled.rows_sql, search.params())
+        yield '{"success": true, "records": ['
+        separator = ''
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            items = [dict(row) for row in rows]
+            if transform:
+                for item in items:
+                    transform(item)
+            # 整批编码为数组后去掉首尾括号，拼接成一个大数组
+            yield separator + dumps(items)[1:-1]
+            separator = ', '
+        yield f'], "stats": {dumps(search_stats(conn, search))}}}'
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
@@ -0,0 +1,122 @@
+"""
+统计引擎 - 流水管理系统
+一条条件聚合查询算出一个或多个客户的已完成、待刷、总额、今日流水和笔数
+
+数据来自 daily_aggregates（每个客户每天一行，主键 (customer_id, date) 即聚簇索引），
+按客户和日期范围查询时只扫描范围内的行，不再读取流水明细。
+客户统计接口、客户仪表盘和对账报表共用此模块，口径一致。
+"""
+
+from datetime import datetime
+
+# 每个客户返回的统计字段
+STAT_FIELDS = ('completed', 'completed_count', 'pending', 'pending_count',
+               'total', 'total_count', 'today', 'today_count')
+
+
+def _empty_stats():
+    return {field: 0 for field in STAT_FIELDS}
+
+
+def query_customer_stats(conn, customer_ids=None, start_date=None, end_date=None,
+                         today=None, with_target=False):
+    """
+    统计客户流水（一次查询）
+    没有流水的客户也会返回，各项为0
+    :param conn: 数据库连接
+    :param customer_ids: 客户ID列表，None表示所有客户
+    :param start_date: 起始日期（含），None表示不限
+    :param end_date: 结束日期（含），None表示不限
+    :param today: 今日日期，默认为当天，用于 today / today_count
+    :param with_target: 是否同时返回最近一期目标金额（target_amount）
+    :return: {客户ID: 统计字典}，统计字典包含 customer_id、username 和 STAT_FIELDS 中的各项，按客户ID排序
+    """
+    today = today or datetime.now().strftime('%Y-%m-%d')
+
+    join_conditions = ''
+    join_params = []
+    if start_date:
+        join_conditions += ' AND da.date >= ?'
+        join_params.append(start_date)
+    if end_date:
+        join_conditions += ' AND da.date <= ?'
+        join_params.append(end_date)
+
+    where = "WHERE u.role = 'customer'"
+    where_params = []
+    if customer_ids is not None:
+        customer_ids = list(customer_ids)
+        if not customer_ids:
+            return {}
+        where += f" AND u.id IN ({', '.join('?' * len(customer_ids))})"
+        where_params.extend(customer_ids)
+
+    target_column = ''
+    if with_target:
+        target_column = ''',
+               (SELECT mt.target_amount FROM monthly_targets mt
+                WHERE mt.customer_id = u.id
+                ORDER BY mt.year_month DESC LIMIT 1) AS target_amount'''
+
+    rows = conn.execute(f'''
+        SELECT u.id AS customer_id, u.username,
+               COALESCE(SUM(da.done_amount), 0) AS completed,
+               COALESCE(SUM(da.done_count), 0) AS completed_count,
+               COALESCE(SUM(da.pending_amount), 0) AS pending,
+               COALESCE(SUM(da.pending_count), 0) AS pending_count,
+               COALESCE(SUM(da.total), 0) AS total,
+               COALESCE(SUM(da.done_count + da.pending_count), 0) AS total_count,
+               COALESCE(SUM(CASE WHEN da.date = ? THEN da.total END), 0) AS today,
+               COALESCE(SUM(CASE WHEN da.date = ? THEN da.done_count + da.pending_count END), 0) AS today_count
+               {target_column}
+        FROM users u
+        LEFT JOIN daily_aggregates da ON da.customer_id = u.id{join_conditions}
+        {where}
+        GROUP BY u.id
+        ORDER BY u.id
+    ''', [today, today] + join_params + where_params).fetchall()
+
+    return {row['customer_id']: dict(row) for row in rows}
+
+
+def get_stats(conn, customer_id, start_date=None, end_date=None, today=None, with_target=False):
+    """
+    统计单个客户的流水
+    :return: 统计字典（见 query_customer_stats），客户不存在时各项为0
+    """
+    stats = query_customer_stats(conn, [customer_id], start_date, end_date, today, with_target)
+    if customer_id in stats:
+        return stats[customer_id]
+    empty = _empty_stats()
+    empty.update(customer_id=customer_id, username=None)
+    if with_target:
+        empty['target_amount'] = None
+    return empty
+
+
+def count_records(conn, customer_id=None, start_date=None, end_date=None):
+    """
+    统计流水明细条数（合计每日汇总的笔数，不读取明细）
+    :param customer_id: 客户ID，None表示所有客户
+    :param start_date: 起始日期（含），None表示不限
+    :param end_date: 结束日期（含），None表示不限
+    :return: 条数
+    """
+    conditions = []
+    params = []
+    if customer_id:
+        conditions.append('customer_id = ?')
+        params.append(customer_id)
+    if start_date:
+        conditions.append('date >= ?')
+        params.append(start_date)
+    if end_date:
+        conditions.append('date <= ?')
+        params.append(end_date)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+    return conn.execute(f'''
+        SELECT COALESCE(SUM(done_count + pending_count), 0)
+        FROM daily_aggregates
+        {where}
+    ''', params).fetchone()[0]
@@ -3,6 +3,8 @@
 提供通用的辅助函数
 """
 
+import base64
+import json
 from datetime import datetime, timedelta
 from functools import wraps
 from flask import session, redirect, url_for, flash
@@ -167,10 +169,11 @@ def validate_file_upload(file):
         return False, '文件名为空'
     
     # 检查文件扩展名
-    allowed_extensions = {'xlsx', 'xls'}
+    from config import Config
+    allowed_extensions = Config.ALLOWED_EXTENSIONS
     if not ('.' in file.filename and 
             file.filename.rsplit('.', 1)[1].lower() in allowed_extensions):
-        return False, '只支持Excel文件（.xlsx, .xls）'
+        return False, '只支持Excel、CSV或Parquet文件（.xlsx, .xls, .csv, .parquet）'
     
     return True, None
 
@@ -308,3 +311,107 @@ class Pagination:
                (self.page - left_current - 1 < num < self.page + right_current) or \
                num > last - right_edge:
                 yield num
+
+
+class KeysetPagination:
+    """
+    键集（游标）分页
+    按 (排序字段, ID) 定位翻页，不使用OFFSET，第1页和第5000页的查询代价相同；
+    翻页期间插入或删除记录不会导致重复或遗漏
+    游标是当前页最后一条（下一页）或第一条（上一页）记录的排序键
+    """
+    
+    def __init__(self, after=None, before=None, per_page=None, default_per_page=50, max_per_page=200,
+                 descending=False):
+        """
+        初始化分页
+        :param after: 下一页游标，返回排在该记录之后的记录
+        :param before: 上一页游标，返回排在该记录之前的记录（after 为空时才使用）
+        :param per_page: 每页数量，限制在 1 到 max_per_page 之间
+        :param default_per_page: 未指定每页数量时使用
+        :param max_per_page: 每页数量上限
+        :param descending: 是否按排序字段倒序排列
+        """
+        self.per_page = min(max(safe_int(per_page, default_per_page), 1), max_per_page)
+        self.descending = descending
+        self.after = self.decode_cursor(after)
+        self.before = None if self.after else self.decode_cursor(before)
+        self.items = []
+        self.has_prev = False
+        self.has_next = False
+        self._key = None
+    
+    @staticmethod
+    def encode_cursor(key):
+        """将排序键编码为URL安全的游标字符串"""
+        data = json.dumps(list(key), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+    
+    @staticmethod
+    def decode_cursor(cursor):
+        """
+        解析游标
+        :return: 排序键列表，游标为空或无效时返回None（从第一页开始）
+        """
+        if not cursor:
+            return None
+        try:
+            data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            key = json.loads(data.decode('utf-8'))
+        except (ValueError, UnicodeDecodeError):
+            return None
+        return key if isinstance(key, list) and key else None
+    
+    def where(self, columns):
+        """
+        生成定位条件
+        :param columns: 排序字段列表，最后一个字段须唯一（如 ['dr.date', 'dr.id']）
+        :return: (SQL条件, 参数列表)，第一页时条件为空字符串
+        """
+        key = self.after or self.before
+        if key and len(key) != len(columns):
+            # 游标与排序字段不匹配，从第一页开始
+            self.after = self.before = key = None
+        if not key:
+            return '', []
+        op = '>' if bool(self.after) != self.descending else '<'
+        return f"({', '.join(columns)}) {op} ({', '.join('?' * len(columns))})", list(key)
+    
+    def order_by(self, columns):
+        """生成排序子句（上一页时倒序查询，取到后再翻转）"""
+        direction = 'DESC' if bool(self.before) != self.descending else 'ASC'
+        return ', '.join(f'{column} {direction}' for column in columns)
+    
+    @property
+    def limit(self):
+        """查询条数，多取一条用于判断是否还有下一页（上一页）"""
+        return self.per_page + 1
+    
+    def paginate(self, rows, key):
+        """
+        处理按 where / order_by / limit 查询到的结果
+        :param rows: 查询结果
+        :param key: 从一行中取出排序键的函数
+        :return: self，当前页记录在 items 中
+        """
+        rows = list(rows)
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if self.before:
+            rows.reverse()
+            self.has_prev, self.has_next = more, True
+        else:
+            self.has_prev, self.has_next = self.after is not None, more
+        self.items = rows
+        self._key = key
+        return self
+    
+    @property
+    def next_cursor(self):
+        """下一页游标"""
+        return self.encode_cursor(self._key(self.items[-1])) if self.has_next and self.items else None
+    
+    @property
+    def prev_cursor(self):
+        """上一页游标"""
+        return self.encode_cursor(self._key(self.items[0])) if self.has_prev and self.items else None